@@ -1,55 +1,413 @@
-from flask import Flask, render_template_string, request, redirect, url_for, session
-import os, traceback, datetime
+from flask import Flask, render_template, request, redirect, url_for, session, Response, abort, jsonify
+from jinja2 import DictLoader
+import os, gc, sys, math, time, gzip, hmac, hashlib, importlib, functools, contextlib, traceback, datetime
+
+from explainability import thresholds
+from explainability.results import AnalysisResult
+from explainability.instrumentation import REGISTRY, RUN_BUCKETS, stage_timer
+from explainability.memory import MemoryBudget
+from serving.result_cache import ResultCache
+from serving.ingest import ingest_multipart, ingest_multipart_files, ingest_local_path, IngestedFile, UploadRejected
+from serving.cascade import CascadeScheduler
+from serving.jobs import JobRegistry, format_sse
+from serving.face_mesh_cache import FaceMeshCache
+from serving.series_store import SeriesStore, SERIES_DIR
+from serving.rescore import rescore_corpus
+from serving.analyzers import AnalyzerRegistry
+from serving.model_server import get_model_server
+from serving.state_store import StateStore, STATE_DB
+from serving.admission import FairScheduler, Overloaded, estimate_cost
 
 app = Flask(__name__)
-app.secret_key = "deepfake_secret_key"
+# Sessions are signed cookies: every worker process must use the same key
+app.secret_key = os.environ.get("DEEPFAKE_SECRET_KEY", "deepfake_secret_key")
 
 UPLOAD_FOLDER = "uploads"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+MAX_UPLOAD_BYTES = int(os.environ.get("DEEPFAKE_MAX_UPLOAD_MB", "500")) * 1024 * 1024
 
 # -----------------------------
-# Safe import of explainability modules (dummy if missing)
+# Explainability modules, imported on first use (dummy if missing), so
+# start-up and the login page do not pay for mediapipe, skimage or
+# TensorFlow. DEEPFAKE_WARMUP=1 imports them, and builds their FaceMesh
+# graphs, in a background thread DEEPFAKE_WARMUP_DELAY seconds after
+# start-up instead, once the server is listening, so the first upload does
+# not wait for them either.
 # -----------------------------
 def _dummy(module_name):
-    def _f(path, **kwargs):
-        return f"⚠ Module `{module_name}` not installed. Placeholder result for `{os.path.basename(path)}`.\n"
+    def _f(path, source=None, **kwargs):
+        source = source or os.path.basename(path)
+        return f"⚠ Module `{module_name}` not installed. Placeholder result for `{source}`.\n"
+    _f.is_placeholder = True
     return _f
 
-try:
-    from explainability.eye_blink_mismatch import main as analyze_eye
-except Exception:
-    analyze_eye = _dummy("eye_blink_detector")
+def _load_main(module_key):
+    def load():
+        return importlib.import_module(f"explainability.{module_key}").main
+    return load
+
+# -----------------------------
+# CNN classifier behind a shared micro-batching model server.
+# The model is loaded once, with the module; concurrent uploads submit face
+# crops to the same queue and share batched forward passes.
+# -----------------------------
+MODEL_PATH = os.environ.get("DEEPFAKE_MODEL_PATH", os.path.join("models", "trained_models", "mobilenetv2_deepfake.h5"))
+
+def _load_cnn():
+    from serving.model_server import start_model_server
+    from explainability.cnn_detector import main as cnn_main
+    model_server = start_model_server(MODEL_PATH)
+
+    def analyze_cnn(path, **kwargs):
+        return cnn_main(path, server=model_server, **kwargs)
+    return analyze_cnn
+
+# -----------------------------
+# Analysis modules: (display name, explainability module, analyzer)
+# -----------------------------
+analyzers = AnalyzerRegistry()
+for _name, _module_key, _placeholder in [
+    ("Eye Blink Detection", "eye_blink_mismatch", "eye_blink_detector"),
+    ("Iris Alignment Analysis", "iris_alignment", "iris_alignment"),
+    ("Eyebrow Movement Analysis", "eyebrow_mismatch", "eyebrow_mismatch"),
+    ("Skin Texture Analysis", "texture_analyzer", "texture_analyzer"),
+    ("Temporal Flicker Detection", "flicker_detection", "flicker_detection"),
+    ("Lip-Sync Analysis", "lip_sync_module", "lip_sync_mismatch"),
+]:
+    analyzers.register(_name, _module_key, _load_main(_module_key), functools.partial(_dummy, _placeholder))
+analyzers.register("CNN Frame Classifier", "cnn_detector", _load_cnn, functools.partial(_dummy, "cnn_detector"))
+
+ANALYSIS_MODULES = [(analyzer.name, analyzer.module_key, analyzer) for analyzer in analyzers]
+
+WARMUP = os.environ.get("DEEPFAKE_WARMUP", "0") == "1"
+WARMUP_DELAY = float(os.environ.get("DEEPFAKE_WARMUP_DELAY", "2"))
+
+# FaceMesh graphs shared by every analysis in this process (upload jobs and
+# API workers alike): built once per configuration, reset between videos
+# and closed at exit. DEEPFAKE_FACE_MESH_POOL caps the idle graphs per
+# configuration.
+face_meshes = FaceMeshCache()
+
+def _face_mesh_options(module_key):
+    return getattr(sys.modules.get(f"explainability.{module_key}"), "FACE_MESH_OPTIONS", None)
+
+def _runs_segmented(module_key, path):
+    """
+    True when the module would split this video across DEEPFAKE_SEGMENT_WORKERS
+    processes (see explainability/segments.py). Such a run gets no pooled graph,
+    which cannot cross processes; each segment builds its own. A memory budget
+    (DEEPFAKE_JOB_MEMORY_MB) keeps every run in-process, so it takes precedence.
+    """
+    segments = sys.modules.get("explainability.segments")
+    module = sys.modules.get(f"explainability.{module_key}")
+    if JOB_MEMORY_BUDGET_MB or segments is None or not hasattr(module, "analyze_segment"):
+        return False
+    return len(segments.segment_ranges(path)) > 1
+
+def _prewarm_face_meshes():
+    configs = [_face_mesh_options(a.module_key) for a in analyzers if a.loaded and not a.is_placeholder]
+    face_meshes.prewarm([options for options in configs if options is not None])
+
+def _module_version(module_key):
+    module = sys.modules.get(f"explainability.{module_key}")
+    return getattr(module, "MODULE_VERSION", None)
+
+def _cached_results(content_hash, module_keys):
+    """{module: cached output} of the given modules for this upload, under their current version and thresholds."""
+    cached = {}
+    for module_key in module_keys:
+        version = _module_version(module_key)
+        if version is not None:
+            hit = result_cache.get(content_hash, module_key, version, thresholds.fingerprint(module_key))
+            if hit is not None:
+                cached[module_key] = hit
+    return cached
+
+# -----------------------------
+# Result cache for repeat uploads (keyed by content hash, not filename)
+# -----------------------------
+RESULT_CACHE_DIR = os.path.join("cache", "results")
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("DEEPFAKE_CACHE_MAX_MB", "512")) * 1024 * 1024
+result_cache = ResultCache(RESULT_CACHE_DIR, RESULT_CACHE_MAX_BYTES)
+# Per-frame series of every analysis, kept so verdicts can be re-scored
+# under new thresholds without decoding the videos again
+series_store = SeriesStore(SERIES_DIR)
+
+# -----------------------------
+# Cascade: cheapest modules first, expensive ones skipped once the fused
+# verdict is settled. DEEPFAKE_CASCADE=0 always runs every module.
+# -----------------------------
+CASCADE_ENABLED = os.environ.get("DEEPFAKE_CASCADE", "1") != "0"
+cascade = CascadeScheduler()
+
+# RSS growth (MB) one module run of a job may add before it degrades to
+# frame sampling (see explainability/memory.py); 0 = no budget
+JOB_MEMORY_BUDGET_MB = int(os.environ.get("DEEPFAKE_JOB_MEMORY_MB", "0"))
+
+def analyze_file(path, content_hash, full=False, publish=None, face_meshes=None, source=None):
+    """
+    Run the explainability modules on one stored upload through the cascade.
+
+    Parameters:
+        path (str): stored upload
+        content_hash (str): SHA-256 of the upload (result cache key)
+        full (bool): run every module instead of stopping early
+        publish (callable): publish(event, data) for live progress; receives
+                            "progress" (throttled frame counts) and "module"
+                            (a finished module's output) events
+        face_meshes (FaceMeshCache): shared FaceMesh graphs for modules that use one
+        source (str): file name shown in the reports (default: the stored file's)
+
+    Returns:
+        (CascadeResult, dict): cascade result and {module: {"status", "seconds"}}
+    """
+    source = source or os.path.basename(path)
+    names = {module_key: name for name, module_key, _ in ANALYSIS_MODULES}
+    funcs = {module_key: func for _, module_key, func in ANALYSIS_MODULES}
+    # Looking the placeholders up imports every analyzer not loaded yet
+    placeholders = {k for k, func in funcs.items() if getattr(func, "is_placeholder", False)}
+    timings = {}
+
+    # Cached outputs are reused per module and cost nothing in the cascade
+    cached = _cached_results(content_hash, [k for k in funcs if k not in placeholders])
+
+    def compute(module_key):
+        if module_key in cached:
+            # The entry may come from an earlier upload of the same bytes under another name
+            result = AnalysisResult.from_dict(cached[module_key])
+            result.source = source
+            return "cached", result
+        if module_key in placeholders:
+            return "placeholder", funcs[module_key](path, source=source)
+        kwargs = {}
+        if publish is not None:
+            def progress(done, total):
+                publish("progress", {"module": module_key, "name": names[module_key], "done": done, "total": total})
+            kwargs["progress"] = progress
+        options = _face_mesh_options(module_key)
+        if face_meshes is not None and options is not None and not _runs_segmented(module_key, path):
+            lease = face_meshes.lease(**options)
+        else:
+            lease = contextlib.nullcontext()
+        if JOB_MEMORY_BUDGET_MB:
+            kwargs["budget"] = MemoryBudget(JOB_MEMORY_BUDGET_MB)
+        try:
+            # The graph is this run's alone, and back in the pool (or closed) when it ends
+            with lease as face_mesh:
+                if face_mesh is not None:
+                    kwargs["face_mesh"] = face_mesh
+                result = funcs[module_key](path, **kwargs)
+            if isinstance(result, AnalysisResult):
+                result.source = source
+            elif not isinstance(result, str):
+                result = str(result)
+            if "budget" in kwargs and kwargs["budget"].degraded:
+                # Sampled results are not cached or kept for re-scoring: the next
+                # run with memory to spare analyzes every frame again
+                REGISTRY.counter("deepfake_memory_degraded_total", "Module runs degraded to frame sampling",
+                                 module=module_key).inc()
+                return "degraded", result
+            version = _module_version(module_key)
+            if isinstance(result, AnalysisResult):
+                if version is not None:
+                    result_cache.put(content_hash, module_key, version, thresholds.fingerprint(module_key),
+                                     result.to_dict())
+                series_store.put(content_hash, result, source)
+            return "ok", result
+        except Exception as e:
+            tb = traceback.format_exc()
+            return "failed", f"Analysis failed: {str(e)}\n\nTraceback:\n{tb}"
+
+    def run_module(module_key):
+        t0 = time.perf_counter()
+        status, result = compute(module_key)
+        timings[module_key] = {"status": status, "seconds": time.perf_counter() - t0}
+        REGISTRY.counter("deepfake_module_runs_total", "Module runs by outcome", module=module_key, status=status).inc()
+        if publish is not None:
+            with stage_timer(module_key)("render"):
+                text = str(result)
+            publish("module", {"module": module_key, "name": names[module_key], "output": text})
+        return result
 
-try:
-    from explainability.iris_alignment import main as analyze_iris
-except Exception:
-    analyze_iris = _dummy("iris_alignment")
+    run = cascade.run(list(funcs), run_module, full=full, cached=cached, placeholders=placeholders)
+    return run, timings
 
-try:
-    from explainability.eyebrow_mismatch import main as analyze_eyebrow
-except Exception:
-    analyze_eyebrow = _dummy("eyebrow_mismatch")
+def run_analysis(path, content_hash, full=False, publish=None, source=None):
+    """
+    Analyze one stored upload for the HTML pages (see analyze_file).
 
-try:
-    from explainability.texture_analyzer import main as analyze_texture
-except Exception:
-    analyze_texture = _dummy("texture_analyzer")
+    Returns:
+        list: [(display name, text)] in ANALYSIS_MODULES order plus the cascade summary
+    """
+    run, _ = analyze_file(path, content_hash, full=full, publish=publish, face_meshes=face_meshes, source=source)
 
-try:
-    from explainability.flicker_detection import main as analyze_flicker
-except Exception:
-    analyze_flicker = _dummy("flicker_detection")
+    outputs = []
+    for name, module_key, _ in ANALYSIS_MODULES:
+        if module_key in run.skipped:
+            text = f"Skipped by cascade: {run.skipped[module_key]}\n"
+            if publish is not None:
+                publish("module", {"module": module_key, "name": name, "output": text, "skipped": True})
+            outputs.append((name, text))
+        else:
+            outputs.append((name, run.outputs[module_key]))
+    outputs.append(("Cascade Summary", run.summary()))
+    return outputs
+
+# -----------------------------
+# Background analysis jobs (progress streamed to the browser over SSE).
+# Users, upload counts and job events are kept in SQLite (WAL), so that
+# every worker process of the production server (gunicorn.conf.py) sees
+# the same state. DEEPFAKE_STATE_DB sets the database file.
+# -----------------------------
+state = StateStore(os.environ.get("DEEPFAKE_STATE_DB", STATE_DB))
+jobs = JobRegistry(store=state)
+SSE_KEEPALIVE_SECONDS = 15
+
+def _run_job(job, path, content_hash, full, source=None):
+    try:
+        with jobs_in_flight.track(), job_seconds.time():
+            outputs = run_analysis(path, content_hash, full=full, publish=job.publish, source=source)
+    except Exception as e:
+        outputs = [("Analysis", f"Analysis failed: {str(e)}\n\nTraceback:\n{traceback.format_exc()}")]
+    job.finish(outputs)
+
+# -----------------------------
+# Admission control (serving/admission.py). Every analysis, upload or API
+# clip, runs on one scheduler: DEEPFAKE_JOB_WORKERS at a time, picked fairly
+# across users with short jobs first. New work is refused with 429 and
+# Retry-After once DEEPFAKE_CPU_BUDGET seconds of estimated CPU time are
+# running or queued. Each user (or API key) may also start up to
+# DEEPFAKE_RATE_BURST analyses at once, refilled at DEEPFAKE_RATE_PER_MINUTE;
+# those token buckets live in the state store, so they hold across worker
+# processes, while the scheduler and its budget are per process.
+# -----------------------------
+JOB_WORKERS = int(os.environ.get("DEEPFAKE_JOB_WORKERS", os.environ.get("DEEPFAKE_API_WORKERS", "2")))
+CPU_BUDGET_SECONDS = float(os.environ.get("DEEPFAKE_CPU_BUDGET", str(JOB_WORKERS * 600)))
+RATE_PER_MINUTE = float(os.environ.get("DEEPFAKE_RATE_PER_MINUTE", "6"))
+RATE_BURST = float(os.environ.get("DEEPFAKE_RATE_BURST", "10"))
+scheduler = FairScheduler(JOB_WORKERS, CPU_BUDGET_SECONDS)
 
-try:
-    from explainability.lip_sync_module import main as analyze_lip
-except Exception:
-    analyze_lip = _dummy("lip_sync_mismatch")
+def _job_cost(item):
+    """Estimated CPU seconds to analyze an IngestedFile; modules with a cached result cost nothing."""
+    module_keys = [module_key for _, module_key, _ in ANALYSIS_MODULES]
+    cached = _cached_results(item.sha256, module_keys)
+    return estimate_cost(item.frames, [cascade.cost(k, cached) for k in module_keys])
+
+def _count_rejection(reason):
+    REGISTRY.counter("deepfake_admission_rejected_total", "Analyses refused at admission", reason=reason).inc()
+
+def _rate_limited(user):
+    """Take one of the user's tokens; returns the seconds to wait if there was none (else 0)."""
+    wait = state.take_token(user, RATE_PER_MINUTE / 60, RATE_BURST)
+    if wait:
+        _count_rejection("rate")
+    return math.ceil(wait)
+
+def _overloaded(cost=0.0):
+    """Seconds to wait before work of this cost fits the CPU budget (0: admitted now)."""
+    wait = scheduler.retry_after(cost)
+    if wait:
+        _count_rejection("budget")
+    return wait
 
 # -----------------------------
-# In-memory user store and upload tracking
+# JSON batch API. Clips go through the admission scheduler above; FaceMesh
+# graphs come from the process-wide pool and the CNN goes through the
+# shared model server, so nothing is rebuilt per clip.
+# DEEPFAKE_API_KEYS (comma-separated) enables X-API-Key auth; without it a
+# logged-in session is required.
 # -----------------------------
-users = {}  # username -> {password, email}
-uploads_per_user = {}  # username -> {date_str: count}
+API_KEYS = [k.strip() for k in os.environ.get("DEEPFAKE_API_KEYS", "").split(",") if k.strip()]
+API_MAX_FILES = int(os.environ.get("DEEPFAKE_API_MAX_FILES", "100"))
+API_MAX_UPLOAD_BYTES = int(os.environ.get("DEEPFAKE_API_MAX_UPLOAD_MB", "2048")) * 1024 * 1024
+# Server-local `paths` must resolve inside one of these directories
+API_PATH_ROOTS = [os.path.realpath(p) for p in
+                  os.environ.get("DEEPFAKE_API_PATH_ROOTS", UPLOAD_FOLDER).split(os.pathsep) if p]
+
+# -----------------------------
+# Metrics. Analyzers record per-stage histograms themselves (see
+# explainability/instrumentation.py); /metrics exports them in Prometheus
+# text format together with the job, queue and model server figures below.
+# Like the API it needs an X-API-Key (or a login without keys);
+# DEEPFAKE_METRICS_PUBLIC=1 serves it to anyone. DEEPFAKE_METRICS=0 turns
+# the timers off.
+# -----------------------------
+METRICS_PUBLIC = os.environ.get("DEEPFAKE_METRICS_PUBLIC", "0") == "1"
+jobs_in_flight = REGISTRY.gauge("deepfake_jobs_in_flight", "Analyses currently running", kind="upload")
+api_in_flight = REGISTRY.gauge("deepfake_jobs_in_flight", kind="api")
+api_queued = REGISTRY.gauge("deepfake_api_queue_depth", "API clips waiting for a worker")
+job_seconds = REGISTRY.histogram("deepfake_job_seconds", "Wall time of one background upload analysis", RUN_BUCKETS)
+
+def _model_server_stats():
+    model_server = get_model_server()
+    if model_server is None:
+        return {}
+    return {(("stat", k),): v for k, v in dict(model_server.stats).items()}
+
+def _model_queue_depth():
+    model_server = get_model_server()
+    return model_server.queue_depth() if model_server is not None else 0
+
+REGISTRY.gauge_callback("deepfake_model_queue_depth", "Face crops waiting for the CNN model server",
+                        _model_queue_depth)
+REGISTRY.gauge_callback("deepfake_model_server", "CNN model server totals (requests, batches, max_batch, busy_s)",
+                        _model_server_stats)
+REGISTRY.gauge_callback("deepfake_face_mesh_graphs",
+                        "FaceMesh pool events per configuration (created = graph initializations)", face_meshes.stats)
+REGISTRY.gauge_callback("deepfake_face_mesh_pool", "FaceMesh graphs idle / leased out per configuration",
+                        face_meshes.sizes)
+REGISTRY.gauge_callback("deepfake_analyzer_load_seconds", "Import and set-up time of each analyzer loaded so far",
+                        lambda: {(("module", k),): v for k, v in analyzers.load_seconds().items()})
+REGISTRY.gauge_callback("deepfake_scheduler_jobs", "Analyses queued / running on the admission scheduler",
+                        scheduler.sizes)
+REGISTRY.gauge_callback("deepfake_scheduler_cost_seconds", "Estimated CPU seconds of the queued / running analyses",
+                        scheduler.stats)
+
+def _api_user():
+    """The API caller: "api-key-<n>" for the n-th key, else the session user; None when unauthorized."""
+    if API_KEYS:
+        key = request.headers.get("X-API-Key", "")
+        matches = [i for i, k in enumerate(API_KEYS) if hmac.compare_digest(key, k)]
+        return f"api-key-{matches[0]}" if matches else None
+    return session.get("user")
+
+def _too_many(message, retry_after):
+    return message, 429, {"Retry-After": str(retry_after)}
+
+def _api_error(item, source):
+    return {"source": source, "filename": item.filename, "status": "rejected",
+            "error": str(item), "http_status": item.status}
+
+def _api_analyze_item(item, source, full):
+    api_queued.dec()
+    t0 = time.perf_counter()
+    with api_in_flight.track():
+        run, timings = analyze_file(item.path, item.sha256, full=full, face_meshes=face_meshes, source=item.filename)
+    modules = {}
+    for name, module_key, _ in ANALYSIS_MODULES:
+        if module_key in run.skipped:
+            modules[module_key] = {"name": name, "status": "skipped", "reason": run.skipped[module_key]}
+        else:
+            timing = timings[module_key]
+            modules[module_key] = {"name": name, "status": timing["status"], "seconds": round(timing["seconds"], 3),
+                                   "vote": run.votes[module_key], "output": run.outputs[module_key]}
+            if module_key in run.results:
+                modules[module_key]["verdict"] = run.results[module_key].verdict
+                modules[module_key]["metrics"] = run.results[module_key].metrics
+    return {
+        "source": source,
+        "filename": item.filename,
+        "sha256": item.sha256,
+        "size": item.size,
+        "kind": item.kind,
+        "status": "ok",
+        "verdict": run.verdict,
+        "score": round(run.score, 4),
+        "full": run.full,
+        "run_order": run.order,
+        "seconds": round(time.perf_counter() - t0, 3),
+        "modules": modules,
+    }
 
 # -----------------------------
 # Base CSS Styling
@@ -138,6 +496,14 @@ button.primary:hover, .btn-primary:hover{background:var(--accent-2);}
   max-height:520px; overflow:auto; 
   border:1px solid rgba(0,234,255,0.06)
 }
+.progress-track{
+  height:8px; border-radius:4px; background:var(--glass); overflow:hidden; margin:6px 0 10px 0;
+}
+.progress-fill{
+  height:100%; width:0; background:linear-gradient(90deg, var(--accent-2), var(--accent));
+  transition:width 0.3s ease;
+}
+.progress-label{font-size:13px; color:var(--muted)}
 .show-pass{
   margin-top:6px;font-size:14px;color:var(--muted); 
   cursor:pointer; user-select:none;
@@ -173,7 +539,7 @@ index_html = """
     <meta charset="utf-8">
     <meta name="viewport" content="width=device-width,initial-scale=1">
     <title>PROOF - Deepfake Detection System</title>
-    <style>{{base_css}}</style>
+    <link rel="stylesheet" href="{{ url_for('stylesheet', v=css_version) }}">
 </head>
 <body>
     <div class="header">
@@ -230,7 +596,7 @@ login_html = """
     <meta charset="utf-8">
     <meta name="viewport" content="width=device-width,initial-scale=1">
     <title>PROOF - Login</title>
-    <style>{{base_css}}</style>
+    <link rel="stylesheet" href="{{ url_for('stylesheet', v=css_version) }}">
     <script>
     function togglePass(id){ 
         var x=document.getElementById(id); 
@@ -287,7 +653,7 @@ signup_html = """
     <meta charset="utf-8">
     <meta name="viewport" content="width=device-width,initial-scale=1">
     <title>PROOF - Create Account</title>
-    <style>{{base_css}}</style>
+    <link rel="stylesheet" href="{{ url_for('stylesheet', v=css_version) }}">
     <script>
     function togglePass(id){ 
         var x=document.getElementById(id); 
@@ -360,7 +726,7 @@ how_it_works_html = """
     <meta charset="utf-8">
     <meta name="viewport" content="width=device-width,initial-scale=1">
     <title>How PROOF Works - Deepfake Detection</title>
-    <style>{{base_css}}</style>
+    <link rel="stylesheet" href="{{ url_for('stylesheet', v=css_version) }}">
 </head>
 <body>
     <div class="header">
@@ -440,7 +806,7 @@ upload_html = """
     <meta charset="utf-8">
     <meta name="viewport" content="width=device-width,initial-scale=1">
     <title>PROOF - Upload & Analyze</title>
-    <style>{{base_css}}</style>
+    <link rel="stylesheet" href="{{ url_for('stylesheet', v=css_version) }}">
 </head>
 <body>
     <div class="header">
@@ -458,6 +824,8 @@ upload_html = """
             
             <form method="post" enctype="multipart/form-data" class="upload-grid">
                 <div>
+                    <!-- Sent before the file part so it is read while the upload streams in -->
+                    <label class="show-pass"><input type="checkbox" name="full" value="1"> Run full analysis (no early exit)</label>
                     <label>Select Media File</label>
                     <input type="file" name="file" accept="video/*,image/*" required>
                     
@@ -485,8 +853,8 @@ upload_html = """
                     <div class="analysis-card">
                         <h4>Analysis Info</h4>
                         <p style="color:var(--muted);font-size:14px">
-                            • Processing may take 1-5 minutes<br>
-                            • All 6 detection modules will run<br>
+                            • Processing may take 1-5 minutes; progress is shown live<br>
+                            • Modules run cheapest first and stop once the verdict is clear<br>
                             • Results include detailed explanations<br>
                             • Files are processed securely
                         </p>
@@ -514,7 +882,7 @@ result_html = """
     <meta charset="utf-8">
     <meta name="viewport" content="width=device-width,initial-scale=1">
     <title>PROOF - Analysis Results</title>
-    <style>{{base_css}}</style>
+    <link rel="stylesheet" href="{{ url_for('stylesheet', v=css_version) }}">
 </head>
 <body>
     <div class="header">
@@ -549,13 +917,126 @@ result_html = """
 </html>
 """
 
+# Progress Page Template (live updates over Server-Sent Events)
+progress_html = """
+<!doctype html>
+<html lang="en">
+<head>
+    <meta charset="utf-8">
+    <meta name="viewport" content="width=device-width,initial-scale=1">
+    <title>PROOF - Analyzing</title>
+    <link rel="stylesheet" href="{{ url_for('stylesheet', v=css_version) }}">
+    <noscript><meta http-equiv="refresh" content="5"></noscript>
+</head>
+<body>
+    <div class="header">
+        <a href="{{ url_for('index') }}" class="brand">Pr<span class="oo">oo</span>f</a>
+        <div style="flex:1"></div>
+        <div class="nav-links">
+            <a href="{{ url_for('upload') }}">Upload Another</a>
+            <a href="{{ url_for('logout') }}" class="logout-btn">Logout</a>
+        </div>
+    </div>
+    <div class="container">
+        <div class="center-card" style="max-width:900px;margin:0 auto">
+            <h2 class="h1">Analysis in Progress</h2>
+            <p class="lead" id="status">Results appear below as each module finishes.</p>
+
+            {% for module_name,module_key in modules %}
+            <div style="margin-bottom:24px">
+                <div class="analysis-card" id="card-{{ module_key }}">
+                    <h4>{{ module_name }}</h4>
+                    <div class="progress-track"><div class="progress-fill"></div></div>
+                    <div class="progress-label">Waiting…</div>
+                    <div class="result-pre" style="display:none"></div>
+                </div>
+            </div>
+            {% endfor %}
+        </div>
+    </div>
+    <script>
+    (function(){
+        var source = new EventSource("{{ url_for('job_events', job_id=job_id) }}");
+        function card(module){ return document.getElementById("card-" + module); }
+        source.addEventListener("progress", function(e){
+            var d = JSON.parse(e.data), c = card(d.module);
+            if(!c) return;
+            var pct = d.total ? Math.min(100, Math.round(100 * d.done / d.total)) : 0;
+            c.querySelector(".progress-fill").style.width = pct + "%";
+            c.querySelector(".progress-label").textContent = "Frames " + d.done + " / " + d.total + " (" + pct + "%)";
+        });
+        source.addEventListener("module", function(e){
+            var d = JSON.parse(e.data), c = card(d.module);
+            if(!c) return;
+            c.querySelector(".progress-fill").style.width = "100%";
+            c.querySelector(".progress-label").textContent = d.skipped ? "Skipped" : "Done";
+            var pre = c.querySelector(".result-pre");
+            pre.textContent = d.output;
+            pre.style.display = "block";
+        });
+        source.addEventListener("done", function(){
+            source.close();
+            document.getElementById("status").textContent = "Analysis complete. Loading results…";
+            window.location.reload();
+        });
+    })();
+    </script>
+</body>
+</html>
+"""
+
+# -----------------------------
+# The templates are looked up by name, so Jinja compiles each one once and
+# caches it, rather than re-parsing the source on every request. The
+# stylesheet has its own URL, versioned by content hash, so browsers cache
+# it for a year instead of receiving it inline in every page.
+# HTML, JSON and text responses are gzip-compressed for clients that accept
+# it. DEEPFAKE_GZIP_LEVEL=0 turns compression off.
+# -----------------------------
+app.jinja_loader = DictLoader({
+    "index.html": index_html,
+    "login.html": login_html,
+    "signup.html": signup_html,
+    "how_it_works.html": how_it_works_html,
+    "upload.html": upload_html,
+    "result.html": result_html,
+    "progress.html": progress_html,
+})
+
+GZIP_LEVEL = int(os.environ.get("DEEPFAKE_GZIP_LEVEL", "6"))
+GZIP_MIN_BYTES = 1024
+COMPRESSIBLE_TYPES = ("text/html", "text/css", "text/plain", "application/json")
+
+CSS_BYTES = base_css.encode()
+CSS_VERSION = hashlib.sha256(CSS_BYTES).hexdigest()[:16]
+CSS_GZIP = gzip.compress(CSS_BYTES, max(GZIP_LEVEL, 1), mtime=0)
+CSS_MAX_AGE = 365 * 24 * 3600
+app.jinja_env.globals["css_version"] = CSS_VERSION
+
+def _accepts_gzip():
+    return GZIP_LEVEL > 0 and request.accept_encodings["gzip"] > 0
+
+@app.after_request
+def _compress(response):
+    if (not _accepts_gzip() or response.status_code != 200 or response.is_streamed
+            or response.direct_passthrough or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+    body = response.get_data()
+    if len(body) < GZIP_MIN_BYTES:
+        return response
+    response.set_data(gzip.compress(body, GZIP_LEVEL))
+    response.headers["Content-Encoding"] = "gzip"
+    response.vary.add("Accept-Encoding")
+    return response
+
 # -----------------------------
 # Flask Routes
 # -----------------------------
 
 @app.route("/")
 def index():
-    return render_template_string(index_html, base_css=base_css)
+    return render_template("index.html")
 
 @app.route("/login", methods=["GET","POST"])
 def login():
@@ -564,13 +1045,13 @@ def login():
         username = request.form.get("username", "").strip()
         password = request.form.get("password", "")
         
-        if username in users and users[username]["password"] == password:
+        if state.check_password(username, password):
             session["user"] = username
             return redirect(url_for("upload"))
         else:
             error = "Invalid username or password"
     
-    return render_template_string(login_html, base_css=base_css, error=error)
+    return render_template("login.html", error=error)
 
 @app.route("/signup", methods=["GET","POST"])
 def signup():
@@ -585,74 +1066,261 @@ def signup():
             error = "Username and email are required"
         elif password != confirm_password:
             error = "Passwords do not match"
-        elif username in users:
+        elif state.user_exists(username):
             error = "Username already exists"
         elif len(password) < 6:
             error = "Password must be at least 6 characters"
+        elif not state.create_user(username, password, email):
+            # Taken by a concurrent signup, possibly in another worker
+            error = "Username already exists"
         else:
-            users[username] = {"password": password, "email": email}
             session["user"] = username
             return redirect(url_for("upload"))
     
-    return render_template_string(signup_html, base_css=base_css, error=error)
+    return render_template("signup.html", error=error)
 
 @app.route("/how_it_works")
 def how_it_works():
-    return render_template_string(how_it_works_html, base_css=base_css)
+    return render_template("how_it_works.html")
 
 @app.route("/upload", methods=["GET","POST"])
 def upload():
     if "user" not in session:
         return redirect(url_for("login"))
-    
-    user = session["user"]
+    if request.method != "POST":
+        return _upload(session["user"])
+    with REGISTRY.histogram("deepfake_request_seconds", "Wall time of one request (upload: ingest and job start)",
+                            RUN_BUCKETS, route="upload").time():
+        response = _upload(session["user"])
+    status = response[1] if isinstance(response, tuple) else response.status_code
+    REGISTRY.counter("deepfake_uploads_total", "Upload requests by HTTP status", status=status).inc()
+    return response
+
+def _upload(user):
     today = datetime.date.today().isoformat()
-    uploads_today = uploads_per_user.get(user, {}).get(today, 0)
+    uploads_today = state.uploads_on(user, today)
 
     if request.method == "POST":
-        file = request.files.get("file")
-        if not file or file.filename == "":
-            return "No file selected", 400
-        
-        # Save uploaded file
-        safe_name = file.filename.replace("/", "_").replace("\\", "_")
-        path = os.path.join(UPLOAD_FOLDER, safe_name)
-        file.save(path)
+        # Refused before the body is read: a full budget, or over the user's rate.
+        # The budget comes first so a busy server does not use up the user's tokens
+        wait = _overloaded()
+        if wait:
+            return _too_many(f"Server is busy; try again in {wait} s", wait)
+        wait = _rate_limited(user)
+        if wait:
+            return _too_many(f"Too many analyses started; try again in {wait} s", wait)
+
+        # Stream the upload to disk (hashing, size limit and decode probe inline)
+        try:
+            ingested = ingest_multipart(request.stream, request.content_type, request.content_length,
+                                        UPLOAD_FOLDER, max_bytes=MAX_UPLOAD_BYTES)
+        except UploadRejected as e:
+            return str(e), e.status
+        full = not CASCADE_ENABLED or "1" in (request.args.get("full"), ingested.fields.get("full"))
+
+        # Analyze in the background; the progress page streams events until it is done
+        job = jobs.create(user)
+        try:
+            # The stored path is named by content, so the job reads these bytes however long it waits
+            scheduler.submit(user, _job_cost(ingested), _run_job, job, ingested.path, ingested.sha256, full,
+                             ingested.filename)
+        except Overloaded as e:
+            _count_rejection("budget")
+            state.return_token(user, RATE_BURST)
+            job.finish([("Analysis", f"Not started: {e}")])
+            return _too_many(f"{e}; try again in {e.retry_after} s", e.retry_after)
 
         # Track uploads
-        uploads_per_user.setdefault(user, {})
-        uploads_per_user[user][today] = uploads_today + 1
-
-        # Run all explainability modules
-        modules = [
-            ("Eye Blink Detection", analyze_eye),
-            ("Iris Alignment Analysis", analyze_iris),
-            ("Eyebrow Movement Analysis", analyze_eyebrow),
-            ("Skin Texture Analysis", analyze_texture),
-            ("Temporal Flicker Detection", analyze_flicker),
-            ("Lip-Sync Analysis", analyze_lip)
-        ]
-        
-        outputs = []
-        for name, func in modules:
-            try:
-                result = func(path)
-                if not isinstance(result, str):
-                    result = str(result)
-                outputs.append((name, result))
-            except Exception as e:
-                tb = traceback.format_exc()
-                outputs.append((name, f"Analysis failed: {str(e)}\n\nTraceback:\n{tb}"))
+        state.count_upload(user, today)
+        return redirect(url_for("job_status", job_id=job.id))
+
+    return render_template("upload.html", uploads_today=uploads_today)
+
+def _user_job(job_id):
+    job = jobs.get(job_id)
+    if job is None or job.user != session.get("user"):
+        abort(404)
+    return job
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    if "user" not in session:
+        return redirect(url_for("login"))
+    job = _user_job(job_id)
+    if job.done:
+        return render_template("result.html", outputs=job.outputs)
+    modules = [(name, module_key) for name, module_key, _ in ANALYSIS_MODULES]
+    return render_template("progress.html", job_id=job.id, modules=modules)
+
+@app.route("/jobs/<job_id>/events")
+def job_events(job_id):
+    if "user" not in session:
+        abort(401)
+    job = _user_job(job_id)
+    # EventSource resends the last id it saw when it reconnects
+    since = request.headers.get("Last-Event-ID", "0")
+    since = int(since) if since.isdigit() else 0
+
+    def stream():
+        position = since
+        yield "retry: 2000\n\n"
+        while True:
+            events, done = job.wait(position, SSE_KEEPALIVE_SECONDS)
+            for event, data in events:
+                position += 1
+                yield format_sse(event, data, position)
+            if done and not events:
+                return
+            if not events:
+                yield ": keep-alive\n\n"
 
-        return render_template_string(result_html, base_css=base_css, outputs=outputs)
+    return Response(stream(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
-    return render_template_string(upload_html, base_css=base_css, uploads_today=uploads_today)
+
+@app.route("/api/v1/analyze", methods=["POST"])
+def api_analyze():
+    """
+    Analyze a batch of clips and return JSON.
+
+    multipart/form-data: any number of `files` (or `file`) parts, plus optional
+    `paths` (one server-local path per line) and `full` fields.
+    application/json: {"paths": [...], "full": false}.
+    """
+    user = _api_user()
+    if user is None:
+        return jsonify(error="Unauthorized"), 401
+    # One token per call, however many clips it carries; the budget counts every clip
+    wait = _overloaded() or _rate_limited(user)
+    if wait:
+        return jsonify(error="Too many requests", retry_after=wait), 429, {"Retry-After": str(wait)}
+    t0 = time.perf_counter()
+
+    items = []   # (source, IngestedFile or UploadRejected)
+    if request.mimetype == "multipart/form-data":
+        try:
+            files, fields = ingest_multipart_files(request.stream, request.content_type, request.content_length,
+                                                   UPLOAD_FOLDER, field_names=("files", "file"),
+                                                   max_files=API_MAX_FILES, max_bytes=API_MAX_UPLOAD_BYTES)
+        except UploadRejected as e:
+            return jsonify(error=str(e)), e.status
+        items.extend(("upload", f) for f in files)
+        paths = [p.strip() for p in fields.get("paths", "").splitlines() if p.strip()]
+        full = fields.get("full", "").lower() in ("1", "true", "yes")
+    else:
+        payload = request.get_json(silent=True)
+        if not isinstance(payload, dict) or not isinstance(payload.get("paths", []), list):
+            return jsonify(error="Expected multipart/form-data files or a JSON body with a `paths` list"), 400
+        paths = [str(p) for p in payload.get("paths", [])]
+        full = bool(payload.get("full", False))
+
+    if len(items) + len(paths) > API_MAX_FILES:
+        return jsonify(error=f"At most {API_MAX_FILES} files per request"), 413
+    for p in paths:
+        try:
+            items.append(("path", ingest_local_path(p, API_PATH_ROOTS)))
+        except UploadRejected as e:
+            items.append(("path", e))
+    if not items:
+        return jsonify(error="No files or paths given"), 400
+    full = full or not CASCADE_ENABLED
+
+    accepted = [(_job_cost(item), _api_analyze_item, (item, source, full))
+                for source, item in items if isinstance(item, IngestedFile)]
+    api_queued.inc(len(accepted))
+    try:
+        submitted = iter(scheduler.submit_all(user, accepted))
+    except Overloaded as e:
+        api_queued.dec(len(accepted))
+        _count_rejection("budget")
+        state.return_token(user, RATE_BURST)
+        return jsonify(error=str(e), retry_after=e.retry_after), 429, {"Retry-After": str(e.retry_after)}
+    futures = [next(submitted) if isinstance(item, IngestedFile) else None for _, item in items]
+    results = []
+    for (source, item), future in zip(items, futures):
+        if future is None:
+            results.append(_api_error(item, source))
+            continue
+        try:
+            results.append(future.result())
+        except Exception as e:
+            results.append({"source": source, "filename": item.filename, "sha256": item.sha256,
+                            "status": "failed", "error": str(e)})
+
+    return jsonify(results=results, batch={
+        "files": len(results),
+        "analyzed": sum(1 for r in results if r["status"] == "ok"),
+        "workers": JOB_WORKERS,
+        "seconds": round(time.perf_counter() - t0, 3),
+        "face_mesh_graphs": {"created": face_meshes.created, "reused": face_meshes.reused},
+    })
+
+@app.route("/api/v1/rescore", methods=["POST"])
+def api_rescore():
+    """
+    Re-score every stored analysis under threshold overrides, e.g.
+    {"thresholds": {"flicker_detection": {"threshold": 12}}, "modules": ["flicker_detection"]}.
+    Overrides apply on top of the active config; nothing is decoded or re-analyzed.
+    """
+    if _api_user() is None:
+        return jsonify(error="Unauthorized"), 401
+    body = request.get_json(silent=True) or {}
+    overrides = body.get("thresholds", {}) if isinstance(body, dict) else None
+    if not isinstance(overrides, dict) or not all(isinstance(v, dict) for v in overrides.values()):
+        return jsonify(error="Expected a JSON body with a `thresholds` object of {module: {name: value}}"), 400
+    modules = body.get("modules")
+    if modules is not None and not isinstance(modules, list):
+        return jsonify(error="`modules` must be a list"), 400
+    config = thresholds.merge(overrides, thresholds.THRESHOLDS)
+    return jsonify(rescore_corpus(series_store, config, modules))
+
+@app.route("/assets/base.css")
+def stylesheet():
+    # Compressed once at start-up; the ETag differs per encoding
+    compressed = _accepts_gzip()
+    response = Response(CSS_GZIP if compressed else CSS_BYTES, mimetype="text/css")
+    if compressed:
+        response.headers["Content-Encoding"] = "gzip"
+    response.vary.add("Accept-Encoding")
+    response.set_etag(CSS_VERSION + ("-gzip" if compressed else ""))
+    response.headers["Cache-Control"] = f"public, max-age={CSS_MAX_AGE}, immutable"
+    return response.make_conditional(request)
+
+@app.route("/metrics")
+def metrics():
+    if not METRICS_PUBLIC and _api_user() is None:
+        return Response("Unauthorized\n", status=401, mimetype="text/plain")
+    return Response(REGISTRY.render_prometheus(), mimetype="text/plain; version=0.0.4")
 
 @app.route("/logout")
 def logout():
     session.pop("user", None)
     return redirect(url_for("index"))
 
+if WARMUP:
+    analyzers.start_warm_up(WARMUP_DELAY, then=_prewarm_face_meshes)
+
+# -----------------------------
+# Production serving (gunicorn.conf.py): the master imports this module
+# and calls preload() before forking the workers; each worker then calls
+# post_fork().
+# -----------------------------
+# Built in each worker instead: threads (the model server's, TensorFlow's)
+# do not survive fork()
+FORK_UNSAFE_MODULES = {"cnn_detector"}
+
+def preload():
+    """Import the fork-safe analyzers in the master, so the workers share those pages copy-on-write."""
+    analyzers.warm_up([a.module_key for a in analyzers if a.module_key not in FORK_UNSAFE_MODULES])
+    state.close()
+    # Everything loaded so far is left alone by the workers' garbage
+    # collections, which would otherwise write to (and so copy) its pages
+    gc.freeze()
+
+def post_fork():
+    """In each worker: load the CNN model server and build the FaceMesh graphs in the background."""
+    analyzers.start_warm_up(0, then=_prewarm_face_meshes)
+
 # -----------------------------
 # Run the Flask application
 # -----------------------------
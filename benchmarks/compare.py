@@ -0,0 +1,99 @@
+import sys
+import json
+import argparse
+
+# Run from the repository root: python -m benchmarks.compare benchmarks/baseline.json benchmarks/results/latest.json
+
+FPS_TOLERANCE = 0.10   # flag a throughput drop of more than 10%
+RSS_TOLERANCE = 0.15   # flag a peak RSS increase of more than 15%
+MACHINE_KEYS = ("system", "machine", "processor", "cpu_count", "python")
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _by_key(report):
+    return {(r["input"], r["module"]): r for r in report["results"] if r["status"] == "ok"}
+
+
+def compare(baseline, current, fps_tolerance=FPS_TOLERANCE, rss_tolerance=RSS_TOLERANCE):
+    """
+    Match the results of two benchmark reports by (input, module); a pair that
+    worked in the baseline and fails now counts as a regression.
+
+    Returns:
+        list: one row per pair, {"input", "module", "fps", "base_fps", "fps_change",
+              "peak_rss_mb", "base_peak_rss_mb", "rss_change", "regressions": [...]}
+    """
+    base = _by_key(baseline)
+    rows = []
+    for result in sorted(current["results"], key=lambda r: (r["input"], r["module"])):
+        key = (result["input"], result["module"])
+        previous = base.get(key)
+        if previous is None:
+            continue
+        if result["status"] != "ok":
+            rows.append({"input": key[0], "module": key[1], "fps": None, "base_fps": previous["fps"],
+                         "peak_rss_mb": None, "base_peak_rss_mb": previous.get("peak_rss_mb"),
+                         "fps_change": None, "rss_change": None, "regressions": ["failed"]})
+            continue
+        row = {"input": key[0], "module": key[1], "fps": result["fps"], "base_fps": previous["fps"],
+               "peak_rss_mb": result.get("peak_rss_mb"), "base_peak_rss_mb": previous.get("peak_rss_mb"),
+               "fps_change": None, "rss_change": None, "regressions": []}
+        if previous["fps"]:
+            row["fps_change"] = result["fps"] / previous["fps"] - 1
+            if row["fps_change"] < -fps_tolerance:
+                row["regressions"].append("fps")
+        if row["peak_rss_mb"] and row["base_peak_rss_mb"]:
+            row["rss_change"] = row["peak_rss_mb"] / row["base_peak_rss_mb"] - 1
+            if row["rss_change"] > rss_tolerance:
+                row["regressions"].append("peak_rss")
+        rows.append(row)
+    return rows
+
+
+def machine_differences(baseline, current):
+    base, now = baseline["meta"]["machine"], current["meta"]["machine"]
+    return [f"{k}: {base.get(k)} -> {now.get(k)}" for k in MACHINE_KEYS if base.get(k) != now.get(k)]
+
+
+def _pct(value):
+    return f"{value:+.1%}" if value is not None else "n/a"
+
+
+def print_comparison(rows, baseline, current):
+    differences = machine_differences(baseline, current)
+    if differences:
+        print("[WARNING] Reports come from different machines; numbers are not comparable:")
+        for line in differences:
+            print(f"    {line}")
+    print(f"{'input':<30} {'module':<20} {'fps':>8} {'base':>8} {'change':>8} {'RSS MB':>8} {'change':>8}")
+    for r in rows:
+        rss = f"{r['peak_rss_mb']:.0f}" if r["peak_rss_mb"] else "n/a"
+        flag = "  REGRESSION: " + ", ".join(r["regressions"]) if r["regressions"] else ""
+        fps = f"{r['fps']:.1f}" if r["fps"] is not None else "n/a"
+        print(f"{r['input']:<30} {r['module']:<20} {fps:>8} {r['base_fps']:>8.1f} "
+              f"{_pct(r['fps_change']):>8} {rss:>8} {_pct(r['rss_change']):>8}{flag}")
+    regressed = sum(1 for r in rows if r["regressions"])
+    print(f"\n{len(rows)} results compared, {regressed} regressed")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flag benchmark regressions against a stored baseline")
+    parser.add_argument("baseline", help="baseline report (JSON from benchmarks.run)")
+    parser.add_argument("current", help="report to check")
+    parser.add_argument("--fps-tolerance", type=float, default=FPS_TOLERANCE)
+    parser.add_argument("--rss-tolerance", type=float, default=RSS_TOLERANCE)
+    args = parser.parse_args()
+
+    baseline, current = load(args.baseline), load(args.current)
+    rows = compare(baseline, current, args.fps_tolerance, args.rss_tolerance)
+    if print_comparison(rows, baseline, current):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
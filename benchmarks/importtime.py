@@ -0,0 +1,138 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+import numpy as np
+
+# Run from the repository root:
+#   python -m benchmarks.importtime
+#   python -m benchmarks.importtime --warm --compare benchmarks/importtime-baseline.json
+
+RESULTS_PATH = os.path.join("benchmarks", "results", "importtime.json")
+TOP = 15
+TOLERANCE = 0.25            # import time may grow this much (fraction) before it is flagged
+MIN_REGRESSION_MS = 50      # ... and by at least this much, so noise on a fast import is not
+# Imported in a fresh interpreter with -X importtime; prints what the parent cannot see
+CHILD = """
+import json, time
+t0 = time.perf_counter()
+import {target}
+seconds = time.perf_counter() - t0
+warm = None
+if {warm}:
+    t0 = time.perf_counter()
+    {target}.analyzers.warm_up()
+    warm = time.perf_counter() - t0
+from explainability.memory import rss_mb
+print(json.dumps({{"import_seconds": seconds, "warm_up_seconds": warm, "rss_mb": rss_mb()}}))
+"""
+
+
+def parse_importtime(stderr):
+    """[(module, self us, cumulative us, depth)] from the `import time:` lines of -X importtime."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def summarize(rows, top=TOP):
+    """Totals, self time per top-level package and the slowest single modules."""
+    packages = {}
+    for name, self_us, _, _ in rows:
+        package = name.split(".", 1)[0]
+        packages[package] = packages.get(package, 0) + self_us
+    return {
+        "modules_imported": len(rows),
+        "total_ms": round(sum(c for _, _, c, depth in rows if depth == 0) / 1000, 1),
+        "packages_ms": {p: round(us / 1000, 1) for p, us in sorted(packages.items(), key=lambda kv: -kv[1])[:top]},
+        "slowest_modules_ms": {name: round(us / 1000, 1) for name, us, _, _ in sorted(rows, key=lambda r: -r[1])[:top]},
+        "packages": sorted(packages),
+    }
+
+
+def measure(target, warm=False, repeat=3, top=TOP):
+    """Import `target` in `repeat` fresh interpreters; the import-time breakdown is the last run's."""
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-X", "importtime", "-c", CHILD.format(target=target, warm=warm)],
+                             capture_output=True, text=True)
+        if out.returncode != 0:
+            raise RuntimeError(f"import {target} failed:\n{out.stderr[-2000:]}")
+        runs.append((json.loads(out.stdout.strip().splitlines()[-1]), out.stderr))
+    result, stderr = runs[-1]
+    report = {
+        "target": target,
+        "import_seconds": [round(r["import_seconds"], 4) for r, _ in runs],
+        "median_import_seconds": round(float(np.median([r["import_seconds"] for r, _ in runs])), 4),
+        "rss_mb": round(result["rss_mb"], 1) if result["rss_mb"] is not None else None,
+    }
+    if warm:
+        report["median_warm_up_seconds"] = round(float(np.median([r["warm_up_seconds"] for r, _ in runs])), 4)
+    report.update(summarize(parse_importtime(stderr), top))
+    return report
+
+
+def compare(baseline, report, tolerance=TOLERANCE):
+    """Regression messages: slower import of the target, or packages it did not import before."""
+    problems = []
+    before, after = baseline["median_import_seconds"], report["median_import_seconds"]
+    if after > before * (1 + tolerance) and (after - before) * 1000 >= MIN_REGRESSION_MS:
+        problems.append(f"import {report['target']}: {before * 1000:.0f} ms -> {after * 1000:.0f} ms")
+    new = sorted(set(report["packages"]) - set(baseline["packages"]))
+    if new:
+        problems.append("now imported at start-up: " + ", ".join(new))
+    return problems
+
+
+def print_report(report):
+    print(f"import {report['target']}: {report['median_import_seconds'] * 1000:.0f} ms median "
+          f"({report['modules_imported']} modules), RSS {report['rss_mb']} MB")
+    if "median_warm_up_seconds" in report:
+        print(f"analyzer warm-up: {report['median_warm_up_seconds']:.2f} s")
+    print(f"\n{'package':<32} {'self ms':>9}")
+    for package, ms in report["packages_ms"].items():
+        print(f"{package:<32} {ms:>9.1f}")
+    print(f"\n{'module':<48} {'self ms':>9}")
+    for module, ms in report["slowest_modules_ms"].items():
+        print(f"{module:<48} {ms:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Start-up import time report (python -X importtime)")
+    parser.add_argument("--target", default="app", help="module whose import is measured")
+    parser.add_argument("--warm", action="store_true", help="also time <target>.analyzers.warm_up()")
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters to time")
+    parser.add_argument("--top", type=int, default=TOP, help="packages / modules listed")
+    parser.add_argument("--out", default=RESULTS_PATH, help="JSON report")
+    parser.add_argument("--compare", metavar="BASELINE", help="flag regressions against this report")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    report = measure(args.target, args.warm, args.repeat, args.top)
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print_report(report)
+    print(f"\nReport written to {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        problems = compare(baseline, report, args.tolerance)
+        print()
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        if problems:
+            sys.exit(1)
+        print("No import-time regressions.")
+
+
+if __name__ == "__main__":
+    main()
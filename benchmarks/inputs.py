@@ -0,0 +1,97 @@
+import os
+import math
+
+import cv2
+import numpy as np
+
+SAMPLE_INPUTS = {
+    "sample_real": os.path.join("uploads", "01__exit_phone_room.mp4"),
+    "sample_fake": os.path.join("uploads", "01_02__exit_phone_room__YVGY8LOK.mp4"),
+    "sample_image": os.path.join("uploads", "frame_001.jpg"),
+}
+SYNTHETIC_DIR = os.path.join("cache", "benchmarks")
+SYNTHETIC_FPS = 30
+# Picture the synthetic clips are made of, so the face analyzers find a face
+SOURCE_IMAGE = SAMPLE_INPUTS["sample_image"]
+PAN_MARGIN = 0.05     # fraction of each side the camera pans over
+NOISE_LEVEL = 4       # +/- grey levels of per-frame sensor noise
+
+
+def parse_spec(spec):
+    """"640x360x150" -> (640, 360, 150): width, height and frame count."""
+    try:
+        width, height, frames = (int(v) for v in spec.lower().split("x"))
+    except ValueError:
+        raise ValueError(f"Synthetic video spec must be WIDTHxHEIGHTxFRAMES, got {spec!r}")
+    if min(width, height, frames) <= 0:
+        raise ValueError(f"Synthetic video spec must be positive, got {spec!r}")
+    return width, height, frames
+
+
+def synthetic_video(width, height, frames, fps=SYNTHETIC_FPS, out_dir=SYNTHETIC_DIR, source=SOURCE_IMAGE):
+    """
+    Write (once) a clip of the source picture with a slow pan and sensor noise.
+
+    The motion and noise keep the encoder and the per-frame analyzers doing real
+    work; the fixed seed makes the clip identical on every machine.
+
+    Returns:
+        str: path of the .mp4
+    """
+    path = os.path.join(out_dir, f"synthetic_{width}x{height}x{frames}.mp4")
+    if os.path.exists(path):
+        return path
+    os.makedirs(out_dir, exist_ok=True)
+
+    margin_x, margin_y = int(width * PAN_MARGIN), int(height * PAN_MARGIN)
+    picture = cv2.imread(source)
+    if picture is None:
+        # No sample picture: a gradient still gives the decoder something to do
+        picture = np.dstack([np.tile(np.linspace(0, 255, width, dtype=np.uint8), (height, 1))] * 3)
+    picture = cv2.resize(picture, (width + 2 * margin_x, height + 2 * margin_y))
+
+    tmp_path = f"{path}.{os.getpid()}.tmp.mp4"
+    writer = cv2.VideoWriter(tmp_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Cannot write {tmp_path}: no mp4v encoder in this OpenCV build")
+    rng = np.random.default_rng(0)
+    try:
+        for i in range(frames):
+            phase = 2 * math.pi * i / (4 * fps)   # one pan cycle every 4 seconds
+            x = int(round(margin_x * (1 + math.sin(phase))))
+            y = int(round(margin_y * (1 + math.cos(phase))))
+            frame = picture[y:y + height, x:x + width].astype(np.int16)
+            frame += rng.integers(-NOISE_LEVEL, NOISE_LEVEL + 1, size=frame.shape, dtype=np.int16)
+            writer.write(np.clip(frame, 0, 255).astype(np.uint8))
+    finally:
+        writer.release()
+    os.replace(tmp_path, path)
+    return path
+
+
+def frame_count(path):
+    """Frames in a video (1 for a still image)."""
+    cap = cv2.VideoCapture(path)
+    try:
+        return max(1, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+    finally:
+        cap.release()
+
+
+def resolve_inputs(names, specs):
+    """
+    {input name: path} for the chosen sample inputs and synthetic specs.
+
+    Synthetic clips are generated on first use and cached under SYNTHETIC_DIR.
+    """
+    inputs = {}
+    for name in names:
+        path = SAMPLE_INPUTS[name]
+        if os.path.exists(path):
+            inputs[name] = path
+        else:
+            print(f"[WARNING] Skipping {name} – not found: {path}")
+    for spec in specs:
+        width, height, frames = parse_spec(spec)
+        inputs[f"synthetic_{width}x{height}x{frames}"] = synthetic_video(width, height, frames)
+    return inputs
@@ -0,0 +1,376 @@
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import hashlib
+import functools
+import socket
+import struct
+import argparse
+import threading
+import subprocess
+import http.client
+from urllib.parse import urlsplit, urlencode
+
+import numpy as np
+
+# Run from the repository root. Against a server started here with stubbed analyzers:
+#   python -m benchmarks.load_test --start-server --stub cpu:50,sleep:200 --concurrency 8 --duration 60
+# Against a server that is already running (serve stub_app() instead of app:app to stub it, e.g.
+# gunicorn 'benchmarks.load_test:stub_app("cpu:50")'):
+#   python -m benchmarks.load_test --url http://127.0.0.1:5000 --concurrency 4 --uploads 5
+
+SOURCE_VIDEO = os.path.join("uploads", "01__exit_phone_room.mp4")
+UPLOAD_FOLDER = "uploads"
+UPLOAD_PREFIX = "load-"     # file name prefix of every upload (the server stores it as <sha256>.mp4)
+DEFAULT_URL = "http://127.0.0.1:5000"
+PASSWORD = "loadtest-password"
+CHUNK_SIZE = 256 * 1024
+PERCENTILES = (50, 90, 95, 99)
+JOB_TIMEOUT = 600
+SERVER_START_TIMEOUT = 120
+PHASES = ("signup", "login", "upload", "job")
+
+
+def stub_work(spec):
+    """
+    A callable doing the fixed work of `spec`, to load-test the serving layer
+    on its own: "cpu:50" burns 50 ms of CPU, "sleep:200" waits 200 ms,
+    "cpu:50,sleep:200" both.
+    """
+    steps = []
+    for part in spec.split(","):
+        kind, _, ms = part.strip().partition(":")
+        if kind not in ("cpu", "sleep") or not ms.replace(".", "", 1).isdigit():
+            raise ValueError(f"Stub analyzers: expected cpu:<ms> / sleep:<ms> steps, got {part!r}")
+        steps.append((kind, float(ms) / 1000))
+
+    def work():
+        for kind, seconds in steps:
+            if kind == "sleep":
+                time.sleep(seconds)
+            else:
+                # CPU time of this thread, so the cost is the same however busy the server is
+                end = time.thread_time() + seconds
+                while time.thread_time() < end:
+                    pass
+    return work
+
+
+def _stub_analyzer(module_key, spec, work, path, source=None, **kwargs):
+    work()
+    return f"Stub `{module_key}` ({spec}) for `{source or os.path.basename(path)}`.\n"
+
+
+def _stubbed():
+    raise ImportError("analyzer replaced by a load-test stub")
+
+
+def stub_app(spec):
+    """
+    app.py's Flask app with every analyzer replaced by a placeholder doing the
+    fixed work of `spec` (see stub_work), e.g.
+    flask --app 'benchmarks.load_test:stub_app("cpu:50")' run
+    """
+    import app
+    work = stub_work(spec)   # a malformed spec fails at start-up, not on the first upload
+    for analyzer in list(app.analyzers):
+        stub = functools.partial(_stub_analyzer, analyzer.module_key, spec, work)
+        stub.is_placeholder = True
+        app.analyzers.register(analyzer.name, analyzer.module_key, _stubbed, lambda stub=stub: stub)
+    app.ANALYSIS_MODULES[:] = [(a.name, a.module_key, a) for a in app.analyzers]
+    return app.app
+
+
+class Client:
+    """One virtual user: a keep-alive connection and the session cookie."""
+
+    def __init__(self, url, timeout=JOB_TIMEOUT):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.timeout = timeout
+        self.cookie = None
+        self.conn = None
+
+    def request(self, method, path, body=None, headers=None, stream=False):
+        """(status, response, body bytes or None when `stream`: read from the response)"""
+        headers = dict(headers or {})
+        if self.cookie:
+            headers["Cookie"] = self.cookie
+        for attempt in (0, 1):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.conn.request(method, path, body=body, headers=headers)
+                response = self.conn.getresponse()
+                break
+            except (ConnectionError, http.client.HTTPException):
+                # Server closed the kept-alive connection: retry once on a new one
+                self.conn.close()
+                self.conn = None
+                if attempt or (body is not None and not isinstance(body, (bytes, str))):
+                    raise
+        cookie = response.getheader("Set-Cookie")
+        if cookie:
+            self.cookie = cookie.split(";", 1)[0]
+        if stream:
+            return response.status, response, None
+        return response.status, response, response.read()
+
+    def form(self, path, fields):
+        return self.request("POST", path, urlencode(fields),
+                            {"Content-Type": "application/x-www-form-urlencoded"})
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+
+
+def upload_body(source, size, boundary):
+    """
+    Multipart body with the source video padded to `size` bytes.
+
+    The padding is an MP4 "free" box carrying a random token, so the file still
+    decodes and every upload has its own content hash (no result-cache hits).
+
+    Returns:
+        (iterator of bytes, content length, sha256 of the file part, complete
+         once the iterator is exhausted)
+    """
+    source_size = os.path.getsize(source)
+    padding = max(0, size - source_size)
+    if 0 < padding < 24:
+        padding = 24
+    head = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; "
+            f"filename=\"{UPLOAD_PREFIX}{uuid.uuid4().hex[:8]}.mp4\"\r\nContent-Type: video/mp4\r\n\r\n").encode()
+    tail = f"\r\n--{boundary}--\r\n".encode()
+    sha = hashlib.sha256()
+
+    def chunks():
+        yield head
+        with open(source, "rb") as f:
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                sha.update(chunk)
+                yield chunk
+        if padding:
+            box = struct.pack(">I4s", padding, b"free") + uuid.uuid4().bytes
+            sha.update(box)
+            yield box
+            remaining = padding - 24
+            zeros = bytes(min(CHUNK_SIZE, remaining))
+            while remaining > 0:
+                sha.update(zeros[:remaining])
+                yield zeros[:remaining]
+                remaining -= len(zeros)
+        yield tail
+
+    return chunks(), len(head) + source_size + padding + len(tail), sha
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = {phase: [] for phase in PHASES}
+        self.errors = {phase: {} for phase in PHASES}
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+
+    def ok(self, phase, seconds, size=0):
+        with self._lock:
+            self.latencies[phase].append(seconds)
+            self.bytes_sent += size
+
+    def error(self, phase, reason):
+        with self._lock:
+            self.errors[phase][reason] = self.errors[phase].get(reason, 0) + 1
+
+    def report(self, elapsed):
+        phases = {}
+        for phase in PHASES:
+            times = np.asarray(self.latencies[phase]) * 1000
+            errors = sum(self.errors[phase].values())
+            total = len(times) + errors
+            entry = {"ok": len(times), "errors": errors, "error_rate": errors / total if total else 0.0,
+                     "error_reasons": self.errors[phase], "throughput_per_s": len(times) / elapsed}
+            if len(times):
+                entry.update({f"p{p}_ms": float(np.percentile(times, p)) for p in PERCENTILES},
+                             mean_ms=float(times.mean()), max_ms=float(times.max()))
+            phases[phase] = entry
+        return {"seconds": elapsed, "upload_mb_per_s": self.bytes_sent / elapsed / 1024 ** 2, "phases": phases}
+
+
+def _timed(stats, phase, call, expect, size=0):
+    """Run call() -> (status, response, body); record latency or the failure reason."""
+    t0 = time.perf_counter()
+    try:
+        status, response, body = call()
+    except (OSError, http.client.HTTPException) as e:
+        stats.error(phase, type(e).__name__)
+        return None
+    if status not in expect:
+        stats.error(phase, f"HTTP {status}")
+        return None
+    stats.ok(phase, time.perf_counter() - t0, size)
+    return response, body
+
+
+def wait_for_job(client, job_path, stats):
+    """Follow the job's SSE stream until the server closes it (analysis finished)."""
+    t0 = time.perf_counter()
+    try:
+        status, response, _ = client.request("GET", f"{job_path}/events", stream=True)
+        if status != 200:
+            response.read()
+            stats.error("job", f"HTTP {status}")
+            return
+        finished = False
+        for line in response:
+            finished = finished or line.startswith(b"event: done")
+        response.close()
+        # The stream's connection cannot be reused
+        client.conn.close()
+        client.conn = None
+    except (OSError, http.client.HTTPException) as e:
+        stats.error("job", type(e).__name__)
+        return
+    if not finished:
+        stats.error("job", "stream ended without a done event")
+    else:
+        stats.ok("job", time.perf_counter() - t0)
+
+
+def virtual_user(index, args, stats, deadline):
+    client = Client(args.url)
+    username = f"load{index}-{uuid.uuid4().hex[:8]}"
+    try:
+        if _timed(stats, "signup", lambda: client.form("/signup", {
+                "username": username, "email": f"{username}@example.com",
+                "password": PASSWORD, "confirm_password": PASSWORD}), (302,)) is None:
+            return
+        client.cookie = None
+        if _timed(stats, "login", lambda: client.form("/login", {"username": username, "password": PASSWORD}),
+                  (302,)) is None:
+            return
+
+        done = 0
+        while (args.uploads is None or done < args.uploads) and (deadline is None or time.time() < deadline):
+            size = args.sizes_bytes[(index + done) % len(args.sizes_bytes)]
+            boundary = uuid.uuid4().hex
+            body, length, sha = upload_body(args.video, size, boundary)
+            headers = {"Content-Type": f"multipart/form-data; boundary={boundary}", "Content-Length": str(length)}
+            result = _timed(stats, "upload", lambda: client.request("POST", "/upload" + ("?full=1" if args.full else ""),
+                                                                     body, headers), (302, 303), length)
+            done += 1
+            args.stored.append(os.path.join(UPLOAD_FOLDER, sha.hexdigest() + ".mp4"))
+            if result is None:
+                continue
+            location = result[0].getheader("Location", "")
+            match = re.search(r"(/jobs/[^/?#]+)", location)
+            if not args.no_wait and match:
+                wait_for_job(client, match.group(1), stats)
+    finally:
+        client.close()
+
+
+def _port_open(host, port):
+    with socket.socket() as s:
+        s.settimeout(0.5)
+        return s.connect_ex((host, port)) == 0
+
+
+def start_server(url, stub):
+    """Serve app.py from a child process (Flask's threaded server), optionally with stubbed analyzers."""
+    parts = urlsplit(url)
+    if _port_open(parts.hostname, parts.port or 80):
+        raise RuntimeError(f"Something is already listening on {parts.netloc}")
+    if stub:
+        stub_work(stub)   # a malformed spec fails here, not in the child
+    target = f"benchmarks.load_test:stub_app({stub!r})" if stub else "app"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "flask", "--app", target, "run", "--host", parts.hostname,
+         "--port", str(parts.port or 80), "--no-reload", "--no-debugger", "--with-threads"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + SERVER_START_TIMEOUT
+    while not _port_open(parts.hostname, parts.port or 80):
+        if server.poll() is not None or time.time() > deadline:
+            server.kill()
+            raise RuntimeError("Server did not start")
+        time.sleep(0.25)
+    return server
+
+
+def print_report(report):
+    print(f"\n{'phase':<8} {'ok':>6} {'errors':>6} {'err %':>6} {'req/s':>7} "
+          + " ".join(f"{f'p{p} ms':>9}" for p in PERCENTILES) + f" {'max ms':>9}")
+    for phase, e in report["phases"].items():
+        if not e["ok"] and not e["errors"]:
+            continue
+        cells = " ".join(f"{e.get(f'p{p}_ms', float('nan')):>9.1f}" for p in PERCENTILES)
+        print(f"{phase:<8} {e['ok']:>6} {e['errors']:>6} {100 * e['error_rate']:>6.1f} "
+              f"{e['throughput_per_s']:>7.2f} {cells} {e.get('max_ms', float('nan')):>9.1f}")
+        for reason, count in e["error_reasons"].items():
+            print(f"           {count} x {reason}")
+    print(f"\n{report['seconds']:.1f}s, {report['upload_mb_per_s']:.1f} MB/s uploaded")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the signup / login / upload flow")
+    parser.add_argument("--url", default=DEFAULT_URL, help="server to test")
+    parser.add_argument("--start-server", action="store_true", help="serve app.py at --url for the duration of the test")
+    parser.add_argument("--stub", default="cpu:50,sleep:200",
+                        help="with --start-server: stub analyzers' work, see stub_work() ('' runs the real analyzers)")
+    parser.add_argument("--concurrency", type=int, default=4, help="virtual users")
+    parser.add_argument("--duration", type=float, help="seconds to keep uploading (default: until --uploads are done)")
+    parser.add_argument("--uploads", type=int, help="uploads per virtual user")
+    parser.add_argument("--sizes", type=float, nargs="+", default=[2.0],
+                        help="upload sizes in MB, used in turn (the video is padded, never truncated)")
+    parser.add_argument("--video", default=SOURCE_VIDEO, help="video every upload is made from")
+    parser.add_argument("--full", action="store_true", help="ask for every module (no cascade early exit)")
+    parser.add_argument("--no-wait", action="store_true", help="do not wait for each analysis to finish")
+    parser.add_argument("--json", dest="json_out", help="also write the report here")
+    args = parser.parse_args()
+
+    if args.duration is None and args.uploads is None:
+        args.uploads = 3
+    source_size = os.path.getsize(args.video)
+    args.sizes_bytes = [max(source_size, int(mb * 1024 ** 2)) for mb in args.sizes]
+
+    args.stored = []    # where the server keeps each upload, for the clean-up of a local run
+    server = start_server(args.url, args.stub) if args.start_server else None
+    stats = Stats()
+    try:
+        deadline = time.time() + args.duration if args.duration else None
+        users = [threading.Thread(target=virtual_user, args=(i, args, stats, deadline), daemon=True)
+                 for i in range(args.concurrency)]
+        start = time.perf_counter()
+        for user in users:
+            user.start()
+        for user in users:
+            user.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+            for path in args.stored:
+                if os.path.exists(path):
+                    os.remove(path)
+
+    report = stats.report(elapsed)
+    report["config"] = {"url": args.url, "concurrency": args.concurrency, "duration": args.duration,
+                        "uploads": args.uploads, "sizes_mb": args.sizes, "full": args.full,
+                        "stub": args.stub if args.start_server else None}
+    print_report(report)
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(report, f, indent=2)
+    if not stats.latencies["upload"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import importlib
+import threading
+import contextlib
+import tracemalloc
+import multiprocessing as mp_proc
+
+from benchmarks.inputs import SAMPLE_INPUTS, resolve_inputs, frame_count
+from benchmarks.run import MODULES, MODEL_PATH
+from explainability.memory import MemoryBudget, rss_mb, peak_rss_mb
+
+# Run from the repository root:
+#   python -m benchmarks.memory_profile --synthetic 640x360x1800
+#   python -m benchmarks.memory_profile --modules eye_blink_mismatch --budget 50
+
+RESULTS_PATH = os.path.join("benchmarks", "results", "memory.json")
+# Analyzers without a main(): their entry point
+ENTRY_POINTS = {"blink_detector": "process_video", "head_pose_inconsistency": "analyze_video"}
+PROFILED_MODULES = MODULES + list(ENTRY_POINTS)
+TRACE_DEPTH = 1             # frames kept per traceback: allocation sites are grouped by line
+SAMPLE_INTERVAL = 0.05      # seconds between RSS samples
+SNAPSHOT_GROWTH = 1.1       # new allocation-site snapshot once traced memory grows 10% past the last one
+TOP_SITES = 10
+_IGNORED = (tracemalloc.__file__, __file__, "<frozen importlib._bootstrap>", "<frozen importlib._bootstrap_external>",
+            "<unknown>")
+
+
+class Sampler(threading.Thread):
+    """
+    Samples RSS and traced memory while an analyzer runs.
+
+    Allocation sites are read from tracemalloc snapshots taken whenever traced
+    memory reaches a new high (by SNAPSHOT_GROWTH), so the last snapshot shows
+    what was alive near the peak rather than after the analyzer returned.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.start_rss = rss_mb()
+        self.max_rss = self.start_rss
+        self.snapshot = None
+        self._snapshot_size = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        rss = rss_mb()
+        if rss is not None:
+            self.max_rss = max(self.max_rss or 0, rss)
+        traced, _ = tracemalloc.get_traced_memory()
+        if traced > self._snapshot_size * SNAPSHOT_GROWTH:
+            self.snapshot = tracemalloc.take_snapshot()
+            self._snapshot_size = traced
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.sample()
+
+
+def allocation_sites(snapshot, top=TOP_SITES):
+    """The `top` source lines holding the most traced memory in `snapshot`."""
+    if snapshot is None:
+        return []
+    snapshot = snapshot.filter_traces([tracemalloc.Filter(False, pattern) for pattern in _IGNORED])
+    sites = []
+    for stat in snapshot.statistics("lineno")[:top]:
+        frame = stat.traceback[0]
+        filename = os.path.relpath(frame.filename) if frame.filename.startswith(os.getcwd()) else frame.filename
+        sites.append({"site": f"{filename}:{frame.lineno}", "mb": round(stat.size / 1024 ** 2, 3),
+                      "blocks": stat.count})
+    return sites
+
+
+def _profile(task):
+    """Profile one (input, module) pair in a fresh process."""
+    name, path, module, top, budget_mb, model_path = task
+    frames = frame_count(path)
+    result = {"input": name, "module": module, "frames": frames}
+    try:
+        analyzer = importlib.import_module(f"explainability.{module}")
+        entry = getattr(analyzer, ENTRY_POINTS.get(module, "main"))
+        kwargs = {}
+        if module == "cnn_detector":
+            # Model weights are loaded before tracing starts: they are not the analyzer's growth
+            from serving.model_server import start_model_server
+            kwargs["server"] = start_model_server(model_path)
+        budget = None
+        if budget_mb and module not in ENTRY_POINTS:
+            budget = kwargs["budget"] = MemoryBudget(budget_mb)
+
+        tracemalloc.start(TRACE_DEPTH)
+        sampler = Sampler()
+        sampler.start()
+        t0 = time.perf_counter()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                output = entry(path, **kwargs)
+        finally:
+            seconds = time.perf_counter() - t0
+            sampler.stop()
+            # Still traced while `output` is alive: what the returned result holds on to
+            retained, peak_traced = tracemalloc.get_traced_memory()
+            sites = allocation_sites(sampler.snapshot, top)
+            tracemalloc.stop()
+    except Exception as e:
+        result.update(status="failed", error=f"{type(e).__name__}: {e}")
+        return result
+
+    result.update(
+        status="ok",
+        seconds=round(seconds, 3),
+        peak_traced_mb=round(peak_traced / 1024 ** 2, 3),
+        retained_mb=round(retained / 1024 ** 2, 3),
+        rss_growth_mb=round(sampler.max_rss - sampler.start_rss, 1) if sampler.start_rss is not None else None,
+        peak_rss_mb=peak_rss_mb(),
+        sites=sites,
+    )
+    if budget is not None:
+        result["budget"] = {"limit_mb": budget_mb, "degraded": budget.degraded, "stride": budget.stride,
+                            "sampled_from_frame": budget.degraded_at,
+                            "peak_growth_mb": round(budget.peak_growth_mb, 1)}
+    return result
+
+
+def _mb(value):
+    return f"{value:.1f}" if value is not None else "n/a"
+
+
+def print_report(results):
+    print(f"\n{'input':<30} {'module':<24} {'frames':>6} {'traced MB':>9} {'kept MB':>9} "
+          f"{'RSS +MB':>8} {'peak RSS':>8}  budget")
+    for r in results:
+        if r["status"] != "ok":
+            print(f"{r['input']:<30} {r['module']:<24} {r['frames']:>6}  failed: {r['error']}")
+            continue
+        budget = r.get("budget")
+        note = ""
+        if budget:
+            note = f"1 in {budget['stride']} frames from {budget['sampled_from_frame']}" if budget["degraded"] else "kept"
+        print(f"{r['input']:<30} {r['module']:<24} {r['frames']:>6} {r['peak_traced_mb']:>9.2f} "
+              f"{r['retained_mb']:>9.3f} {_mb(r['rss_growth_mb']):>8} {_mb(r['peak_rss_mb']):>8}  {note}")
+    for r in results:
+        if r["status"] == "ok" and r["sites"]:
+            print(f"\n{r['input']} / {r['module']}: top allocation sites near the peak")
+            for site in r["sites"]:
+                print(f"    {site['mb']:>9.3f} MB {site['blocks']:>9} blocks  {site['site']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-analyzer memory profile (tracemalloc + RSS sampling)")
+    parser.add_argument("--modules", nargs="+", default=PROFILED_MODULES, choices=PROFILED_MODULES)
+    parser.add_argument("--inputs", nargs="*", default=["sample_real"], choices=list(SAMPLE_INPUTS))
+    parser.add_argument("--synthetic", nargs="*", default=[], metavar="WxHxFRAMES",
+                        help="synthetic clips (long ones show per-frame growth)")
+    parser.add_argument("--top", type=int, default=TOP_SITES, help="allocation sites listed per run")
+    parser.add_argument("--budget", type=float, default=0,
+                        help="run the analyzers under a MemoryBudget of this many MB (0 = none)")
+    parser.add_argument("--model", default=MODEL_PATH, help="CNN model for cnn_detector")
+    parser.add_argument("--out", default=RESULTS_PATH, help="JSON report")
+    args = parser.parse_args()
+
+    inputs = resolve_inputs(args.inputs, args.synthetic)
+    if not inputs:
+        print("No inputs to profile.")
+        sys.exit(1)
+
+    ctx = mp_proc.get_context("spawn")
+    tasks = [(name, path, module, args.top, args.budget, args.model)
+             for name, path in inputs.items() for module in args.modules]
+    results = []
+    with ctx.Pool(1, maxtasksperchild=1) as pool:
+        for i, result in enumerate(pool.imap(_profile, tasks), 1):
+            results.append(result)
+            status = f"{result['peak_traced_mb']:.2f} MB traced" if result["status"] == "ok" else "failed"
+            print(f"[{i}/{len(tasks)}] {result['input']} / {result['module']}: {status}")
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump({"config": {"modules": args.modules, "budget_mb": args.budget,
+                              "inputs": {name: path for name, path in inputs.items()}},
+                   "results": results}, f, indent=2)
+    print_report(results)
+    print(f"\nReport written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import socket
+import argparse
+import platform
+import tempfile
+import datetime
+import importlib
+import subprocess
+import contextlib
+import multiprocessing as mp_proc
+
+import numpy as np
+
+from benchmarks.inputs import SAMPLE_INPUTS, resolve_inputs, frame_count
+from benchmarks import compare as compare_reports
+from explainability.memory import peak_rss_mb
+
+# Run from the repository root:
+#   python -m benchmarks.run --synthetic 640x360x150 1280x720x150 --repeat 3
+#   python -m benchmarks.run --modules flicker_detection --compare benchmarks/baseline.json
+
+RESULTS_PATH = os.path.join("benchmarks", "results", "latest.json")
+MODEL_PATH = os.environ.get("DEEPFAKE_MODEL_PATH", os.path.join("models", "trained_models", "mobilenetv2_deepfake.h5"))
+MODULES = ["eye_blink_mismatch", "iris_alignment", "eyebrow_mismatch", "texture_analyzer",
+           "flicker_detection", "lip_sync_module", "cnn_detector"]
+END_TO_END = "end_to_end"   # every module through app.analyze_file (cascade off, caches empty)
+DEFAULT_SYNTHETIC = ["640x360x150", "1280x720x150"]
+
+
+def _setup(module, path, model_path):
+    """Build what one module needs once (graphs, model) and return run(i) for one timed pass."""
+    if module == END_TO_END:
+        os.environ["DEEPFAKE_MODEL_PATH"] = model_path
+        import app
+        from serving.result_cache import ResultCache
+        from serving.series_store import SeriesStore
+        # Fresh caches, and a new content hash per pass, so nothing is served from cache
+        tmp = tempfile.mkdtemp(prefix="deepfake-bench-")
+        app.result_cache = ResultCache(os.path.join(tmp, "results"), app.RESULT_CACHE_MAX_BYTES)
+        app.series_store = SeriesStore(os.path.join(tmp, "series"))
+        run = lambda i: app.analyze_file(path, f"benchmark-{i}", full=True, face_meshes=app.face_meshes)
+        return run, lambda: shutil.rmtree(tmp, ignore_errors=True)
+
+    analyzer = importlib.import_module(f"explainability.{module}")
+    kwargs = {}
+    if module == "cnn_detector":
+        from serving.model_server import start_model_server
+        kwargs["server"] = start_model_server(model_path)
+    options = getattr(analyzer, "FACE_MESH_OPTIONS", None)
+    if options is None:
+        return lambda i: analyzer.main(path, **kwargs), lambda: None
+
+    from serving.face_mesh_cache import FaceMeshCache
+    face_meshes = FaceMeshCache()
+    face_meshes.prewarm([options])
+
+    def run(i):
+        # Each lease resets the graph's tracking state between passes
+        with face_meshes.lease(**options) as face_mesh:
+            return analyzer.main(path, face_mesh=face_mesh, **kwargs)
+    return run, face_meshes.close
+
+
+def _stage_ms(module, frames):
+    """ms per decoded frame of each instrumented stage of `module`."""
+    from explainability.instrumentation import REGISTRY
+    series = REGISTRY.snapshot().get("deepfake_stage_seconds", {}).get("series", [])
+    return {e["labels"]["stage"]: round(1000 * e["sum"] / frames, 4)
+            for e in series if (module == END_TO_END or e["labels"]["module"] == module) and frames}
+
+
+def _measure(task):
+    """
+    Time one (input, module) pair in a fresh process, so peak RSS belongs to it alone.
+
+    The first pass after set-up is a warm-up and is not counted.
+    """
+    name, path, module, repeat, model_path = task
+    frames = frame_count(path)
+    result = {"input": name, "module": module, "frames": frames}
+    try:
+        t0 = time.perf_counter()
+        run, cleanup = _setup(module, path, model_path)
+        result["setup_seconds"] = round(time.perf_counter() - t0, 3)
+        seconds = []
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                run(-1)
+                from explainability.instrumentation import REGISTRY
+                REGISTRY.reset()
+                for i in range(repeat):
+                    t = time.perf_counter()
+                    run(i)
+                    seconds.append(time.perf_counter() - t)
+        finally:
+            cleanup()
+    except Exception as e:
+        result.update(status="failed", error=f"{type(e).__name__}: {e}", peak_rss_mb=peak_rss_mb())
+        return result
+
+    median = float(np.median(seconds))
+    result.update(
+        status="ok",
+        seconds=[round(s, 4) for s in seconds],
+        median_seconds=round(median, 4),
+        fps=round(frames / median, 2) if median > 0 else None,
+        ms_per_frame=round(1000 * median / frames, 3),
+        peak_rss_mb=peak_rss_mb(),
+        stages_ms_per_frame=_stage_ms(module, frames * repeat),
+    )
+    return result
+
+
+def _version(package):
+    try:
+        return importlib.import_module(package).__version__
+    except Exception:
+        return None
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def metadata(args, inputs):
+    import cv2
+    return {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "machine": {
+            "hostname": socket.gethostname(),
+            "system": platform.system(),
+            "release": platform.release(),
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+            "python": platform.python_version(),
+        },
+        "packages": {"opencv": cv2.__version__, "numpy": np.__version__,
+                     "mediapipe": _version("mediapipe"), "tensorflow": _version("tensorflow")},
+        "config": {
+            "modules": args.modules,
+            "repeat": args.repeat,
+            "model": args.model,
+            "inputs": {name: {"path": path, "frames": frame_count(path)} for name, path in inputs.items()},
+            "env": {k: v for k, v in os.environ.items() if k.startswith("DEEPFAKE_")},
+        },
+    }
+
+
+def print_results(results):
+    print(f"\n{'input':<30} {'module':<20} {'frames':>6} {'fps':>8} {'ms/frame':>9} {'RSS MB':>7}")
+    for r in results:
+        rss = f"{r['peak_rss_mb']:.0f}" if r.get("peak_rss_mb") else "n/a"
+        if r["status"] == "ok":
+            print(f"{r['input']:<30} {r['module']:<20} {r['frames']:>6} {r['fps']:>8.1f} "
+                  f"{r['ms_per_frame']:>9.2f} {rss:>7}")
+        else:
+            print(f"{r['input']:<30} {r['module']:<20} {r['frames']:>6}  failed: {r['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-module and end-to-end throughput / peak RSS benchmarks")
+    parser.add_argument("--modules", nargs="+", default=MODULES + [END_TO_END], choices=MODULES + [END_TO_END])
+    parser.add_argument("--inputs", nargs="*", default=list(SAMPLE_INPUTS), choices=list(SAMPLE_INPUTS),
+                        help="bundled sample inputs to include")
+    parser.add_argument("--synthetic", nargs="*", default=DEFAULT_SYNTHETIC, metavar="WxHxFRAMES",
+                        help="synthetic clips to generate and include")
+    parser.add_argument("--repeat", type=int, default=3, help="timed passes per input and module (after a warm-up)")
+    parser.add_argument("--model", default=MODEL_PATH, help="CNN model for cnn_detector / end_to_end")
+    parser.add_argument("--out", default=RESULTS_PATH, help="JSON report")
+    parser.add_argument("--compare", metavar="BASELINE", help="flag regressions against this report")
+    parser.add_argument("--fps-tolerance", type=float, default=compare_reports.FPS_TOLERANCE)
+    parser.add_argument("--rss-tolerance", type=float, default=compare_reports.RSS_TOLERANCE)
+    args = parser.parse_args()
+
+    inputs = resolve_inputs(args.inputs, args.synthetic)
+    if not inputs:
+        print("No inputs to benchmark.")
+        sys.exit(1)
+    report = {"meta": metadata(args, inputs), "results": []}
+
+    # spawn + one task per process: every measurement starts from a clean interpreter
+    ctx = mp_proc.get_context("spawn")
+    tasks = [(name, path, module, args.repeat, args.model) for name, path in inputs.items() for module in args.modules]
+    with ctx.Pool(1, maxtasksperchild=1) as pool:
+        for i, result in enumerate(pool.imap(_measure, tasks), 1):
+            report["results"].append(result)
+            status = f"{result['fps']:.1f} fps" if result["status"] == "ok" else "failed"
+            print(f"[{i}/{len(tasks)}] {result['input']} / {result['module']}: {status}")
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print_results(report["results"])
+    print(f"\nReport written to {args.out}")
+
+    if args.compare:
+        print()
+        baseline = compare_reports.load(args.compare)
+        rows = compare_reports.compare(baseline, report, args.fps_tolerance, args.rss_tolerance)
+        if compare_reports.print_comparison(rows, baseline, report):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,19 @@ import cv2
 import mediapipe as mp
 import numpy as np
 
+try:
+    from explainability import thresholds
+    from explainability.signals import SignalBuffer
+except ImportError:
+    import thresholds
+    from signals import SignalBuffer
+
+MODULE_VERSION = 1
+THRESHOLDS = thresholds.get("blink_detector")
+
 # Constants for EAR blink detection
-EAR_THRESHOLD = 0.4
-CONSEC_FRAMES = 2
+EAR_THRESHOLD = THRESHOLDS["ear_threshold"]
+CONSEC_FRAMES = THRESHOLDS["consec_frames"]
 
 # Indices for left and right eye landmarks from MediaPipe Face Mesh
 LEFT_EYE_IDX = [33, 160, 158, 133, 153, 144]
@@ -34,8 +44,8 @@ def process_video(video_path):
     face_mesh = mp_face_mesh.FaceMesh(static_image_mode=False, max_num_faces=1)
     
     frame_num = 0
-    left_ear_list = []
-    right_ear_list = []
+    left_ear_list = SignalBuffer.for_capture(cap)
+    right_ear_list = SignalBuffer.for_capture(cap)
     
     blink_start = None
     blink_end = None
@@ -118,8 +128,8 @@ def process_video(video_path):
         "std_blink_duration": std_blink_duration,
         "avg_blink_interval": avg_blink_interval,
         "std_blink_interval": std_blink_interval,
-        "left_ear_list": left_ear_list,
-        "right_ear_list": right_ear_list
+        "left_ear_list": left_ear_list.values(),
+        "right_ear_list": right_ear_list.values()
     }
     return blink_features
 
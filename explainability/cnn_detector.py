@@ -0,0 +1,171 @@
+import cv2
+import numpy as np
+import mediapipe as mp
+
+try:
+    from explainability import thresholds
+    from explainability.progress import ProgressReporter
+    from explainability.results import AnalysisResult, FAKE, REAL, UNKNOWN, register_renderer
+    from explainability.instrumentation import stage_timer, timed_run, dump_json
+    from explainability.signals import SignalBuffer, capacity_for
+except ImportError:
+    import thresholds
+    from progress import ProgressReporter
+    from results import AnalysisResult, FAKE, REAL, UNKNOWN, register_renderer
+    from instrumentation import stage_timer, timed_run, dump_json
+    from signals import SignalBuffer, capacity_for
+
+MODULE_NAME = "cnn_detector"
+MODULE_VERSION = 1
+THRESHOLDS = thresholds.get(MODULE_NAME)
+timed = stage_timer(MODULE_NAME)
+
+IMG_SIZE = (224, 224)
+FRAME_SKIP = 5        # classify every 5th frame
+FACE_MARGIN = 0.2
+FAKE_THRESHOLD = THRESHOLDS["fake_threshold"]
+
+mp_face_detection = mp.solutions.face_detection
+
+
+def crop_largest_face(frame, detector):
+    """Return the largest detected face as a 224x224 RGB float image in [0, 1], or None."""
+    h, w, _ = frame.shape
+    with timed("cvtcolor"):
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    with timed("landmarks"):
+        results = detector.process(rgb)
+    if not results.detections:
+        return None
+
+    bb = max(results.detections,
+             key=lambda d: d.location_data.relative_bounding_box.width * d.location_data.relative_bounding_box.height
+             ).location_data.relative_bounding_box
+    mx, my = bb.width * FACE_MARGIN, bb.height * FACE_MARGIN
+    x1, y1 = max(int((bb.xmin - mx) * w), 0), max(int((bb.ymin - my) * h), 0)
+    x2, y2 = min(int((bb.xmin + bb.width + mx) * w), w), min(int((bb.ymin + bb.height + my) * h), h)
+    if x2 <= x1 or y2 <= y1:
+        return None
+    with timed("features"):
+        return cv2.resize(rgb[y1:y2, x1:x2], IMG_SIZE).astype(np.float32) / 255.0
+
+
+@timed_run(MODULE_NAME)
+def main(video_path, server=None, model_path=None, frame_skip=FRAME_SKIP, batch_size=32, progress=None, budget=None):
+    """
+    Classify sampled face crops with the MobileNetV2 detector and aggregate per video.
+
+    Parameters:
+        video_path (str): Path to input video or image
+        server (BatchingModelServer): shared micro-batching server; faces are submitted
+                                      as they are decoded. When omitted, the model at
+                                      `model_path` is loaded and called in batches.
+        model_path (str): Keras/TFLite model used when no server is given
+        progress (callable): progress(frames_done, frames_total), throttled
+        budget (MemoryBudget): sample frames more sparsely once the run outgrows this budget
+    """
+    predict = None
+    if server is None:
+        from serving.model_server import load_predict_fn
+        predict = load_predict_fn(model_path or "models/trained_models/mobilenetv2_deepfake.h5")
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise FileNotFoundError(f"Cannot open video: {video_path}")
+
+    reporter = ProgressReporter.for_capture(progress, cap)
+    # At most one crop per sampled frame
+    real_probs = SignalBuffer(capacity_for(cap) // frame_skip + 1)
+    pending = []   # futures (server) or face crops (local batches) not yet scored
+    frame_idx = 0
+
+    def drain(limit):
+        # Keep at most `limit` faces in flight so memory stays flat on long videos
+        while len(pending) > limit:
+            # Time spent on (or, with a server, waiting for) the forward passes
+            with timed("inference"):
+                if server is not None:
+                    real_probs.append(np.ravel(pending.pop(0).result())[0])
+                else:
+                    real_probs.extend(np.ravel(predict(np.stack(pending))))
+                    pending.clear()
+
+    with mp_face_detection.FaceDetection(model_selection=1, min_detection_confidence=0.5) as detector:
+        while True:
+            if budget is not None and not budget.keep(frame_idx):
+                with timed("decode"):
+                    ret = cap.grab()
+                if not ret:
+                    break
+                frame_idx += 1
+                reporter.update(frame_idx)
+                continue
+            with timed("decode"):
+                ret, frame = cap.read()
+            if not ret:
+                break
+            if frame_idx % frame_skip == 0:
+                face = crop_largest_face(frame, detector)
+                if face is not None:
+                    pending.append(server.submit(face) if server is not None else face)
+                    drain(4 * batch_size if server is not None else batch_size - 1)
+            frame_idx += 1
+            reporter.update(frame_idx)
+    cap.release()
+    drain(0)
+    reporter.finish(frame_idx)
+
+    # Sigmoid output is P(real): flow_from_directory orders classes fake=0, real=1
+    series = {"fake_probability": 1.0 - real_probs.values()}
+    params = {"fake_threshold": FAKE_THRESHOLD, "frame_skip": frame_skip}
+    if budget is not None:
+        budget.annotate(params)
+    with timed("verdict"):
+        metrics, verdict = score(series, params)
+    return AnalysisResult(MODULE_NAME, metrics, verdict, series, params, video_path, MODULE_VERSION)
+
+
+def score(series, params, metrics=None):
+    """
+    Metrics and verdict from the per-crop fake probabilities.
+
+    Parameters:
+        series (dict): {"fake_probability": one value per classified face crop}
+        params (dict): {"fake_threshold", "frame_skip"}
+
+    Returns:
+        (dict, str): metrics and verdict
+    """
+    fake_probs = np.asarray(series["fake_probability"], dtype=np.float32)
+    if fake_probs.size == 0:
+        return {"crops": 0}, UNKNOWN
+    avg_fake = float(np.mean(fake_probs))
+    fake_ratio = float(np.mean(fake_probs > params["fake_threshold"]))
+    metrics = {"crops": int(fake_probs.size), "average_fake_probability": avg_fake, "fake_frame_ratio": fake_ratio}
+    return metrics, FAKE if avg_fake > params["fake_threshold"] else REAL
+
+
+def render_text(result):
+    if result.verdict == UNKNOWN:
+        return "No face detected in any sampled frame.\n"
+    metrics = result.metrics
+    text = f"Face crops classified: {metrics['crops']} (every {result.params['frame_skip']}th frame)\n"
+    text += f"Average fake probability: {metrics['average_fake_probability']:.4f}\n"
+    text += f"Frames classified as fake: {metrics['fake_frame_ratio']:.2%}\n"
+    if result.verdict == FAKE:
+        text += "CNN classifier verdict: likely FAKE.\n"
+    else:
+        text += "CNN classifier verdict: likely REAL.\n"
+    return text
+
+
+register_renderer(MODULE_NAME, render_text)
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) < 2:
+        print("Usage: python cnn_detector.py <video_path> [model_path]")
+    else:
+        print(main(sys.argv[1], model_path=sys.argv[2] if len(sys.argv) > 2 else None))
+        dump_json()
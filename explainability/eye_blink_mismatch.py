@@ -1,9 +1,27 @@
 import cv2
 import mediapipe as mp
 import numpy as np
-import matplotlib.pyplot as plt
+
+try:
+    from explainability import thresholds
+    from explainability.results import AnalysisResult, FAKE, REAL, UNKNOWN, register_renderer
+    from explainability.segments import iter_frames, run_segmented
+    from explainability.instrumentation import stage_timer, timed_run, dump_json
+    from explainability.signals import SignalBuffer, capacity_for, DEFAULT_CAPACITY
+except ImportError:
+    import thresholds
+    from results import AnalysisResult, FAKE, REAL, UNKNOWN, register_renderer
+    from segments import iter_frames, run_segmented
+    from instrumentation import stage_timer, timed_run, dump_json
+    from signals import SignalBuffer, capacity_for, DEFAULT_CAPACITY
+
+MODULE_NAME = "eye_blink_mismatch"
+MODULE_VERSION = 1
+THRESHOLDS = thresholds.get(MODULE_NAME)
+timed = stage_timer(MODULE_NAME)
 
 mp_face_mesh = mp.solutions.face_mesh
+FACE_MESH_OPTIONS = {"max_num_faces": 5}
 
 # Indices for left and right eye landmarks (MediaPipe Face Mesh)
 LEFT_EYE_IDX = [33, 160, 158, 133, 153, 144]
@@ -17,105 +35,176 @@ def eye_aspect_ratio(landmarks, eye_indices):
     ear = (A + B) / (2.0 * C)
     return ear
 
-def detect_blinks(ear_list, threshold=0.3, consecutive_frames=1):
-    blinks = []
-    count = 0
-    for i, ear in enumerate(ear_list):
-        if ear < threshold:
-            count += 1
-        else:
-            if count >= consecutive_frames:
-                blinks.append(i - count // 2)
-            count = 0
-    if count >= consecutive_frames:
-        blinks.append(len(ear_list) - count // 2)
-    return blinks
-
-def main(video_path, max_faces=5, visualize=False, ear_threshold=0.3, consecutive_frames=1):
+def count_blinks(ear, threshold=0.3, consecutive_frames=1):
+    """Number of blinks: runs of EAR < threshold at least `consecutive_frames` long."""
+    closed = np.concatenate(([0], (np.asarray(ear) < threshold).astype(np.int8), [0]))
+    edges = np.diff(closed)
+    lengths = np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)
+    return int(np.count_nonzero(lengths >= consecutive_frames))
+
+class BlinkPartial:
+    """
+    Mergeable blink state for frames [start, last] (numbered from 1): per person
+    slot, the left/right EAR from the slot's first detection on, NaN where the
+    slot was not detected. A slot already tracked before this range is padded
+    with NaN for the frames of this range before it was (re)detected. A slot's
+    buffers are sized for the frames left in the range when it first appears.
+    Frames a memory budget skipped are NaN too, so the series stays one value
+    per frame and a run of closed-eye frames never spans a gap.
+    """
+
+    def __init__(self, start, capacity=DEFAULT_CAPACITY):
+        self.start = start
+        self.last = start - 1
+        self.capacity = capacity
+        self.persons = {}
+
+    def add_frame(self, frame_idx, face_landmarks):
+        skipped = frame_idx - self.last - 1
+        if skipped > 0:
+            for person in self.persons.values():
+                person["left"].append_missing(skipped)
+                person["right"].append_missing(skipped)
+        self.last = frame_idx
+        for person_id, landmarks in enumerate(face_landmarks):
+            if person_id not in self.persons:
+                remaining = self.start + self.capacity - frame_idx
+                self.persons[person_id] = {"first": frame_idx, "left": SignalBuffer(remaining),
+                                           "right": SignalBuffer(remaining)}
+            self.persons[person_id]["left"].append(eye_aspect_ratio(landmarks.landmark, LEFT_EYE_IDX))
+            self.persons[person_id]["right"].append(eye_aspect_ratio(landmarks.landmark, RIGHT_EYE_IDX))
+
+        # Faces not detected in this frame
+        for pid, person in self.persons.items():
+            if pid >= len(face_landmarks):
+                person["left"].append(None)
+                person["right"].append(None)
+
+    def merge(self, other):
+        for pid, theirs in other.persons.items():
+            person = self.persons.get(pid)
+            if person is None:
+                self.persons[pid] = theirs
+                continue
+            gap = theirs["first"] - other.start
+            for side in ("left", "right"):
+                person[side].append_missing(gap)
+                person[side].extend(theirs[side])
+        for pid, person in self.persons.items():
+            if pid not in other.persons:
+                gap = other.last - other.start + 1
+                person["left"].append_missing(gap)
+                person["right"].append_missing(gap)
+        self.last = max(self.last, other.last)
+        return self
+
+
+def analyze_segment(video_path, start=0, end=None, max_faces=FACE_MESH_OPTIONS["max_num_faces"], progress=None,
+                    face_mesh=None, budget=None):
     cap = cv2.VideoCapture(video_path)
-    face_mesh = mp_face_mesh.FaceMesh(static_image_mode=False, max_num_faces=max_faces)
-
-    # Dictionary to store each person's EAR sequences
-    person_data = {}
-    frame_idx = 0
-
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        frame_idx += 1
-
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = face_mesh.process(rgb_frame)
-
-        if results.multi_face_landmarks:
-            for person_id, landmarks in enumerate(results.multi_face_landmarks):
-                if person_id not in person_data:
-                    person_data[person_id] = {"left_seq": [], "right_seq": [], "frames": []}
-
-                left_ear = eye_aspect_ratio(landmarks.landmark, LEFT_EYE_IDX)
-                right_ear = eye_aspect_ratio(landmarks.landmark, RIGHT_EYE_IDX)
-
-                person_data[person_id]["left_seq"].append(left_ear)
-                person_data[person_id]["right_seq"].append(right_ear)
-                person_data[person_id]["frames"].append(frame_idx)
-
-            # Append NaN for faces not detected in this frame
-            detected_ids = set(range(len(results.multi_face_landmarks)))
-            for pid in person_data.keys():
-                if pid not in detected_ids:
-                    person_data[pid]["left_seq"].append(np.nan)
-                    person_data[pid]["right_seq"].append(np.nan)
-                    person_data[pid]["frames"].append(frame_idx)
-        else:
-            # No faces detected, append NaN for all persons
-            for pid in person_data.keys():
-                person_data[pid]["left_seq"].append(np.nan)
-                person_data[pid]["right_seq"].append(np.nan)
-                person_data[pid]["frames"].append(frame_idx)
+    own_mesh = face_mesh is None
+    if own_mesh:
+        face_mesh = mp_face_mesh.FaceMesh(static_image_mode=False, max_num_faces=max_faces)
+
+    # Frames are numbered from 1
+    partial = BlinkPartial(start + 1, capacity_for(cap, start, end))
+    for idx, frame in iter_frames(cap, start, end, progress, timed, budget):
+        with timed("cvtcolor"):
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        with timed("landmarks"):
+            results = face_mesh.process(rgb_frame)
+        with timed("features"):
+            partial.add_frame(idx + 1, results.multi_face_landmarks or [])
 
     cap.release()
-
-    # Build result string
-    results_str = ""
-    for pid, data in person_data.items():
-        left_seq = np.array(data["left_seq"])
-        right_seq = np.array(data["right_seq"])
-
-        left_mean = np.nanmean(left_seq)
-        right_mean = np.nanmean(right_seq)
-
-        left_seq = np.nan_to_num(left_seq, nan=left_mean)
-        right_seq = np.nan_to_num(right_seq, nan=right_mean)
-
-        # Detect blinks
-        left_blinks = detect_blinks(left_seq, threshold=ear_threshold, consecutive_frames=consecutive_frames)
-        right_blinks = detect_blinks(right_seq, threshold=ear_threshold, consecutive_frames=consecutive_frames)
-
-        blink_count_left = len(left_blinks)
-        blink_count_right = len(right_blinks)
+    if own_mesh:
+        face_mesh.close()
+    return partial
+
+def score(series, params, metrics):
+    """
+    Per-person blink counts, asymmetry and the overall verdict.
+
+    Parameters:
+        series (dict): {"person<N>_left_ear", "person<N>_right_ear"} from the person's first frame, NaN when missing
+        params (dict): {"ear_threshold", "consecutive_frames", "asymmetry_threshold"}
+        metrics (dict): {"persons": [{"id", "first_frame"}, ...]}
+
+    Returns:
+        (dict, str): metrics (blink counts added per person) and verdict
+    """
+    persons = []
+    for person in metrics["persons"]:
+        pid = person["id"]
+        counts = []
+        for side in ("left", "right"):
+            seq = np.asarray(series[f"person{pid}_{side}_ear"], dtype=np.float64)
+            # Missing frames take the eye's mean EAR
+            seq = np.nan_to_num(seq, nan=np.nanmean(seq))
+            counts.append(count_blinks(seq, params["ear_threshold"], params["consecutive_frames"]))
+        blink_count_left, blink_count_right = counts
 
         # Blink asymmetry index
         if max(blink_count_left, blink_count_right) > 0:
             asymmetry_index = abs(blink_count_left - blink_count_right) / max(blink_count_left, blink_count_right)
         else:
             asymmetry_index = 0
+        persons.append(dict(person, left_blinks=blink_count_left, right_blinks=blink_count_right,
+                            asymmetry_index=float(asymmetry_index),
+                            mismatch=bool(asymmetry_index > params["asymmetry_threshold"])))
+
+    if not persons:
+        return {"persons": []}, UNKNOWN
+    return {"persons": persons}, FAKE if any(p["mismatch"] for p in persons) else REAL
 
-        results_str += f"Person {pid}:\n"
-        results_str += f"  Left eye blinks: {blink_count_left}\n"
-        results_str += f"  Right eye blinks: {blink_count_right}\n"
-        results_str += f"  Blink asymmetry index: {asymmetry_index:.2f}\n"
-        if asymmetry_index > 0.3:
+def render_text(result):
+    results_str = ""
+    for person in result.metrics["persons"]:
+        results_str += f"Person {person['id']}:\n"
+        results_str += f"  Left eye blinks: {person['left_blinks']}\n"
+        results_str += f"  Right eye blinks: {person['right_blinks']}\n"
+        results_str += f"  Blink asymmetry index: {person['asymmetry_index']:.2f}\n"
+        if person["mismatch"]:
             results_str += "  Possible eye blink mismatch — potential morphing.\n"
         else:
             results_str += "  Blink pattern appears natural.\n"
+    return results_str
 
-        # Optional visualization
-        if visualize:
-            import matplotlib.pyplot as plt
+register_renderer(MODULE_NAME, render_text)
+
+@timed_run(MODULE_NAME)
+def main(video_path, max_faces=FACE_MESH_OPTIONS["max_num_faces"], visualize=False,
+         ear_threshold=THRESHOLDS["ear_threshold"],
+         consecutive_frames=THRESHOLDS["consecutive_frames"], asymmetry_threshold=THRESHOLDS["asymmetry_threshold"],
+         workers=None, progress=None, face_mesh=None, budget=None):
+    partial = run_segmented(analyze_segment, video_path, workers, progress, face_mesh, budget, max_faces=max_faces)
+
+    series = {}
+    for pid, data in partial.persons.items():
+        series[f"person{pid}_left_ear"] = data["left"].values()
+        series[f"person{pid}_right_ear"] = data["right"].values()
+    metrics = {"persons": [{"id": pid, "first_frame": data["first"]} for pid, data in partial.persons.items()]}
+    params = {"ear_threshold": ear_threshold, "consecutive_frames": consecutive_frames,
+              "asymmetry_threshold": asymmetry_threshold}
+    if budget is not None:
+        budget.annotate(params)
+    with timed("verdict"):
+        metrics, verdict = score(series, params, metrics)
+    result = AnalysisResult(MODULE_NAME, metrics, verdict, series, params, video_path, MODULE_VERSION)
+
+    # Optional visualization
+    if visualize:
+        import matplotlib.pyplot as plt
+        for person in metrics["persons"]:
+            pid = person["id"]
+            left_seq = np.asarray(series[f"person{pid}_left_ear"], dtype=np.float64)
+            right_seq = np.asarray(series[f"person{pid}_right_ear"], dtype=np.float64)
+            left_seq = np.nan_to_num(left_seq, nan=np.nanmean(left_seq))
+            right_seq = np.nan_to_num(right_seq, nan=np.nanmean(right_seq))
+            frames = np.arange(person["first_frame"], person["first_frame"] + len(left_seq))
             plt.figure(figsize=(12, 4))
-            plt.plot(data["frames"], left_seq, label="Left EAR")
-            plt.plot(data["frames"], right_seq, label="Right EAR")
+            plt.plot(frames, left_seq, label="Left EAR")
+            plt.plot(frames, right_seq, label="Right EAR")
             plt.axhline(y=ear_threshold, color='r', linestyle='--', label="EAR Threshold")
             plt.title(f"Person {pid} Eye Aspect Ratio over Time")
             plt.xlabel("Frame")
@@ -123,7 +212,7 @@ def main(video_path, max_faces=5, visualize=False, ear_threshold=0.3, consecutiv
             plt.legend()
             plt.show()
 
-    return results_str
+    return result
 
 if __name__ == "__main__":
     import sys
@@ -136,3 +225,4 @@ if __name__ == "__main__":
         visualize = sys.argv[3].lower() == 'true' if len(sys.argv) > 3 else False
         output = main(video, max_faces=max_faces, visualize=visualize)
         print(output)
+        dump_json()
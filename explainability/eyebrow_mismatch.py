@@ -2,7 +2,26 @@ import cv2
 import mediapipe as mp
 import numpy as np
 
+try:
+    from explainability import thresholds
+    from explainability.results import AnalysisResult, FAKE, REAL, UNKNOWN, register_renderer
+    from explainability.segments import iter_frames, run_segmented
+    from explainability.instrumentation import stage_timer, timed_run, dump_json
+    from explainability.signals import SignalBuffer, capacity_for, DEFAULT_CAPACITY
+except ImportError:
+    import thresholds
+    from results import AnalysisResult, FAKE, REAL, UNKNOWN, register_renderer
+    from segments import iter_frames, run_segmented
+    from instrumentation import stage_timer, timed_run, dump_json
+    from signals import SignalBuffer, capacity_for, DEFAULT_CAPACITY
+
+MODULE_NAME = "eyebrow_mismatch"
+MODULE_VERSION = 1
+THRESHOLDS = thresholds.get(MODULE_NAME)
+timed = stage_timer(MODULE_NAME)
+
 mp_face_mesh = mp.solutions.face_mesh
+FACE_MESH_OPTIONS = {"max_num_faces": 2}
 
 LEFT_EYEBROW_IDX = [70, 63, 105, 66, 107]
 RIGHT_EYEBROW_IDX = [336, 296, 334, 293, 300]
@@ -11,54 +30,105 @@ def eyebrow_vertical_position(landmarks, idx_list, image_height):
     ys = [landmarks[i].y * image_height for i in idx_list]
     return np.mean(ys)
 
-def main(video_path):
-    cap = cv2.VideoCapture(video_path)
-    face_mesh = mp_face_mesh.FaceMesh(static_image_mode=False, max_num_faces=2)
+class EyebrowPartial:
+    """
+    Mergeable eyebrow state for a frame range: left/right vertical positions per
+    frame, NaN where no face was found. Missing frames are filled with the
+    per-side means once all segments are merged.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.left = SignalBuffer(capacity)
+        self.right = SignalBuffer(capacity)
 
-    left_positions = []
-    right_positions = []
+    def add(self, left_pos, right_pos):
+        self.left.append(left_pos)
+        self.right.append(right_pos)
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
+    def merge(self, other):
+        self.left.extend(other.left)
+        self.right.extend(other.right)
+        return self
 
+
+def analyze_segment(video_path, start=0, end=None, progress=None, face_mesh=None, budget=None):
+    cap = cv2.VideoCapture(video_path)
+    own_mesh = face_mesh is None
+    if own_mesh:
+        face_mesh = mp_face_mesh.FaceMesh(static_image_mode=False, **FACE_MESH_OPTIONS)
+
+    partial = EyebrowPartial(capacity_for(cap, start, end))
+    for _, frame in iter_frames(cap, start, end, progress, timed, budget):
         h, w, _ = frame.shape
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = face_mesh.process(rgb_frame)
+        with timed("cvtcolor"):
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        with timed("landmarks"):
+            results = face_mesh.process(rgb_frame)
 
         if results.multi_face_landmarks:
             landmarks = results.multi_face_landmarks[0].landmark
 
-            left_pos = eyebrow_vertical_position(landmarks, LEFT_EYEBROW_IDX, h)
-            right_pos = eyebrow_vertical_position(landmarks, RIGHT_EYEBROW_IDX, h)
-
-            left_positions.append(left_pos)
-            right_positions.append(right_pos)
+            with timed("features"):
+                left_pos = eyebrow_vertical_position(landmarks, LEFT_EYEBROW_IDX, h)
+                right_pos = eyebrow_vertical_position(landmarks, RIGHT_EYEBROW_IDX, h)
+            partial.add(left_pos, right_pos)
         else:
-            left_positions.append(np.nan)
-            right_positions.append(np.nan)
+            partial.add(None, None)
 
     cap.release()
+    if own_mesh:
+        face_mesh.close()
+    return partial
+
+def score(series, params, metrics=None):
+    """
+    Metrics and verdict from the per-frame eyebrow positions.
+
+    Parameters:
+        series (dict): {"left_eyebrow_y", "right_eyebrow_y"} in pixels, NaN without a face
+        params (dict): {"diff_threshold": pixels}
+
+    Returns:
+        (dict, str): metrics and verdict
+    """
+    left_positions = np.asarray(series["left_eyebrow_y"], dtype=np.float64)
+    right_positions = np.asarray(series["right_eyebrow_y"], dtype=np.float64)
+    frames_with_face = int(np.count_nonzero(~np.isnan(left_positions)))
+    if frames_with_face == 0:
+        return {"average_diff": float("nan"), "frames_with_face": 0}, UNKNOWN
 
     # Clean NaNs
-    left_positions = np.array(left_positions)
-    right_positions = np.array(right_positions)
     left_positions = np.nan_to_num(left_positions, nan=np.nanmean(left_positions))
     right_positions = np.nan_to_num(right_positions, nan=np.nanmean(right_positions))
 
-    # Calculate difference between left and right eyebrow vertical positions over time
-    diff = np.abs(left_positions - right_positions)
-    avg_diff = np.mean(diff)
+    # Difference between left and right eyebrow vertical positions over time
+    avg_diff = float(np.mean(np.abs(left_positions - right_positions)))
+    metrics = {"average_diff": avg_diff, "frames_with_face": frames_with_face}
+    return metrics, FAKE if avg_diff > params["diff_threshold"] else REAL
 
+def render_text(result):
     # Build return string for Streamlit
-    result = f"Average eyebrow vertical position difference: {avg_diff:.2f} pixels.\n"
-    if avg_diff > 10:  # example threshold
-        result += " Possible eyebrow mismatch detected - potential manipulation."
+    text = f"Average eyebrow vertical position difference: {result.metrics['average_diff']:.2f} pixels.\n"
+    if result.verdict == FAKE:
+        text += " Possible eyebrow mismatch detected - potential manipulation."
     else:
-        result += " Eyebrow movement appears natural."
+        text += " Eyebrow movement appears natural."
+    return text
+
+register_renderer(MODULE_NAME, render_text)
+
+@timed_run(MODULE_NAME)
+def main(video_path, diff_threshold=THRESHOLDS["diff_threshold"], workers=None, progress=None, face_mesh=None,
+         budget=None):
+    partial = run_segmented(analyze_segment, video_path, workers, progress, face_mesh, budget)
 
-    return result  # <-- Return instead of print
+    series = {"left_eyebrow_y": partial.left.values(), "right_eyebrow_y": partial.right.values()}
+    params = {"diff_threshold": diff_threshold}
+    if budget is not None:
+        budget.annotate(params)
+    with timed("verdict"):
+        metrics, verdict = score(series, params)
+    return AnalysisResult(MODULE_NAME, metrics, verdict, series, params, video_path, MODULE_VERSION)
 
 if __name__ == "__main__":
     import sys
@@ -66,3 +136,4 @@ if __name__ == "__main__":
         print("Usage: python eyebrow_mismatch.py <video_path>")
     else:
         print(main(sys.argv[1]))  # Use print only when running standalone
+        dump_json()
@@ -1,66 +1,145 @@
 import cv2
 import numpy as np
 
-def detect_flicker(video_path, threshold=15):
-    """
-    Detect flicker events in a video based on frame brightness differences.
+try:
+    from explainability import thresholds
+    from explainability.results import AnalysisResult, FAKE, REAL, register_renderer
+    from explainability.segments import iter_frames, run_segmented
+    from explainability.instrumentation import stage_timer, timed_run, dump_json
+    from explainability.signals import SignalBuffer, capacity_for, DEFAULT_CAPACITY
+except ImportError:
+    import thresholds
+    from results import AnalysisResult, FAKE, REAL, register_renderer
+    from segments import iter_frames, run_segmented
+    from instrumentation import stage_timer, timed_run, dump_json
+    from signals import SignalBuffer, capacity_for, DEFAULT_CAPACITY
 
-    Parameters:
-        video_path (str): Path to input video
-        threshold (float): Difference threshold to consider as flicker
+MODULE_NAME = "flicker_detection"
+MODULE_VERSION = 1
+THRESHOLDS = thresholds.get(MODULE_NAME)
+timed = stage_timer(MODULE_NAME)
 
-    Returns:
-        dict: flicker analysis results
+def frame_diff(gray, prev_gray):
+    # Mean absolute difference; uint8 absdiff is exact and avoids two float32 frame copies
+    return cv2.mean(cv2.absdiff(gray, prev_gray))[0]
+
+
+class FlickerPartial:
     """
+    Mergeable flicker state for a frame range.
+
+    Keeps the frame-to-frame differences plus the first and last grayscale
+    frames, so the difference across a segment seam is added on merge. Only
+    consecutive frames are compared: across frames a memory budget skipped
+    there is no difference, since it would add up the change of several frames.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.diffs = SignalBuffer(capacity)
+        self.first_gray = None
+        self.first_idx = None
+        self.last_gray = None
+        self.last_idx = None
+
+    def add_frame(self, frame_idx, gray):
+        if self.last_gray is None:
+            self.first_gray, self.first_idx = gray, frame_idx
+        elif frame_idx == self.last_idx + 1:
+            self.diffs.append(frame_diff(gray, self.last_gray))
+        self.last_gray, self.last_idx = gray, frame_idx
+
+    def merge(self, other):
+        if self.last_gray is not None and other.first_gray is not None and other.first_idx == self.last_idx + 1:
+            self.diffs.append(frame_diff(other.first_gray, self.last_gray))
+        self.diffs.extend(other.diffs)
+        if self.first_gray is None:
+            self.first_gray, self.first_idx = other.first_gray, other.first_idx
+        if other.last_gray is not None:
+            self.last_gray, self.last_idx = other.last_gray, other.last_idx
+        return self
+
+
+def analyze_segment(video_path, start=0, end=None, progress=None, budget=None):
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
         raise FileNotFoundError(f"Cannot open video: {video_path}")
 
-    prev_gray = None
-    brightness_diffs = []
-    frame_count = 0
-
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        frame_count += 1
-
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        if prev_gray is not None:
-            diff = np.mean(np.abs(gray.astype(np.float32) - prev_gray.astype(np.float32)))
-            brightness_diffs.append(diff)
-        prev_gray = gray
+    partial = FlickerPartial(capacity_for(cap, start, end))
+    # Sampled in pairs of consecutive frames, so there are still differences to take
+    for idx, frame in iter_frames(cap, start, end, progress, timed, budget, run=2):
+        with timed("cvtcolor"):
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        with timed("features"):
+            partial.add_frame(idx, gray)
 
     cap.release()
+    return partial
 
-    brightness_diffs = np.array(brightness_diffs)
-    avg_diff = np.mean(brightness_diffs)
-    max_diff = np.max(brightness_diffs)
-    flicker_events = np.sum(brightness_diffs > threshold)
+def score(series, params, metrics=None):
+    """
+    Metrics and verdict from the per-frame differences.
+
+    Parameters:
+        series (dict): {"frame_diff": differences between consecutive frames}
+        params (dict): {"threshold": flicker difference threshold}
 
-    results = {
-        "average_diff": avg_diff,
-        "max_diff": max_diff,
-        "flicker_events": int(flicker_events)
+    Returns:
+        (dict, str): metrics and verdict
+    """
+    diffs = np.asarray(series["frame_diff"])
+    if diffs.size == 0:
+        raise ValueError("Need at least two frames to measure flicker")
+    events = int(np.count_nonzero(diffs > params["threshold"]))
+    metrics = {
+        "average_diff": float(np.mean(diffs, dtype=np.float64)),
+        "max_diff": float(np.max(diffs)),
+        "flicker_events": events
     }
+    return metrics, FAKE if events > 0 else REAL
+
+def detect_flicker(video_path, threshold=THRESHOLDS["threshold"], workers=None, progress=None, budget=None):
+    """
+    Detect flicker events in a video based on frame brightness differences.
 
-    return results
+    Parameters:
+        video_path (str): Path to input video
+        threshold (float): Difference threshold to consider as flicker
+        workers (int): Processes to split the video across (default: DEFAULT_WORKERS)
+        progress (callable): progress(frames_done, frames_total), throttled
+        budget (MemoryBudget): sample frames once the run outgrows this budget
+
+    Returns:
+        AnalysisResult: metrics, verdict and the "frame_diff" series
+    """
+    partial = run_segmented(analyze_segment, video_path, workers, progress, budget=budget)
+    series = {"frame_diff": partial.diffs.values()}
+    params = {"threshold": threshold}
+    if budget is not None:
+        budget.annotate(params)
+    with timed("verdict"):
+        metrics, verdict = score(series, params)
+    return AnalysisResult(MODULE_NAME, metrics, verdict, series, params, video_path, MODULE_VERSION)
 
-def main(video_path):
-    results = detect_flicker(video_path)
-    results_str = f"Flicker Detection Results for {video_path}:\n"
-    results_str += f"Average brightness difference between frames: {results['average_diff']:.2f}\n"
-    results_str += f"Maximum brightness difference between frames: {results['max_diff']:.2f}\n"
-    results_str += f"Number of flicker events (diff > 15): {results['flicker_events']}\n"
+def render_text(result):
+    metrics = result.metrics
+    results_str = f"Flicker Detection Results for {result.source}:\n"
+    results_str += f"Average brightness difference between frames: {metrics['average_diff']:.2f}\n"
+    results_str += f"Maximum brightness difference between frames: {metrics['max_diff']:.2f}\n"
+    results_str += f"Number of flicker events (diff > {result.params['threshold']:g}): {metrics['flicker_events']}\n"
 
-    if results['flicker_events'] > 0:
+    if result.verdict == FAKE:
         results_str += "Significant flicker detected — possible manipulation!\n"
     else:
         results_str += "No significant flicker detected.\n"
 
     return results_str
 
+register_renderer(MODULE_NAME, render_text)
+
+@timed_run(MODULE_NAME)
+def main(video_path, threshold=THRESHOLDS["threshold"], workers=None, progress=None, budget=None):
+    return detect_flicker(video_path, threshold=threshold, workers=workers, progress=progress, budget=budget)
+
 if __name__ == "__main__":
     import sys
     if len(sys.argv) < 2:
@@ -68,3 +147,4 @@ if __name__ == "__main__":
     else:
         output = main(sys.argv[1])
         print(output)
+        dump_json()
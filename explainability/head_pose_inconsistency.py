@@ -4,6 +4,16 @@ import mediapipe as mp
 import math
 import sys
 
+try:
+    from explainability import thresholds
+    from explainability.signals import SignalBuffer
+except ImportError:
+    import thresholds
+    from signals import SignalBuffer
+
+MODULE_VERSION = 1
+THRESHOLDS = thresholds.get("head_pose_inconsistency")
+
 mp_face_mesh = mp.solutions.face_mesh
 
 # MediaPipe landmark indices (commonly used stable points)
@@ -54,9 +64,9 @@ def estimate_head_pose(landmarks, img_w, img_h, camera_matrix):
     return (yaw, pitch, roll, image_points, rvec, tvec)
 
 def analyze_video(video_path,
-                  max_jump_threshold_deg=20.0,   # per-frame jump threshold (deg)
-                  max_range_threshold_deg=45.0,  # overall allowed head rotation (deg)
-                  jump_event_count_threshold=5   # suspicious if > this many jumps
+                  max_jump_threshold_deg=THRESHOLDS["max_jump_threshold_deg"],        # per-frame jump threshold (deg)
+                  max_range_threshold_deg=THRESHOLDS["max_range_threshold_deg"],      # overall allowed head rotation (deg)
+                  jump_event_count_threshold=THRESHOLDS["jump_event_count_threshold"]  # suspicious if > this many jumps
                  ):
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
@@ -80,7 +90,7 @@ def analyze_video(video_path,
                                       min_detection_confidence=0.5,
                                       min_tracking_confidence=0.5)
 
-    angles_list = []  # list of (yaw,pitch,roll)
+    angles_list = SignalBuffer.for_capture(cap, channels=3)  # (yaw,pitch,roll) per frame
     frame_idx = 0
     face_count = 0
 
@@ -115,14 +125,14 @@ def analyze_video(video_path,
     face_mesh.close()
 
     # Post-process angles: drop None frames, compute diffs
-    valid_angles = [a for a in angles_list if a is not None]
+    valid_angles = angles_list.valid_values()
     if len(valid_angles) == 0:
         print("No faces/head poses detected in the video.")
         return
 
-    yaws = np.array([a[0] for a in valid_angles])
-    pitchs = np.array([a[1] for a in valid_angles])
-    rolls = np.array([a[2] for a in valid_angles])
+    yaws = valid_angles[:, 0]
+    pitchs = valid_angles[:, 1]
+    rolls = valid_angles[:, 2]
 
     # Stats
     yaw_range = np.ptp(yaws)   # peak-to-peak range
@@ -130,15 +140,7 @@ def analyze_video(video_path,
     roll_range = np.ptp(rolls)
 
     # Frame-to-frame jumps: compute diffs between consecutive valid frames
-    diffs = []
-    for i in range(1, len(valid_angles)):
-        prev = valid_angles[i-1]
-        cur = valid_angles[i]
-        dy = abs(cur[0] - prev[0])
-        dp = abs(cur[1] - prev[1])
-        dr = abs(cur[2] - prev[2])
-        diffs.append((dy, dp, dr))
-    diffs = np.array(diffs) if diffs else np.zeros((0,3))
+    diffs = np.abs(np.diff(valid_angles, axis=0))
 
     jump_events = np.sum((diffs > max_jump_threshold_deg).any(axis=1))
 
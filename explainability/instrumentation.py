@@ -0,0 +1,281 @@
+import os
+import sys
+import json
+import time
+import bisect
+import functools
+import threading
+import contextlib
+
+# DEEPFAKE_METRICS=0 turns every timer into a no-op
+ENABLED = os.environ.get("DEEPFAKE_METRICS", "1") != "0"
+# CLI runs dump their metrics here as JSON (default: stderr)
+JSON_PATH = os.environ.get("DEEPFAKE_METRICS_JSON")
+
+# Histogram upper bounds in seconds: 50 us .. ~1.6 s per frame stage,
+# 0.1 s .. ~7 min per module run or request
+STAGE_BUCKETS = tuple(0.00005 * 2 ** i for i in range(16))
+RUN_BUCKETS = tuple(0.1 * 2 ** i for i in range(13))
+
+_NULL = contextlib.nullcontext()
+
+
+class _Timing:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class Histogram:
+    """Cumulative-bucket histogram of durations (seconds), Prometheus style."""
+
+    __slots__ = ("bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)   # last slot: +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        """`with histogram.time():` observes the block's wall time."""
+        return _Timing(self) if ENABLED else _NULL
+
+    def reset(self):
+        with self._lock:
+            self.counts = [0] * len(self.counts)
+            self.sum = 0.0
+            self.count = 0
+
+    def snapshot(self):
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        cumulative, running = [], 0
+        for c in counts:
+            running += c
+            cumulative.append(running)
+        return {"buckets": dict(zip([*map(str, self.bounds), "+Inf"], cumulative)), "sum": total, "count": count}
+
+
+class Counter:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def reset(self):
+        with self._lock:
+            self.value = 0.0
+
+
+class Gauge(Counter):
+    __slots__ = ()
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set(self, value):
+        with self._lock:
+            self.value = value
+
+    @contextlib.contextmanager
+    def track(self):
+        """+1 while the block runs (in-flight work)."""
+        self.inc()
+        try:
+            yield
+        finally:
+            self.dec()
+
+
+class Registry:
+    """
+    Named metrics with label sets, exported as Prometheus text or JSON.
+
+    Metrics are created on first use: histogram("deepfake_stage_seconds",
+    module="iris_alignment", stage="decode") returns the same object every
+    time. Gauge callbacks are evaluated at export time (queue depths, ...).
+    """
+
+    def __init__(self):
+        self._metrics = {}     # name -> {"type", "help", "series": {labels: metric}}
+        self._callbacks = {}   # name -> (help, fn() -> number or {labels: number})
+        self._lock = threading.Lock()
+
+    def _get(self, kind, name, help_text, labels, factory):
+        key = tuple(sorted(labels.items()))
+        family = self._metrics.get(name)
+        metric = family["series"].get(key) if family else None
+        if metric is not None:
+            return metric
+        with self._lock:
+            family = self._metrics.setdefault(name, {"type": kind, "help": help_text, "series": {}})
+            return family["series"].setdefault(key, factory())
+
+    def histogram(self, name, help_text="", buckets=STAGE_BUCKETS, **labels):
+        return self._get("histogram", name, help_text, labels, lambda: Histogram(buckets))
+
+    def counter(self, name, help_text="", **labels):
+        return self._get("counter", name, help_text, labels, Counter)
+
+    def gauge(self, name, help_text="", **labels):
+        return self._get("gauge", name, help_text, labels, Gauge)
+
+    def gauge_callback(self, name, help_text, fn):
+        self._callbacks[name] = (help_text, fn)
+
+    def reset(self):
+        """Zero every metric in place (callers keep their references), e.g. after a warm-up run."""
+        for family in list(self._metrics.values()):
+            for metric in list(family["series"].values()):
+                metric.reset()
+
+    def snapshot(self):
+        """JSON-serializable view of every metric."""
+        data = {}
+        for name, family in list(self._metrics.items()):
+            series = []
+            for key, metric in list(family["series"].items()):
+                entry = {"labels": dict(key)}
+                if family["type"] == "histogram":
+                    entry.update(metric.snapshot())
+                else:
+                    entry["value"] = metric.value
+                series.append(entry)
+            data[name] = {"type": family["type"], "help": family["help"], "series": series}
+        for name, (help_text, fn) in list(self._callbacks.items()):
+            try:
+                value = fn()
+            except Exception:
+                continue
+            values = value.items() if isinstance(value, dict) else [((), value)]
+            data[name] = {"type": "gauge", "help": help_text,
+                          "series": [{"labels": dict(k), "value": v} for k, v in values]}
+        return data
+
+    def render_prometheus(self):
+        lines = []
+        for name, family in self.snapshot().items():
+            if family["help"]:
+                lines.append(f"# HELP {name} {family['help']}")
+            lines.append(f"# TYPE {name} {family['type']}")
+            for entry in family["series"]:
+                labels = entry["labels"]
+                if family["type"] == "histogram":
+                    for le, count in entry["buckets"].items():
+                        lines.append(f"{name}_bucket{_labels(labels, le=le)} {count}")
+                    lines.append(f"{name}_sum{_labels(labels)} {entry['sum']:.6f}")
+                    lines.append(f"{name}_count{_labels(labels)} {entry['count']}")
+                else:
+                    lines.append(f"{name}{_labels(labels)} {entry['value']:g}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels, **extra):
+    labels = dict(labels, **extra)
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+REGISTRY = Registry()
+
+
+def stage_timer(module):
+    """
+    Per-frame stage timing for one analyzer:
+
+        timed = stage_timer(MODULE_NAME)
+        with timed("decode"):
+            ret, frame = cap.read()
+
+    Stages used by the analyzers: decode, cvtcolor, landmarks, features, inference (CNN), verdict.
+    """
+    histograms = {}
+
+    def timed(stage):
+        histogram = histograms.get(stage)
+        if histogram is None:
+            histogram = histograms[stage] = REGISTRY.histogram(
+                "deepfake_stage_seconds", "Per-frame wall time of one analyzer stage", module=module, stage=stage)
+        return histogram.time()
+
+    return timed
+
+
+def untimed(stage):
+    """Stand-in for a stage_timer() when the caller does not time its stages."""
+    return _NULL
+
+
+def timed_run(module):
+    """Decorator for an analyzer entry point: run time, runs and failures per module."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            try:
+                with REGISTRY.histogram("deepfake_module_seconds", "Wall time of one analyzer run",
+                                        RUN_BUCKETS, module=module).time():
+                    return func(*args, **kwargs)
+            except Exception:
+                REGISTRY.counter("deepfake_module_failures_total", "Analyzer runs that raised", module=module).inc()
+                raise
+        return wrapper
+    return decorator
+
+
+def _frames_per_second():
+    """Decoded frames / analyzer run time, per module, since start-up."""
+    data = REGISTRY.snapshot()
+    decoded = {e["labels"]["module"]: e["count"]
+               for e in data.get("deepfake_stage_seconds", {}).get("series", []) if e["labels"]["stage"] == "decode"}
+    fps = {}
+    for e in data.get("deepfake_module_seconds", {}).get("series", []):
+        module = e["labels"]["module"]
+        if e["sum"] > 0 and module in decoded:
+            fps[(("module", module),)] = decoded[module] / e["sum"]
+    return fps
+
+
+REGISTRY.gauge_callback("deepfake_module_frames_per_second",
+                        "Frames decoded per second of analyzer run time (in-process runs)", _frames_per_second)
+
+
+def dump_json(path=JSON_PATH):
+    """Write the metrics snapshot as JSON to `path` (default: stderr); used at the end of CLI runs."""
+    if not ENABLED:
+        return
+    text = json.dumps(REGISTRY.snapshot(), indent=2)
+    if path:
+        with open(path, "w") as f:
+            f.write(text)
+    else:
+        print(text, file=sys.stderr)
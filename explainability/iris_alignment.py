@@ -3,7 +3,31 @@ import mediapipe as mp
 import numpy as np
 from skimage.feature import local_binary_pattern
 
+try:
+    from explainability import thresholds
+    from explainability.segments import iter_frames
+    from explainability.results import AnalysisResult, FAKE, REAL, UNKNOWN, register_renderer
+    from explainability.instrumentation import stage_timer, timed_run, dump_json
+    from explainability.signals import SignalBuffer
+except ImportError:
+    import thresholds
+    from segments import iter_frames
+    from results import AnalysisResult, FAKE, REAL, UNKNOWN, register_renderer
+    from instrumentation import stage_timer, timed_run, dump_json
+    from signals import SignalBuffer
+
+MODULE_NAME = "iris_alignment"
+MODULE_VERSION = 2
+THRESHOLDS = thresholds.get(MODULE_NAME)
+timed = stage_timer(MODULE_NAME)
+
 mp_face_mesh = mp.solutions.face_mesh
+FACE_MESH_OPTIONS = {
+    "max_num_faces": 1,
+    "refine_landmarks": True,  # IMPORTANT for iris landmarks!
+    "min_detection_confidence": 0.5,
+    "min_tracking_confidence": 0.5,
+}
 
 # Iris landmark indices from MediaPipe (with refine_landmarks=True)
 LEFT_IRIS_IDX = [474, 475, 476, 477]
@@ -40,26 +64,52 @@ def compare_histograms(hist1, hist2):
     # Chi-squared distance
     return 0.5 * np.sum(((hist1 - hist2) ** 2) / (hist1 + hist2 + 1e-7))
 
-def main(video_path):
-    cap = cv2.VideoCapture(video_path)
+def score(series, params, metrics=None):
+    """
+    Metrics and verdict from the per-frame iris histogram distances.
+
+    Parameters:
+        series (dict): {"iris_distance": left/right chi-square distance per frame with iris landmarks}
+        params (dict): {"distance_threshold"}
+
+    Returns:
+        (dict, str): metrics and verdict
+    """
+    distances = np.asarray(series["iris_distance"])
+    if distances.size == 0:
+        return {"frames_with_iris": 0}, UNKNOWN
+    avg_dist = float(np.mean(distances, dtype=np.float64))
+    metrics = {"average_distance": avg_dist, "frames_with_iris": int(distances.size)}
+    return metrics, FAKE if avg_dist > params["distance_threshold"] else REAL
+
+def render_text(result):
+    if result.verdict == UNKNOWN:
+        return "No iris landmarks detected in any frame.\n"
+    text = f"Average iris histogram distance between left and right eye: {result.metrics['average_distance']:.4f}\n"
+    if result.verdict == FAKE:
+        text += "Possible iris mismatch detected — potential deepfake.\n"
+    else:
+        text += "Iris patterns appear consistent.\n"
+    return text
 
-    face_mesh = mp_face_mesh.FaceMesh(
-        static_image_mode=False,
-        max_num_faces=1,
-        refine_landmarks=True,  # IMPORTANT for iris landmarks!
-        min_detection_confidence=0.5,
-        min_tracking_confidence=0.5
-    )
+register_renderer(MODULE_NAME, render_text)
 
-    distances = []
+@timed_run(MODULE_NAME)
+def main(video_path, distance_threshold=THRESHOLDS["distance_threshold"], progress=None, face_mesh=None,
+         visualize=False, budget=None):
+    cap = cv2.VideoCapture(video_path)
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
+    own_mesh = face_mesh is None
+    if own_mesh:
+        face_mesh = mp_face_mesh.FaceMesh(static_image_mode=False, **FACE_MESH_OPTIONS)
 
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = face_mesh.process(rgb_frame)
+    distances = SignalBuffer.for_capture(cap)
+
+    for _, frame in iter_frames(cap, progress=progress, timed=timed, budget=budget):
+        with timed("cvtcolor"):
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        with timed("landmarks"):
+            results = face_mesh.process(rgb_frame)
 
         if results.multi_face_landmarks:
             landmarks = results.multi_face_landmarks[0].landmark
@@ -67,39 +117,45 @@ def main(video_path):
                 # Iris landmarks not detected
                 continue
 
-            left_iris_patch = extract_iris_patch(frame, landmarks, LEFT_IRIS_IDX)
-            right_iris_patch = extract_iris_patch(frame, landmarks, RIGHT_IRIS_IDX)
+            with timed("features"):
+                left_iris_patch = extract_iris_patch(frame, landmarks, LEFT_IRIS_IDX)
+                right_iris_patch = extract_iris_patch(frame, landmarks, RIGHT_IRIS_IDX)
 
-            left_hist = compute_lbp_histogram(left_iris_patch)
-            right_hist = compute_lbp_histogram(right_iris_patch)
+                left_hist = compute_lbp_histogram(left_iris_patch)
+                right_hist = compute_lbp_histogram(right_iris_patch)
 
-            dist = compare_histograms(left_hist, right_hist)
+                dist = compare_histograms(left_hist, right_hist)
             distances.append(dist)
 
-            # Optional: visualize or print
-            cv2.imshow("Left Iris", left_iris_patch)
-            cv2.imshow("Right Iris", right_iris_patch)
+            # Optional: show the patches (needs a GUI build of OpenCV)
+            if visualize:
+                cv2.imshow("Left Iris", left_iris_patch)
+                cv2.imshow("Right Iris", right_iris_patch)
 
-            if cv2.waitKey(1) & 0xFF == 27:
-                break
+                if cv2.waitKey(1) & 0xFF == 27:
+                    break
         else:
             # No face detected
             continue
 
     cap.release()
-    cv2.destroyAllWindows()
-
-    if distances:
-        avg_dist = np.mean(distances)
-        print(f"Average iris histogram distance between left and right eye: {avg_dist:.4f}")
-        if avg_dist > 0.25:
-            print("Possible iris mismatch detected — potential deepfake.")
-        else:
-            print("Iris patterns appear consistent.")
+    if visualize:
+        cv2.destroyAllWindows()
+    if own_mesh:
+        face_mesh.close()
+
+    series = {"iris_distance": distances.values()}
+    params = {"distance_threshold": distance_threshold}
+    if budget is not None:
+        budget.annotate(params)
+    with timed("verdict"):
+        metrics, verdict = score(series, params)
+    return AnalysisResult(MODULE_NAME, metrics, verdict, series, params, video_path, MODULE_VERSION)
 
 if __name__ == "__main__":
     import sys
     if len(sys.argv) < 2:
         print("Usage: python iris_alignment.py <video_path>")
     else:
-        main(sys.argv[1])
+        print(main(sys.argv[1], visualize=True))
+        dump_json()
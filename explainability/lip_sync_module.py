@@ -3,24 +3,85 @@ import sys
 import numpy as np
 import mediapipe as mp
 
+try:
+    from explainability import thresholds
+    from explainability.segments import iter_frames
+    from explainability.results import AnalysisResult, FAKE, REAL, UNKNOWN, register_renderer
+    from explainability.instrumentation import stage_timer, timed_run, dump_json
+    from explainability.signals import SignalBuffer
+except ImportError:
+    import thresholds
+    from segments import iter_frames
+    from results import AnalysisResult, FAKE, REAL, UNKNOWN, register_renderer
+    from instrumentation import stage_timer, timed_run, dump_json
+    from signals import SignalBuffer
+
+MODULE_NAME = "lip_sync_module"
+MODULE_VERSION = 2
+THRESHOLDS = thresholds.get(MODULE_NAME)
+timed = stage_timer(MODULE_NAME)
+
 mp_face_mesh = mp.solutions.face_mesh
+FACE_MESH_OPTIONS = {"max_num_faces": 1}
 
-def main(video_path):
-    face_mesh = mp_face_mesh.FaceMesh(static_image_mode=False, max_num_faces=1)
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
-        print(f"Error: Could not open {video_path}")
-        return
+def score(series, params, metrics=None):
+    """
+    Metrics and verdict from the per-frame lip opening.
 
-    lip_movements = []
+    Parameters:
+        series (dict): {"lip_distance": normalized lip gap per frame, NaN without a face}
+        params (dict): {"baseline", "mismatch_threshold"}
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
+    Returns:
+        (dict, str): metrics and verdict
+    """
+    lip_movements = np.asarray(series["lip_distance"], dtype=np.float64)
+    # Ignore frames without a detection (NaN) or without any gap
+    lip_movements = lip_movements[lip_movements > 0]
+    if lip_movements.size == 0:
+        return {"frames_with_face": 0}, UNKNOWN
+
+    avg_movement = float(np.mean(lip_movements))
+
+    # Clamp avg_movement to baseline max to avoid negative mismatch
+    clamped_movement = min(avg_movement, params["baseline"])
 
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = face_mesh.process(rgb_frame)
+    # Calculate mismatch percentage: less movement = higher mismatch
+    mismatch_percent = (1 - (clamped_movement / params["baseline"])) * 100
+
+    metrics = {"average_movement": avg_movement, "mismatch_percent": mismatch_percent,
+               "frames_with_face": int(lip_movements.size)}
+    return metrics, FAKE if mismatch_percent > params["mismatch_threshold"] else REAL
+
+def render_text(result):
+    if result.verdict == UNKNOWN:
+        return "No face detected in any frame.\n"
+    text = f"Average lip movement: {result.metrics['average_movement']:.4f}\n"
+    text += f"Lip-sync mismatch score: {result.metrics['mismatch_percent']:.2f}%\n"
+    if result.verdict == FAKE:
+        text += "Possible lip-sync mismatch — very little mouth movement detected.\n"
+    else:
+        text += "Mouth movement detected — likely synced with speech (if any).\n"
+    return text
+
+register_renderer(MODULE_NAME, render_text)
+
+@timed_run(MODULE_NAME)
+def main(video_path, baseline=THRESHOLDS["baseline"], mismatch_threshold=THRESHOLDS["mismatch_threshold"],
+         progress=None, face_mesh=None, budget=None):
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise FileNotFoundError(f"Could not open {video_path}")
+    own_mesh = face_mesh is None
+    if own_mesh:
+        face_mesh = mp_face_mesh.FaceMesh(static_image_mode=False, **FACE_MESH_OPTIONS)
+
+    lip_movements = SignalBuffer.for_capture(cap)
+    for _, frame in iter_frames(cap, progress=progress, timed=timed, budget=budget):
+        with timed("cvtcolor"):
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        with timed("landmarks"):
+            results = face_mesh.process(rgb_frame)
 
         if results.multi_face_landmarks:
             landmarks = results.multi_face_landmarks[0].landmark
@@ -28,43 +89,27 @@ def main(video_path):
             # Using landmark indices for upper and lower lip points (MediaPipe face mesh)
             # Upper lip points (example): 13, 14
             # Lower lip points (example): 308, 78
-            upper_lip_y = (landmarks[13].y + landmarks[14].y) / 2
-            lower_lip_y = (landmarks[308].y + landmarks[78].y) / 2
+            with timed("features"):
+                upper_lip_y = (landmarks[13].y + landmarks[14].y) / 2
+                lower_lip_y = (landmarks[308].y + landmarks[78].y) / 2
 
-            lip_distance = abs(upper_lip_y - lower_lip_y)
+                lip_distance = abs(upper_lip_y - lower_lip_y)
             lip_movements.append(lip_distance)
         else:
-            # No face detected in this frame; skip or append zero
-            lip_movements.append(0)
+            # No face detected in this frame
+            lip_movements.append(None)
 
     cap.release()
-    face_mesh.close()
-
-    # Filter out zeros (frames with no detection) for averaging
-    lip_movements = [m for m in lip_movements if m > 0]
-
-    if len(lip_movements) == 0:
-        print("No face detected in any frame.")
-        return
+    if own_mesh:
+        face_mesh.close()
 
-    avg_movement = np.mean(lip_movements)
-    print(f"Average lip movement: {avg_movement:.4f}")
-
-    # Baseline lip movement threshold (tune this value based on your videos)
-    baseline = 0.008
-
-    # Clamp avg_movement to baseline max to avoid negative mismatch
-    clamped_movement = min(avg_movement, baseline)
-
-    # Calculate mismatch percentage: less movement = higher mismatch
-    mismatch_percent = (1 - (clamped_movement / baseline)) * 100
-
-    print(f"Lip-sync mismatch score: {mismatch_percent:.2f}%")
-
-    if mismatch_percent > 70:
-        print("Possible lip-sync mismatch — very little mouth movement detected.")
-    else:
-        print("Mouth movement detected — likely synced with speech (if any).")
+    series = {"lip_distance": lip_movements.values()}
+    params = {"baseline": baseline, "mismatch_threshold": mismatch_threshold}
+    if budget is not None:
+        budget.annotate(params)
+    with timed("verdict"):
+        metrics, verdict = score(series, params)
+    return AnalysisResult(MODULE_NAME, metrics, verdict, series, params, video_path, MODULE_VERSION)
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
@@ -72,4 +117,5 @@ if __name__ == "__main__":
         sys.exit(1)
 
     video_path = sys.argv[1]
-    main(video_path)
+    print(main(video_path))
+    dump_json()
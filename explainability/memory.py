@@ -0,0 +1,90 @@
+import os
+import sys
+
+# RSS growth checks happen every CHECK_EVERY frames (a /proc read each)
+CHECK_EVERY = 32
+# Sampling never gets sparser than every MAX_STRIDE-th frame
+MAX_STRIDE = 16
+# Further growth, as a fraction of the budget, before the stride doubles again
+DEGRADE_STEP = 0.25
+
+
+def rss_mb():
+    """Current resident set size of this process in MB, or None where it cannot be read."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss / 1024 ** 2
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where `resource` is missing (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+class MemoryBudget:
+    """
+    Memory budget for one analyzer run that degrades the run to frame sampling.
+
+    Analyzers call keep(frame_index) for every frame and skip the frames it
+    rejects. Every CHECK_EVERY frames the growth of the process RSS since the
+    first frame is measured (set-up such as building a FaceMesh graph is not
+    counted). Past `limit_mb` only every 2nd frame is
+    kept. The stride doubles again for each further DEGRADE_STEP of the budget
+    the run grows by, up to MAX_STRIDE. An analyzer that compares neighbouring
+    frames asks for runs of consecutive frames instead (keep(i, run=2): 2 frames
+    out of every 2 * stride), so the share of frames kept is the same.
+
+    RSS is per process, so concurrent jobs count against each other's budgets:
+    under load a run is sampled earlier, never later. Where RSS cannot be read
+    the budget keeps every frame.
+    """
+
+    def __init__(self, limit_mb, check_every=CHECK_EVERY):
+        self.limit_mb = limit_mb
+        self.check_every = check_every
+        self.start_mb = None
+        self.started = False
+        self.stride = 1
+        self.degraded_at = None
+        self.peak_growth_mb = 0.0
+        self._next_limit = limit_mb
+
+    def keep(self, frame_index, run=1):
+        if not self.started:
+            self.started = True
+            self.start_mb = rss_mb()
+        elif self.start_mb is not None and frame_index % self.check_every == 0:
+            self._check(frame_index)
+        return frame_index % (self.stride * run) < run
+
+    def _check(self, frame_index):
+        growth = rss_mb() - self.start_mb
+        self.peak_growth_mb = max(self.peak_growth_mb, growth)
+        if growth > self._next_limit and self.stride < MAX_STRIDE:
+            self.stride *= 2
+            self._next_limit = growth + self.limit_mb * DEGRADE_STEP
+            if self.degraded_at is None:
+                self.degraded_at = frame_index
+
+    @property
+    def degraded(self):
+        return self.stride > 1
+
+    def annotate(self, params):
+        """Record the sampling in a result's params; unchanged when the budget was never exceeded."""
+        if self.degraded:
+            params.update(frame_stride=self.stride, sampled_from_frame=self.degraded_at)
+        return params
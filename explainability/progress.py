@@ -0,0 +1,44 @@
+import time
+
+import cv2
+
+# Minimum seconds between two reports from one analyzer loop
+MIN_INTERVAL = 0.25
+
+
+class ProgressReporter:
+    """
+    Throttled frame-progress callback for analyzer loops.
+
+    update() is called once per frame; it only forwards progress(done, total)
+    to the callback every MIN_INTERVAL seconds, so the per-frame cost is one
+    clock read. With progress=None it returns immediately.
+    """
+
+    __slots__ = ("callback", "total", "interval", "last")
+
+    def __init__(self, callback, total, interval=MIN_INTERVAL):
+        self.callback = callback
+        self.total = max(int(total), 0)
+        self.interval = interval
+        self.last = 0.0
+
+    @classmethod
+    def for_capture(cls, callback, cap, interval=MIN_INTERVAL):
+        """Reporter whose total is the capture's CAP_PROP_FRAME_COUNT."""
+        total = cap.get(cv2.CAP_PROP_FRAME_COUNT) if callback is not None else 0
+        return cls(callback, total, interval)
+
+    def update(self, done):
+        if self.callback is None:
+            return
+        now = time.monotonic()
+        if now - self.last < self.interval:
+            return
+        self.last = now
+        self.callback(done, max(self.total, done))
+
+    def finish(self, done):
+        """Always reported: the final frame count (total is corrected to it)."""
+        if self.callback is not None:
+            self.callback(done, done)
@@ -0,0 +1,144 @@
+import os
+import json
+import struct
+import importlib
+
+import numpy as np
+
+# Verdicts
+FAKE = "fake"
+REAL = "real"
+UNKNOWN = "unknown"
+VOTES = {FAKE: 1, REAL: -1, UNKNOWN: 0}
+
+# Binary layout: MAGIC, uint32 header length, JSON header, float32 series back to back
+MAGIC = b"DFR1"
+
+_RENDERERS = {}
+
+
+def register_renderer(module, render):
+    """Register `render(result) -> str` for a module's results."""
+    _RENDERERS[module] = render
+    return render
+
+
+def _renderer(module):
+    if module not in _RENDERERS:
+        # Results loaded from disk: importing the analyzer registers its renderer
+        try:
+            importlib.import_module(f"explainability.{module}")
+        except ImportError:
+            importlib.import_module(module)
+    return _RENDERERS[module]
+
+
+def _plain(value):
+    """numpy scalars / containers -> JSON-serializable Python values."""
+    if isinstance(value, dict):
+        return {str(k): _plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+class AnalysisResult:
+    """
+    Typed output of one analyzer.
+
+    metrics: scalar summaries of the video (JSON-serializable)
+    verdict: FAKE, REAL or UNKNOWN
+    series: name -> float32 per-frame signal (NaN where a frame has no value)
+    params: thresholds the verdict was computed with
+    source: analyzed file
+
+    str(result) is the report text, rendered from the fields by the module's
+    registered renderer.
+    """
+
+    __slots__ = ("module", "version", "metrics", "verdict", "series", "params", "source")
+
+    def __init__(self, module, metrics=None, verdict=UNKNOWN, series=None, params=None, source=None, version=None):
+        self.module = module
+        self.version = version
+        self.metrics = _plain(metrics or {})
+        self.verdict = verdict
+        self.series = {name: np.ascontiguousarray(values, dtype=np.float32).reshape(-1)
+                       for name, values in (series or {}).items()}
+        self.params = _plain(params or {})
+        self.source = source
+
+    @property
+    def vote(self):
+        return VOTES.get(self.verdict, 0)
+
+    @property
+    def text(self):
+        text = _renderer(self.module)(self)
+        if self.params.get("frame_stride"):
+            # Set by memory.MemoryBudget.annotate when the run was degraded to sampling
+            text += (f"Memory budget exceeded: frames sampled from frame {self.params['sampled_from_frame']} on, "
+                     f"down to 1 in {self.params['frame_stride']}; results are approximate.\n")
+        return text
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        return f"AnalysisResult({self.module!r}, verdict={self.verdict!r}, metrics={self.metrics!r})"
+
+    def to_dict(self, include_series=False):
+        data = {
+            "module": self.module,
+            "version": self.version,
+            "verdict": self.verdict,
+            "metrics": self.metrics,
+            "params": self.params,
+            "source": self.source,
+        }
+        if include_series:
+            data["series"] = {name: [None if np.isnan(v) else float(v) for v in values]
+                              for name, values in self.series.items()}
+        return data
+
+    def to_bytes(self):
+        header = self.to_dict()
+        header["series"] = [[name, int(values.size)] for name, values in self.series.items()]
+        header = json.dumps(header).encode("utf-8")
+        body = b"".join(values.astype("<f4", copy=False).tobytes() for values in self.series.values())
+        return MAGIC + struct.pack("<I", len(header)) + header + body
+
+    @classmethod
+    def from_bytes(cls, data):
+        if data[:4] != MAGIC:
+            raise ValueError("Not an analysis result (bad magic)")
+        (header_len,) = struct.unpack_from("<I", data, 4)
+        header = json.loads(data[8:8 + header_len].decode("utf-8"))
+        offset = 8 + header_len
+        series = {}
+        for name, size in header.pop("series"):
+            series[name] = np.frombuffer(data, dtype="<f4", count=size, offset=offset)
+            offset += 4 * size
+        return cls.from_dict(header, series)
+
+    @classmethod
+    def from_dict(cls, data, series=None):
+        """Inverse of to_dict(); `series` overrides any series in `data`."""
+        if series is None:
+            series = {name: np.array([np.nan if v is None else v for v in values], dtype=np.float32)
+                      for name, values in data.get("series", {}).items()}
+        return cls(data["module"], data["metrics"], data["verdict"], series, data["params"],
+                   data.get("source"), data.get("version"))
+
+    def save(self, path):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self.to_bytes())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
@@ -0,0 +1,125 @@
+import os
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+
+try:
+    from explainability.progress import ProgressReporter
+    from explainability.instrumentation import untimed
+except ImportError:
+    from progress import ProgressReporter
+    from instrumentation import untimed
+
+# Worker processes used when a caller does not pass `workers` (1 = no splitting)
+DEFAULT_WORKERS = int(os.environ.get("DEEPFAKE_SEGMENT_WORKERS", "1"))
+# Shorter segments are not worth a process start-up
+MIN_SEGMENT_FRAMES = 300
+
+
+def video_frame_count(video_path):
+    cap = cv2.VideoCapture(video_path)
+    count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) if cap.isOpened() else 0
+    cap.release()
+    return max(count, 0)
+
+
+def split_frame_ranges(frame_count, segments, min_frames=MIN_SEGMENT_FRAMES):
+    """Split [0, frame_count) into up to `segments` contiguous (start, end) ranges.
+
+    The last range is open-ended (end=None) so frames beyond an inaccurate
+    CAP_PROP_FRAME_COUNT are still read.
+    """
+    segments = max(1, min(segments, frame_count // max(min_frames, 1)))
+    if segments == 1:
+        return [(0, None)]
+    size = frame_count // segments
+    ranges = [(i * size, (i + 1) * size) for i in range(segments)]
+    ranges[-1] = (ranges[-1][0], None)
+    return ranges
+
+
+def segment_ranges(video_path, workers=None):
+    """Frame ranges run_segmented splits the video into with `workers` (one range: it runs in-process)."""
+    workers = DEFAULT_WORKERS if workers is None else workers
+    if workers <= 1:
+        return [(0, None)]
+    return split_frame_ranges(video_frame_count(video_path), workers)
+
+
+def iter_frames(cap, start=0, end=None, progress=None, timed=None, budget=None, run=1):
+    """Yield (frame_index, frame) for frames [start, end) of an opened capture.
+
+    `progress(done, total)` is reported (throttled) as frames are read; reads
+    are timed as the "decode" stage of `timed` (an instrumentation.stage_timer).
+    Frames a `budget` (memory.MemoryBudget) rejects are grabbed, not yielded,
+    so frame_index skips them: an analyzer that compares neighbouring frames
+    must not treat the frames either side of a gap as consecutive. It passes
+    `run` to have the budget keep that many consecutive frames at a time.
+    """
+    reporter = ProgressReporter.for_capture(progress, cap)
+    timed = timed or untimed
+    if start:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    idx = start
+    while end is None or idx < end:
+        if budget is not None and not budget.keep(idx, run):
+            with timed("decode"):
+                ret = cap.grab()
+            if not ret:
+                break
+        else:
+            with timed("decode"):
+                ret, frame = cap.read()
+            if not ret:
+                break
+            yield idx, frame
+        idx += 1
+        reporter.update(idx)
+    reporter.finish(idx)
+
+
+def run_segmented(analyze_segment, video_path, workers=None, progress=None, face_mesh=None, budget=None, **kwargs):
+    """
+    Run `analyze_segment(video_path, start, end, **kwargs)` over frame-range segments
+    in parallel and merge the partial states in order.
+
+    `analyze_segment` must be a module-level function returning an object with a
+    `merge(other)` method. With one worker (or a short video) it is called once
+    for the whole video in this process, with `progress` passed through; otherwise
+    progress is reported as whole segments finish. A caller-owned `face_mesh`
+    graph or memory `budget` cannot cross processes, so passing one keeps the
+    run in-process; a caller that wants the split checks segment_ranges() first
+    and passes neither.
+    """
+    ranges = [(0, None)]
+    if face_mesh is None and budget is None:
+        ranges = segment_ranges(video_path, workers)
+    if len(ranges) == 1:
+        if face_mesh is not None:
+            kwargs["face_mesh"] = face_mesh
+        if budget is not None:
+            kwargs["budget"] = budget
+        return analyze_segment(video_path, 0, None, progress=progress, **kwargs)
+
+    # spawn, not fork. A forked child copies the parent's memory but only the
+    # thread that forked: MediaPipe graphs, TensorFlow's thread pools and the
+    # model server already running in the parent come across with their locks
+    # possibly held and their threads gone, and the child can hang in them.
+    # A spawned worker starts a fresh interpreter that imports the analyzers
+    # and builds its own graphs. Scripts that fan analyses out over processes
+    # use spawn for the same reason.
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=len(ranges), mp_context=ctx) as pool:
+        futures = {pool.submit(analyze_segment, video_path, start, end, **kwargs): (start, end)
+                   for start, end in ranges}
+        frame_count = video_frame_count(video_path)
+        done = 0
+        for future in as_completed(futures):
+            start, end = futures[future]
+            done += (frame_count if end is None else end) - start
+            if progress is not None:
+                progress(done, frame_count)
+        partials = [future.result() for future in futures]
+    return functools.reduce(lambda a, b: a.merge(b), partials)
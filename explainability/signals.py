@@ -0,0 +1,130 @@
+import cv2
+import numpy as np
+
+# Capacity used when the capture does not report a frame count
+DEFAULT_CAPACITY = 256
+
+
+class SignalBuffer:
+    """
+    Growable float32 signal with a validity bitmap, for per-frame analyzer output.
+
+    Replaces the Python lists of floats the analyzers used to append to: values
+    live in one preallocated float32 array (4 bytes each instead of ~32 for a
+    list slot plus a boxed float) and one bit per value records whether it is
+    valid. The array is sized up front, usually from CAP_PROP_FRAME_COUNT, and
+    doubles when a video turns out longer. Invalid values read back as NaN.
+
+    `channels` > 1 stores a fixed-width row per entry (e.g. yaw, pitch, roll).
+    """
+
+    __slots__ = ("_data", "_bits", "size", "channels")
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, channels=1):
+        capacity = max(int(capacity), 1)
+        self.channels = channels
+        self._data = np.empty((capacity, channels) if channels > 1 else capacity, dtype=np.float32)
+        self._bits = np.zeros((capacity + 7) // 8, dtype=np.uint8)
+        self.size = 0
+
+    @classmethod
+    def for_capture(cls, cap, start=0, end=None, channels=1):
+        """Buffer sized for frames [start, end) of an opened capture."""
+        return cls(capacity_for(cap, start, end), channels)
+
+    def __len__(self):
+        return self.size
+
+    def __bool__(self):
+        return self.size > 0
+
+    @property
+    def capacity(self):
+        return len(self._data)
+
+    @property
+    def nbytes(self):
+        return self._data.nbytes + self._bits.nbytes
+
+    def _reserve(self, count):
+        needed = self.size + count
+        if needed <= self.capacity:
+            return
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        data = np.empty((capacity,) + self._data.shape[1:], dtype=np.float32)
+        data[:self.size] = self._data[:self.size]
+        bits = np.zeros((capacity + 7) // 8, dtype=np.uint8)
+        bits[:len(self._bits)] = self._bits
+        self._data, self._bits = data, bits
+
+    def append(self, value):
+        """Add one entry; None (or NaN) records a missing value."""
+        self._reserve(1)
+        i = self.size
+        if value is None:
+            self._data[i] = np.nan
+        else:
+            self._data[i] = value
+            if not np.isnan(self._data[i]).any():
+                self._bits[i >> 3] |= 1 << (i & 7)
+        self.size = i + 1
+
+    def append_missing(self, count=1):
+        """Add `count` missing entries (bits stay clear)."""
+        if count <= 0:
+            return
+        self._reserve(count)
+        self._data[self.size:self.size + count] = np.nan
+        self.size += count
+
+    def extend(self, other):
+        """Append another buffer (e.g. the next segment's) or an array / sequence of values."""
+        if isinstance(other, SignalBuffer):
+            values, valid = other._data[:other.size], other.valid_mask()
+        else:
+            values = np.asarray(other, dtype=np.float32).reshape((-1,) + self._data.shape[1:])
+            valid = ~np.isnan(values) if values.ndim == 1 else ~np.isnan(values).any(axis=1)
+        if not len(values):
+            return self
+        self._reserve(len(values))
+        self._data[self.size:self.size + len(values)] = values
+        index = self.size + np.flatnonzero(valid)
+        np.bitwise_or.at(self._bits, index >> 3, (1 << (index & 7)).astype(np.uint8))
+        self.size += len(values)
+        return self
+
+    def valid_mask(self):
+        return np.unpackbits(self._bits, count=self.size, bitorder="little").astype(bool)
+
+    def values(self):
+        """float32 copy of the entries, NaN where missing."""
+        return self._data[:self.size].copy()
+
+    def valid_values(self):
+        """float32 copy of the valid entries only."""
+        return self._data[:self.size][self.valid_mask()]
+
+    def __array__(self, dtype=None, copy=None):
+        values = self.values()
+        return values if dtype is None else values.astype(dtype)
+
+    def __reduce__(self):
+        # Pickled trimmed to its size, e.g. when a segment partial returns from a worker process
+        return _restore, (self.values(), self._bits[:(self.size + 7) // 8].copy(), self.channels)
+
+
+def capacity_for(cap, start=0, end=None):
+    """Frames in [start, end) of an opened capture, by CAP_PROP_FRAME_COUNT (DEFAULT_CAPACITY if unknown)."""
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) if cap is not None else 0
+    count = (end if end is not None else total) - start
+    return count if count > 0 else DEFAULT_CAPACITY
+
+
+def _restore(values, bits, channels):
+    buffer = SignalBuffer(len(values), channels)
+    buffer._data[:len(values)] = values
+    buffer._bits[:len(bits)] = bits
+    buffer.size = len(values)
+    return buffer
@@ -3,6 +3,24 @@ import numpy as np
 from skimage.feature import local_binary_pattern
 import mediapipe as mp
 
+try:
+    from explainability import thresholds
+    from explainability.results import AnalysisResult, FAKE, REAL, UNKNOWN, register_renderer
+    from explainability.segments import iter_frames, run_segmented
+    from explainability.instrumentation import stage_timer, timed_run, dump_json
+    from explainability.signals import SignalBuffer, capacity_for, DEFAULT_CAPACITY
+except ImportError:
+    import thresholds
+    from results import AnalysisResult, FAKE, REAL, UNKNOWN, register_renderer
+    from segments import iter_frames, run_segmented
+    from instrumentation import stage_timer, timed_run, dump_json
+    from signals import SignalBuffer, capacity_for, DEFAULT_CAPACITY
+
+MODULE_NAME = "texture_analyzer"
+MODULE_VERSION = 1
+THRESHOLDS = thresholds.get(MODULE_NAME)
+timed = stage_timer(MODULE_NAME)
+
 # Constants for LBP
 RADIUS = 3
 N_POINTS = 8 * RADIUS
@@ -10,6 +28,9 @@ METHOD = 'uniform'
 
 # Mediapipe Face Mesh
 mp_face_mesh = mp.solutions.face_mesh
+FACE_MESH_OPTIONS = {"max_num_faces": 1}
+# Parameters baked into the stored series: changing them needs a re-analysis, not a re-score
+SERIES_PARAMS = ("scar_gray_level",)
 
 # Forehead landmark indices (approximate region above eyebrows)
 FOREHEAD_IDX = [10, 338, 297, 332, 284, 251, 389, 356, 454, 323]
@@ -43,63 +64,131 @@ def hsv_histogram(img):
 def chi_square_distance(histA, histB):
     return 0.5 * np.sum(((histA - histB) ** 2) / (histA + histB + 1e-7))
 
-def detect_scar_mole(img, threshold=30):
+def detect_scar_mole(img, threshold=THRESHOLDS["scar_gray_level"]):
     gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
     _, thresh = cv2.threshold(gray, threshold, 255, cv2.THRESH_BINARY_INV)
     ratio = np.sum(thresh == 255) / (img.shape[0] * img.shape[1])
     return ratio
 
-def main(video_path):
+class TexturePartial:
+    """
+    Mergeable forehead texture state for a frame range.
+
+    The first forehead crop with data is the reference (its histograms are kept,
+    its scar ratio is held back); later crops add to the scar ratio series. The
+    last crop seen is kept so the reference comparison is made once all segments
+    are merged.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.ref_lbp = None
+        self.ref_hsv = None
+        self.first_scar = None
+        self.scar_ratios = SignalBuffer(capacity)
+        self.last_forehead = None
+
+    def add(self, forehead):
+        self.last_forehead = forehead
+        if forehead.size == 0:
+            return
+        scar_ratio = detect_scar_mole(forehead)
+        if self.ref_lbp is None:
+            self.ref_lbp = lbp_histogram(forehead)
+            self.ref_hsv = hsv_histogram(forehead)
+            self.first_scar = scar_ratio
+            return
+        self.scar_ratios.append(scar_ratio)
+
+    def merge(self, other):
+        if self.ref_lbp is None:
+            self.ref_lbp, self.ref_hsv, self.first_scar = other.ref_lbp, other.ref_hsv, other.first_scar
+        elif other.first_scar is not None:
+            # the other segment's reference frame is an ordinary frame in the merged video
+            self.scar_ratios.append(other.first_scar)
+        self.scar_ratios.extend(other.scar_ratios)
+        if other.last_forehead is not None:
+            self.last_forehead = other.last_forehead
+        return self
+
+
+def analyze_segment(video_path, start=0, end=None, progress=None, face_mesh=None, budget=None):
     cap = cv2.VideoCapture(video_path)
-    face_mesh = mp_face_mesh.FaceMesh(static_image_mode=False, max_num_faces=1)
-
-    ref_lbp = None
-    ref_hsv = None
-    scar_ratios = []
-
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        results = face_mesh.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    own_mesh = face_mesh is None
+    if own_mesh:
+        face_mesh = mp_face_mesh.FaceMesh(static_image_mode=False, **FACE_MESH_OPTIONS)
+
+    partial = TexturePartial(capacity_for(cap, start, end))
+    for _, frame in iter_frames(cap, start, end, progress, timed, budget):
+        with timed("cvtcolor"):
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        with timed("landmarks"):
+            results = face_mesh.process(rgb_frame)
         if results.multi_face_landmarks:
             landmarks = results.multi_face_landmarks[0].landmark
-            forehead = extract_forehead_region(frame, landmarks, FOREHEAD_IDX)
-            
-            if forehead.size == 0:
-                continue
-
-            lbp_hist = lbp_histogram(forehead)
-            hsv_hist = hsv_histogram(forehead)
-            scar_ratio = detect_scar_mole(forehead)
-
-            if ref_lbp is None:
-                ref_lbp = lbp_hist
-                ref_hsv = hsv_hist
-                continue
-
-            scar_ratios.append(scar_ratio)
+            with timed("features"):
+                partial.add(extract_forehead_region(frame, landmarks, FOREHEAD_IDX))
 
     cap.release()
+    if own_mesh:
+        face_mesh.close()
+    return partial
+
+def score(series, params, metrics):
+    """
+    Verdict from the texture distances and the scar ratio series.
+
+    Parameters:
+        series (dict): {"scar_ratio": per face frame after the reference frame}
+        params (dict): {"lbp_threshold", "hsv_threshold", "scar_threshold"}
+        metrics (dict): {"lbp_distance", "hsv_distance"} against the reference frame
+
+    Returns:
+        (dict, str): metrics (with "scar_ratio" added) and verdict
+    """
+    scar_ratios = np.asarray(series["scar_ratio"])
+    if scar_ratios.size == 0:
+        return dict(metrics), UNKNOWN
+    metrics = dict(metrics, scar_ratio=float(np.mean(scar_ratios, dtype=np.float64)))
+    suspicious = (metrics["lbp_distance"] > params["lbp_threshold"] or metrics["hsv_distance"] > params["hsv_threshold"]
+                  or metrics["scar_ratio"] > params["scar_threshold"])
+    return metrics, FAKE if suspicious else REAL
+
+def render_text(result):
+    if result.verdict == UNKNOWN:
+        return "No forehead data to analyze.\n"
+
+    metrics = result.metrics
+    result_str = f"Avg Skin Texture Mismatch (LBP chi-square): {metrics['lbp_distance']:.4f}\n"
+    result_str += f"Avg Skin Color Mismatch (HSV chi-square): {metrics['hsv_distance']:.4f}\n"
+    result_str += f"Avg Scar/Mole ratio on forehead: {metrics['scar_ratio']:.4%}\n"
+
+    if result.verdict == FAKE:
+        result_str += "Possible forehead skin mismatch or anomaly — potential morphing detected.\n"
+    else:
+        result_str += "Forehead skin texture and color appear consistent.\n"
+    return result_str
 
-    if scar_ratios:
-        avg_lbp_dist = np.mean([chi_square_distance(ref_lbp, lbp_histogram(forehead)) for _ in scar_ratios])
-        avg_hsv_dist = np.mean([chi_square_distance(ref_hsv, hsv_histogram(forehead)) for _ in scar_ratios])
-        avg_scar_ratio = np.mean(scar_ratios)
+register_renderer(MODULE_NAME, render_text)
 
-        result_str = f"Avg Skin Texture Mismatch (LBP chi-square): {avg_lbp_dist:.4f}\n"
-        result_str += f"Avg Skin Color Mismatch (HSV chi-square): {avg_hsv_dist:.4f}\n"
-        result_str += f"Avg Scar/Mole ratio on forehead: {avg_scar_ratio:.4%}\n"
+@timed_run(MODULE_NAME)
+def main(video_path, lbp_threshold=THRESHOLDS["lbp_threshold"], hsv_threshold=THRESHOLDS["hsv_threshold"],
+         scar_threshold=THRESHOLDS["scar_threshold"], workers=None, progress=None, face_mesh=None, budget=None):
+    partial = run_segmented(analyze_segment, video_path, workers, progress, face_mesh, budget)
 
-        if avg_lbp_dist > 0.3 or avg_hsv_dist > 0.3 or avg_scar_ratio > 0.02:
-            result_str += "Possible forehead skin mismatch or anomaly — potential morphing detected.\n"
-        else:
-            result_str += "Forehead skin texture and color appear consistent.\n"
-    else:
-        result_str = "No forehead data to analyze.\n"
+    metrics = {}
+    if partial.scar_ratios:
+        forehead = partial.last_forehead
+        metrics["lbp_distance"] = float(chi_square_distance(partial.ref_lbp, lbp_histogram(forehead)))
+        metrics["hsv_distance"] = float(chi_square_distance(partial.ref_hsv, hsv_histogram(forehead)))
 
-    return result_str
+    series = {"scar_ratio": partial.scar_ratios.values()}
+    params = {"lbp_threshold": lbp_threshold, "hsv_threshold": hsv_threshold, "scar_threshold": scar_threshold,
+              "scar_gray_level": THRESHOLDS["scar_gray_level"]}
+    if budget is not None:
+        budget.annotate(params)
+    with timed("verdict"):
+        metrics, verdict = score(series, params, metrics)
+    return AnalysisResult(MODULE_NAME, metrics, verdict, series, params, video_path, MODULE_VERSION)
 
 if __name__ == "__main__":
     import sys
@@ -108,3 +197,4 @@ if __name__ == "__main__":
     else:
         output = main(sys.argv[1])
         print(output)
+        dump_json()
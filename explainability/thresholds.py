@@ -0,0 +1,56 @@
+import os
+import copy
+import json
+import hashlib
+
+# Optional JSON overrides, e.g. {"flicker_detection": {"threshold": 12}}
+CONFIG_PATH = os.environ.get(
+    "DEEPFAKE_THRESHOLDS",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "thresholds.json"),
+)
+
+# Verdict thresholds per module (module file name -> parameters)
+DEFAULTS = {
+    "eye_blink_mismatch": {"ear_threshold": 0.3, "consecutive_frames": 1, "asymmetry_threshold": 0.3},
+    "iris_alignment": {"distance_threshold": 0.25},
+    "eyebrow_mismatch": {"diff_threshold": 10.0},
+    "texture_analyzer": {"lbp_threshold": 0.3, "hsv_threshold": 0.3, "scar_threshold": 0.02, "scar_gray_level": 30},
+    "flicker_detection": {"threshold": 15.0},
+    "lip_sync_module": {"baseline": 0.008, "mismatch_threshold": 70.0},
+    "cnn_detector": {"fake_threshold": 0.5},
+    "blink_detector": {"ear_threshold": 0.4, "consec_frames": 2},
+    "head_pose_inconsistency": {"max_jump_threshold_deg": 20.0, "max_range_threshold_deg": 45.0,
+                                "jump_event_count_threshold": 5},
+}
+
+
+def merge(overrides, config=None):
+    """Copy of `config` (default: the defaults) with per-module `overrides` applied."""
+    config = copy.deepcopy(DEFAULTS if config is None else config)
+    for module, values in overrides.items():
+        config.setdefault(module, {}).update(values)
+    return config
+
+
+def load_thresholds(path=CONFIG_PATH):
+    """Defaults overlaid with the JSON config file, if it exists."""
+    overrides = {}
+    if path and os.path.exists(path):
+        with open(path) as f:
+            overrides = json.load(f)
+    return merge(overrides)
+
+
+# Read once at import: modules take their defaults from here at startup
+THRESHOLDS = load_thresholds()
+
+
+def get(module):
+    return THRESHOLDS.get(module, {})
+
+
+def fingerprint(module=None, config=None):
+    """Short hash of the effective thresholds (one module's section, or all of them)."""
+    config = THRESHOLDS if config is None else config
+    section = config.get(module, {}) if module else config
+    return hashlib.sha256(json.dumps(section, sort_keys=True).encode("utf-8")).hexdigest()[:16]
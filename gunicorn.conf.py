@@ -0,0 +1,40 @@
+import os
+
+# Production server: pre-forked workers sharing one preloaded copy of app.py.
+# Run from the repository root (this file is picked up automatically):
+#   gunicorn app:app
+#   DEEPFAKE_WORKERS=8 DEEPFAKE_BIND=0.0.0.0:8000 gunicorn app:app
+# Users, upload counts and job progress live in SQLite (DEEPFAKE_STATE_DB), so
+# any worker can serve any request. /metrics reports the worker that answers
+# (it needs an API key unless DEEPFAKE_METRICS_PUBLIC=1).
+# Set DEEPFAKE_SECRET_KEY: it signs the session cookies all workers accept.
+
+bind = os.environ.get("DEEPFAKE_BIND", "127.0.0.1:5000")
+workers = int(os.environ.get("DEEPFAKE_WORKERS", os.cpu_count() or 1))
+# Threads per worker: an SSE progress stream holds one while its job runs
+worker_class = "gthread"
+threads = int(os.environ.get("DEEPFAKE_THREADS", "8"))
+# Import app.py (and the analyzers, see when_ready) once in the master; the
+# workers share those pages copy-on-write
+preload_app = True
+# Large uploads are streamed to disk within a single request
+timeout = int(os.environ.get("DEEPFAKE_WORKER_TIMEOUT", "300"))
+graceful_timeout = 60
+keepalive = 5
+# No max_requests: a recycled worker would take its running jobs with it
+
+# The background warm-up thread must not start in the master, which forks
+# after importing app.py; post_fork() warms up each worker instead
+os.environ["DEEPFAKE_WARMUP"] = "0"
+
+
+def when_ready(server):
+    # app.py has been imported by now (preload_app), before any worker is forked
+    import app
+    app.preload()
+    server.log.info("Preloaded analyzers: %s", ", ".join(sorted(app.analyzers.load_seconds())))
+
+
+def post_fork(server, worker):
+    import app
+    app.post_fork()
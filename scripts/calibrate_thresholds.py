@@ -0,0 +1,345 @@
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+
+import numpy as np
+
+from explainability import thresholds
+from serving.rescore import stack
+from serving.series_store import SeriesStore, SERIES_DIR
+
+# Run from the repository root after analyzing the labelled videos:
+#   python -m scripts.calibrate_thresholds --fn-cost 2
+
+LABELS_CSV = "video_stats.csv"
+# Candidate values per swept parameter when there is no observed statistic to
+# take them from; the current config value is always added
+EAR_GRID = np.round(np.arange(0.10, 0.41, 0.01), 2)
+CONSECUTIVE_FRAMES_GRID = np.arange(1, 7)
+ASYMMETRY_GRID = np.round(np.arange(0.0, 1.0, 0.05), 2)
+MISMATCH_GRID = np.arange(0.0, 100.0, 1.0)
+QUANTILES = 41
+
+
+def load_labels(path=LABELS_CSV):
+    """{file name: True for fake, False for real}"""
+    with open(path, newline="") as f:
+        return {row["Filename"]: row["Class"].strip().lower() == "fake" for row in csv.DictReader(f)}
+
+
+def load_corpus(store, labels, hashes=None):
+    """
+    Stored results of the labelled videos.
+
+    Parameters:
+        store (SeriesStore): stored per-frame series
+        labels (dict): file name -> True for fake
+        hashes (set): only videos with these content hashes (default: every stored video)
+
+    Returns:
+        (dict, list): {module: (results, labels as a bool array)} and the labelled
+                      file names that have no stored series
+    """
+    by_module = {}
+    seen = set()
+    for _, meta, results in store.iter_videos(hashes=hashes):
+        filename = meta.get("filename")
+        if filename not in labels or filename in seen:
+            continue
+        seen.add(filename)
+        for module, result in results.items():
+            by_module.setdefault(module, ([], []))
+            by_module[module][0].append(result)
+            by_module[module][1].append(labels[filename])
+    corpus = {m: (results, np.asarray(y, dtype=bool)) for m, (results, y) in by_module.items()}
+    return corpus, sorted(set(labels) - seen)
+
+
+def cut_points(stat, current):
+    """Thresholds between consecutive observed values (plus both ends and `current`): the exact ROC of `stat > t`."""
+    values = np.unique(stat[np.isfinite(stat)])
+    if values.size == 0:
+        return np.array([current], dtype=np.float64)
+    cuts = np.concatenate(([values[0] - 1.0], (values[:-1] + values[1:]) / 2, [values[-1]]))
+    return np.union1d(cuts, [current])
+
+
+def quantile_grid(values, current, size=QUANTILES):
+    values = np.asarray(values, dtype=np.float64)
+    values = values[np.isfinite(values)]
+    grid = np.quantile(values, np.linspace(0, 1, size)) if values.size else np.array([])
+    return np.union1d(grid, [current])
+
+
+def mesh(**axes):
+    """Cartesian product of the parameter axes: {name: flat array} with one entry per grid point."""
+    grids = np.meshgrid(*axes.values(), indexing="ij")
+    return {name: g.reshape(-1) for name, g in zip(axes, grids)}
+
+
+# Each sweep returns (grid, predictions): grid maps parameter name -> values
+# (one per grid point) and predictions is a (grid points x videos) bool array,
+# True where the module would flag the video as fake. Videos a module cannot
+# judge (no face, ...) are never flagged, as in the fused vote.
+
+def sweep_scalar(stat, param, current):
+    """Modules whose verdict is `stat > threshold`."""
+    grid = {param: cut_points(stat, current)}
+    with np.errstate(invalid="ignore"):
+        return grid, stat[None, :] > grid[param][:, None]
+
+
+def sweep_flicker(results, current):
+    diffs, _ = stack([r.series["frame_diff"] for r in results], fill=-np.inf)
+    # Some difference above the threshold <=> the largest one is
+    return sweep_scalar(diffs.max(axis=1, initial=-np.inf), "threshold", current["threshold"])
+
+
+def sweep_eyebrow(results, current):
+    left, lengths = stack([r.series["left_eyebrow_y"] for r in results])
+    right, _ = stack([r.series["right_eyebrow_y"] for r in results])
+    valid = np.arange(left.shape[1]) < lengths[:, None]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # Missing frames take the side's mean, as in eyebrow_mismatch.score
+        # (all-NaN rows stay NaN: no face, never flagged)
+        def fill_missing(side):
+            found = ~np.isnan(side)
+            mean = np.nansum(side, axis=1, keepdims=True) / found.sum(axis=1, keepdims=True)
+            return np.where(found, side, mean)
+
+        left, right = fill_missing(left), fill_missing(right)
+        avg_diff = np.sum(np.where(valid, np.abs(left - right), 0.0), axis=1) / lengths
+    return sweep_scalar(avg_diff, "diff_threshold", current["diff_threshold"])
+
+
+def sweep_iris(results, current):
+    distances, lengths = stack([r.series["iris_distance"] for r in results], fill=0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        avg = distances.sum(axis=1) / lengths
+    return sweep_scalar(avg, "distance_threshold", current["distance_threshold"])
+
+
+def sweep_cnn(results, current):
+    probs, lengths = stack([r.series["fake_probability"] for r in results], fill=0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        avg = probs.sum(axis=1) / lengths
+    return sweep_scalar(avg, "fake_threshold", current["fake_threshold"])
+
+
+def sweep_lip(results, current):
+    lips, _ = stack([r.series["lip_distance"] for r in results], fill=0.0)
+    moving = np.nan_to_num(lips) > 0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        avg = np.where(moving, lips, 0.0).sum(axis=1) / moving.sum(axis=1)
+    # The baseline only scales the reported percentage: sweeping the mismatch
+    # threshold at a fixed baseline covers every decision boundary
+    baseline = current["baseline"]
+    grid = mesh(baseline=np.array([baseline]),
+                mismatch_threshold=np.union1d(MISMATCH_GRID, [current["mismatch_threshold"]]))
+    mismatch = (1 - np.minimum(avg, baseline) / baseline) * 100
+    with np.errstate(invalid="ignore"):
+        return grid, mismatch[None, :] > grid["mismatch_threshold"][:, None]
+
+
+def sweep_texture(results, current):
+    lbp = np.array([r.metrics.get("lbp_distance", np.nan) for r in results], dtype=np.float64)
+    hsv = np.array([r.metrics.get("hsv_distance", np.nan) for r in results], dtype=np.float64)
+    scars, lengths = stack([r.series["scar_ratio"] for r in results], fill=0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        scar = scars.sum(axis=1) / lengths
+    grid = mesh(lbp_threshold=quantile_grid(lbp, current["lbp_threshold"]),
+                hsv_threshold=quantile_grid(hsv, current["hsv_threshold"]),
+                scar_threshold=quantile_grid(scar, current["scar_threshold"]))
+    with np.errstate(invalid="ignore"):
+        flagged = ((lbp[None, :] > grid["lbp_threshold"][:, None])
+                   | (hsv[None, :] > grid["hsv_threshold"][:, None])
+                   | (scar[None, :] > grid["scar_threshold"][:, None]))
+    return grid, flagged & (lengths > 0)[None, :]
+
+
+def blink_counts(ear, ear_thresholds, windows):
+    """
+    Blink counts of every EAR sequence for every (threshold, window) pair.
+
+    Parameters:
+        ear (ndarray): (sequences x frames) EAR, padded with +inf
+        ear_thresholds (ndarray): E thresholds
+        windows (ndarray): K minimum run lengths (consecutive_frames)
+
+    Returns:
+        ndarray: (E x K x sequences) counts, as eye_blink_mismatch.count_blinks
+    """
+    idx = np.arange(ear.shape[1], dtype=np.int32)
+    counts = np.empty((len(ear_thresholds), len(windows), ear.shape[0]), dtype=np.int64)
+    # One threshold at a time keeps the working set at (sequences x frames)
+    for i, threshold in enumerate(ear_thresholds):
+        closed = ear < threshold
+        # Length of the closed run ending at each frame; a run of length >= k
+        # passes through length == k exactly once
+        run = idx - np.maximum.accumulate(np.where(closed, np.int32(-1), idx), axis=-1)
+        for j, k in enumerate(windows):
+            counts[i, j] = np.count_nonzero(run == k, axis=-1)
+    return counts
+
+
+def sweep_eye_blink(results, current):
+    sequences, owner = [], []
+    for video, result in enumerate(results):
+        for person in result.metrics.get("persons", []):
+            for side in ("left", "right"):
+                seq = np.asarray(result.series[f"person{person['id']}_{side}_ear"], dtype=np.float64)
+                sequences.append(np.nan_to_num(seq, nan=np.nanmean(seq)))
+            owner.append(video)
+    ears = np.union1d(EAR_GRID, [current["ear_threshold"]])
+    windows = np.union1d(CONSECUTIVE_FRAMES_GRID, [current["consecutive_frames"]]).astype(np.int64)
+    asymmetries = np.union1d(ASYMMETRY_GRID, [current["asymmetry_threshold"]])
+    grid = mesh(ear_threshold=ears, consecutive_frames=windows, asymmetry_threshold=asymmetries)
+    if not sequences:
+        return grid, np.zeros((grid["ear_threshold"].size, len(results)), dtype=bool)
+
+    ear, _ = stack(sequences, fill=np.inf)
+    counts = blink_counts(ear, ears, windows)                     # E x K x 2P
+    left, right = counts[..., 0::2], counts[..., 1::2]
+    most = np.maximum(left, right)
+    asym = np.abs(left - right) / np.maximum(most, 1)             # 0 when neither eye blinked
+    mismatch = asym[None] > asymmetries[:, None, None, None]      # A x E x K x P
+
+    # A video is flagged when any of its persons mismatches
+    owners = np.zeros((len(owner), len(results)), dtype=np.int64)
+    owners[np.arange(len(owner)), owner] = 1
+    flagged = (mismatch.astype(np.int64) @ owners) > 0            # A x E x K x V
+    # Reorder to the mesh (ear, window, asymmetry) order
+    flagged = flagged.transpose(1, 2, 0, 3).reshape(-1, len(results))
+    return grid, flagged
+
+
+SWEEPS = {
+    "flicker_detection": sweep_flicker,
+    "eyebrow_mismatch": sweep_eyebrow,
+    "iris_alignment": sweep_iris,
+    "cnn_detector": sweep_cnn,
+    "lip_sync_module": sweep_lip,
+    "texture_analyzer": sweep_texture,
+    "eye_blink_mismatch": sweep_eye_blink,
+}
+
+
+def roc_auc(fpr, tpr):
+    """Area under the ROC envelope of the grid's operating points."""
+    order = np.lexsort((tpr, fpr))
+    fpr = np.concatenate(([0.0], fpr[order], [1.0]))
+    tpr = np.maximum.accumulate(np.concatenate(([0.0], tpr[order], [1.0])))
+    return float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2))
+
+
+def evaluate(grid, flagged, labels, current, fp_cost, fn_cost):
+    """Confusion counts and cost of every grid point; picks the cheapest operating point."""
+    fake = labels.astype(np.int64)
+    tp = flagged.astype(np.int64) @ fake
+    fp = flagged.astype(np.int64) @ (1 - fake)
+    positives, negatives = int(fake.sum()), int((1 - fake).sum())
+    tpr = tp / max(positives, 1)
+    fpr = fp / max(negatives, 1)
+    cost = (fp_cost * fp + fn_cost * (positives - tp)) / max(labels.size, 1)
+    # Cheapest first, then the larger TPR - FPR
+    best = int(np.lexsort((-(tpr - fpr), cost))[0])
+    at_current = np.ones(cost.size, dtype=bool)
+    for name, values in grid.items():
+        at_current &= np.isclose(values, current[name])
+    now = int(np.flatnonzero(at_current)[0])
+
+    def point(i):
+        return {"params": {name: values[i].item() for name, values in grid.items()},
+                "tpr": float(tpr[i]), "fpr": float(fpr[i]), "cost": float(cost[i]),
+                "accuracy": float((tp[i] + negatives - fp[i]) / max(labels.size, 1))}
+
+    return {
+        "videos": int(labels.size), "fake": positives, "real": negatives,
+        "grid_points": int(cost.size),
+        "auc": roc_auc(fpr, tpr),
+        "current": point(now),
+        "chosen": point(best),
+        "roc": sorted({(round(float(f), 4), round(float(t), 4)) for f, t in zip(fpr, tpr)}),
+    }
+
+
+def calibrate(corpus, config, fp_cost=1.0, fn_cost=1.0):
+    report = {}
+    for module, (results, labels) in sorted(corpus.items()):
+        if module not in SWEEPS:
+            continue
+        current = config[module]
+        grid, flagged = SWEEPS[module](results, current)
+        report[module] = evaluate(grid, flagged, labels, current, fp_cost, fn_cost)
+    return report
+
+
+def write_config(report, path, config):
+    """Merge the chosen parameters into the JSON override file the modules read at startup."""
+    overrides = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            overrides = json.load(f)
+    for module, entry in report.items():
+        chosen = {k: (int(v) if isinstance(config[module].get(k), int) else v)
+                  for k, v in entry["chosen"]["params"].items()}
+        overrides.setdefault(module, {}).update(chosen)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(overrides, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def print_report(report, missing, seconds):
+    def fmt(params):
+        return ", ".join(f"{k}={v:g}" for k, v in params.items())
+
+    for module, entry in report.items():
+        cur, best = entry["current"], entry["chosen"]
+        print(f"{module}: {entry['videos']} videos ({entry['fake']} fake), {entry['grid_points']} grid points, "
+              f"AUC {entry['auc']:.3f}")
+        print(f"  current  {fmt(cur['params'])}: TPR {cur['tpr']:.2f} FPR {cur['fpr']:.2f} cost {cur['cost']:.3f}")
+        print(f"  chosen   {fmt(best['params'])}: TPR {best['tpr']:.2f} FPR {best['fpr']:.2f} cost {best['cost']:.3f}")
+    if missing:
+        print(f"\n{len(missing)} labelled videos have no stored series (analyze them first), "
+              f"e.g. {', '.join(missing[:3])}")
+    print(f"\nSwept {sum(e['grid_points'] for e in report.values())} operating points in {seconds:.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate module thresholds on the labelled corpus's stored series")
+    parser.add_argument("--labels", default=LABELS_CSV, help="CSV with Filename and Class (real/fake) columns")
+    parser.add_argument("--series", default=SERIES_DIR, help="series store root")
+    parser.add_argument("--fp-cost", type=float, default=1.0, help="cost of flagging a real video")
+    parser.add_argument("--fn-cost", type=float, default=1.0, help="cost of missing a fake video")
+    parser.add_argument("--out", default=thresholds.CONFIG_PATH, help="threshold config to update")
+    parser.add_argument("--report", help="also write the full report (with ROC points) as JSON")
+    parser.add_argument("--dry-run", action="store_true", help="report only, do not write the config")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.series):
+        print(f"No series store at {args.series}; analyze the labelled videos first.")
+        sys.exit(1)
+    corpus, missing = load_corpus(SeriesStore(args.series), load_labels(args.labels))
+    if not corpus:
+        print("None of the labelled videos has stored series.")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    report = calibrate(corpus, thresholds.THRESHOLDS, args.fp_cost, args.fn_cost)
+    print_report(report, missing, time.perf_counter() - start)
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({"modules": report, "missing": missing}, f, indent=2)
+    if not args.dry_run:
+        write_config(report, args.out, thresholds.THRESHOLDS)
+        print(f"Wrote {args.out}; restart the app to use it.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+import os
+import csv
+import sys
+import json
+import time
+import argparse
+import importlib
+import multiprocessing as mp_proc
+
+import numpy as np
+
+from explainability import thresholds
+from serving.series_store import SeriesStore, SERIES_DIR
+from serving.result_cache import sha256_file
+from serving.rescore import fused_score
+from serving.cascade import verdict_label
+
+# Run from the repository root; re-running the same command resumes:
+#   python -m scripts.evaluate_corpus --videos "D:\data\videos" --workers 4
+
+LABELS_CSV = "video_stats.csv"
+OUTPUT_DIR = "eval"
+VIDEO_DIRS = ["uploads"]
+MODEL_PATH = os.environ.get("DEEPFAKE_MODEL_PATH", os.path.join("models", "trained_models", "mobilenetv2_deepfake.h5"))
+MODULES = ["eye_blink_mismatch", "iris_alignment", "eyebrow_mismatch", "texture_analyzer",
+           "flicker_detection", "lip_sync_module", "cnn_detector"]
+CSV_FIELDS = ["filename", "label", "module", "status", "verdict", "correct", "seconds", "frames", "fps",
+              "sha256", "version", "config", "metrics", "error"]
+
+# Per-worker state, set up once by _init_worker
+_face_meshes = None
+_model_server = None
+_model_error = None
+_store = None
+
+
+def load_manifest(path=LABELS_CSV):
+    """Rows of the labelled video list, one per distinct file name (the CSV repeats some rows)."""
+    videos = {}
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            videos.setdefault(row["Filename"], {
+                "filename": row["Filename"],
+                "label": row["Class"].strip().lower(),
+                "frames": int(float(row.get("Frame Count") or 0)),
+                "path": row.get("Path") or None,   # written by scripts.index_videos
+            })
+    return list(videos.values())
+
+
+def find_videos(video_dirs, filenames):
+    """{file name: path} for the listed files found anywhere under `video_dirs`."""
+    wanted = set(filenames)
+    found = {}
+    for folder in video_dirs:
+        for root, _, files in os.walk(folder):
+            for name in files:
+                if name in wanted and name not in found:
+                    found[name] = os.path.join(root, name)
+    return found
+
+
+def _init_worker(model_path, series_root):
+    global _face_meshes, _model_server, _model_error, _store
+    from serving.face_mesh_cache import FaceMeshCache
+    _face_meshes = FaceMeshCache()
+    _store = SeriesStore(series_root)
+    try:
+        from serving.model_server import start_model_server
+        _model_server = start_model_server(model_path)
+    except Exception as e:
+        _model_error = str(e)
+
+
+def _analyze(module, path):
+    analyzer = importlib.import_module(f"explainability.{module}")
+    kwargs = {}
+    if module == "cnn_detector":
+        if _model_server is None:
+            raise RuntimeError(f"CNN model unavailable: {_model_error}")
+        kwargs["server"] = _model_server
+    options = getattr(analyzer, "FACE_MESH_OPTIONS", None)
+    if options is None:
+        return analyzer, analyzer.main(path, **kwargs)
+    with _face_meshes.lease(**options) as face_mesh:
+        return analyzer, analyzer.main(path, face_mesh=face_mesh, **kwargs)
+
+
+def _run_job(job):
+    """Analyze one video with the given modules; returns one row per module."""
+    video, path, modules = job
+    rows = []
+    base = {"filename": video["filename"], "label": video["label"], "frames": video["frames"]}
+    try:
+        content_hash = sha256_file(path)
+    except OSError as e:
+        return [dict(base, module=m, status="failed", error=str(e)) for m in modules]
+
+    for module in modules:
+        row = dict(base, module=module, sha256=content_hash, config=thresholds.fingerprint(module))
+        t0 = time.perf_counter()
+        try:
+            analyzer, result = _analyze(module, path)
+            row.update(status="ok", verdict=result.verdict, metrics=result.metrics, version=analyzer.MODULE_VERSION)
+            _store.put(content_hash, result, video["filename"])
+        except Exception as e:
+            row.update(status="failed", error=f"{type(e).__name__}: {e}")
+        row["seconds"] = round(time.perf_counter() - t0, 3)
+        if row["frames"] and row["seconds"] > 0:
+            row["fps"] = round(row["frames"] / row["seconds"], 2)
+        if row.get("verdict") in ("fake", "real"):
+            row["correct"] = row["verdict"] == video["label"]
+        rows.append(row)
+    return rows
+
+
+def load_rows(path):
+    """Rows of earlier runs; a later row for the same (video, module) replaces an earlier one."""
+    rows = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue   # torn last line of an interrupted run
+                rows[(row["filename"], row["module"])] = row
+    return rows
+
+
+def is_current(row):
+    """Finished with the module version and thresholds in effect now."""
+    if row.get("status") != "ok":
+        return False
+    module = importlib.import_module(f"explainability.{row['module']}")
+    return row.get("version") == module.MODULE_VERSION and row.get("config") == thresholds.fingerprint(row["module"])
+
+
+def collect_jobs(videos, paths, modules, done):
+    jobs = []
+    for video in videos:
+        path = paths.get(video["filename"])
+        todo = [m for m in modules if (video["filename"], m) not in done]
+        if path and todo:
+            jobs.append((video, path, todo))
+    return jobs
+
+
+def write_table(rows, path):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        for row in sorted(rows, key=lambda r: (r["filename"], r["module"])):
+            writer.writerow(dict(row, metrics=json.dumps(row.get("metrics", {}))))
+
+
+def summarize(rows, series_root, modules):
+    """Per-module accuracy / AUC / throughput and the fused verdict's accuracy."""
+    from scripts.calibrate_thresholds import load_corpus, calibrate
+
+    labels = {r["filename"]: r["label"] == "fake" for r in rows}
+    # Only the videos this run scored: the store may hold other uploads under the same file names
+    hashes = {r["sha256"] for r in rows if r["status"] == "ok"}
+    corpus, _ = load_corpus(SeriesStore(series_root), labels, hashes)
+    aucs = {m: entry["auc"] for m, entry in calibrate(corpus, thresholds.THRESHOLDS).items()}
+
+    summary = {"modules": {}}
+    for module in modules:
+        mine = [r for r in rows if r["module"] == module]
+        ok = [r for r in mine if r["status"] == "ok"]
+        judged = [r for r in ok if "correct" in r]
+        seconds = sum(r["seconds"] for r in ok)
+        frames = sum(r["frames"] for r in ok)
+        summary["modules"][module] = {
+            "videos": len(mine),
+            "failed": len(mine) - len(ok),
+            "judged": len(judged),
+            "accuracy": float(np.mean([r["correct"] for r in judged])) if judged else None,
+            "auc": aucs.get(module),
+            "seconds": round(seconds, 1),
+            "fps": round(frames / seconds, 2) if seconds else None,
+            "median_fps": float(np.median([r["fps"] for r in ok if "fps" in r])) if ok else None,
+        }
+
+    by_video = {}
+    for r in rows:
+        if r["status"] == "ok":
+            by_video.setdefault(r["filename"], {})[r["module"]] = r["verdict"]
+    fused = [verdict_label(fused_score(verdicts)) == ("likely FAKE" if labels[name] else "likely REAL")
+             for name, verdicts in by_video.items()]
+    summary["fused"] = {"videos": len(fused), "accuracy": float(np.mean(fused)) if fused else None}
+    total = sum(r.get("seconds", 0) for r in rows)
+    summary["videos"] = len({r["filename"] for r in rows})
+    summary["module_seconds"] = round(total, 1)
+    return summary
+
+
+def print_summary(summary):
+    print(f"\n{'module':<22} {'videos':>6} {'failed':>6} {'judged':>6} {'acc':>6} {'AUC':>6} {'fps':>7} {'p50 fps':>8}")
+    for module, s in summary["modules"].items():
+        acc = f"{s['accuracy']:.3f}" if s["accuracy"] is not None else "n/a"
+        auc = f"{s['auc']:.3f}" if s["auc"] is not None else "n/a"
+        fps = f"{s['fps']:.1f}" if s["fps"] else "n/a"
+        p50 = f"{s['median_fps']:.1f}" if s["median_fps"] else "n/a"
+        print(f"{module:<22} {s['videos']:>6} {s['failed']:>6} {s['judged']:>6} {acc:>6} {auc:>6} {fps:>7} {p50:>8}")
+    fused = summary["fused"]
+    if fused["accuracy"] is not None:
+        print(f"Fused verdict accuracy: {fused['accuracy']:.3f} over {fused['videos']} videos")
+    print(f"{summary['videos']} videos, {summary['module_seconds']:.1f} module-seconds of analysis")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate every module on the labelled videos (resumable)")
+    parser.add_argument("--labels", default=LABELS_CSV, help="CSV with Filename, Class and Frame Count columns")
+    parser.add_argument("--videos", nargs="+", default=VIDEO_DIRS, help="folders searched for the listed files")
+    parser.add_argument("--modules", nargs="+", default=MODULES, choices=MODULES)
+    parser.add_argument("--out", default=OUTPUT_DIR, help="results.jsonl / results.csv / summary.json go here")
+    parser.add_argument("--series", default=SERIES_DIR, help="series store the per-frame signals are saved to")
+    parser.add_argument("--model", default=MODEL_PATH, help="CNN model for cnn_detector")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--limit", type=int, help="only the first N listed videos")
+    parser.add_argument("--rerun", action="store_true", help="ignore earlier results instead of resuming")
+    args = parser.parse_args()
+
+    videos = load_manifest(args.labels)[:args.limit]
+    paths = {v["filename"]: v["path"] for v in videos if v["path"] and os.path.exists(v["path"])}
+    paths.update(find_videos(args.videos, [v["filename"] for v in videos if v["filename"] not in paths]))
+    missing = [v["filename"] for v in videos if v["filename"] not in paths]
+    if missing:
+        print(f"[WARNING] {len(missing)} listed videos not found, e.g. {', '.join(missing[:3])}")
+
+    os.makedirs(args.out, exist_ok=True)
+    rows_path = os.path.join(args.out, "results.jsonl")
+    rows = {} if args.rerun else load_rows(rows_path)
+    done = {key for key, row in rows.items() if is_current(row)}
+    jobs = collect_jobs(videos, paths, args.modules, done)
+    print(f"[INFO] {len(paths)} videos found, {len(jobs)} to analyze "
+          f"({len(done)} video/module results reused), {args.workers} workers")
+
+    start = time.perf_counter()
+    if jobs:
+        # spawn, not fork: see explainability/segments.run_segmented
+        ctx = mp_proc.get_context("spawn")
+        with ctx.Pool(args.workers, initializer=_init_worker, initargs=(args.model, args.series)) as pool, \
+                open(rows_path, "w" if args.rerun else "a") as out:
+            for i, video_rows in enumerate(pool.imap_unordered(_run_job, jobs), 1):
+                # Appended as each video finishes: an interrupted run resumes from here
+                for row in video_rows:
+                    out.write(json.dumps(row) + "\n")
+                    rows[(row["filename"], row["module"])] = row
+                out.flush()
+                failed = [r["module"] for r in video_rows if r["status"] != "ok"]
+                seconds = sum(r["seconds"] for r in video_rows)
+                print(f"[{i}/{len(jobs)}] {video_rows[0]['filename']}: {seconds:.1f}s"
+                      + (f", failed: {', '.join(failed)}" if failed else ""))
+        print(f"[INFO] analyzed {len(jobs)} videos in {time.perf_counter() - start:.1f}s")
+
+    listed = {v["filename"] for v in videos}
+    current = [r for (name, module), r in rows.items() if name in listed and module in args.modules]
+    if not current:
+        print("No results to summarize.")
+        sys.exit(1)
+    write_table(current, os.path.join(args.out, "results.csv"))
+    summary = summarize(current, args.series, args.modules)
+    with open(os.path.join(args.out, "summary.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+    print_summary(summary)
+
+
+if __name__ == "__main__":
+    main()
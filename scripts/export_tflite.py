@@ -0,0 +1,197 @@
+import os
+import sys
+import time
+import glob
+import random
+import argparse
+
+import cv2
+import numpy as np
+import tensorflow as tf
+
+try:
+    from scripts.tflite_inference import TFLiteModel, DEFAULT_THREADS
+except ImportError:
+    from tflite_inference import TFLiteModel, DEFAULT_THREADS
+
+# ==== Configurable paths ====
+MODEL_PATH = "models/trained_models/mobilenetv2_deepfake.h5"
+FACES_DIR = "data/cropped_faces"
+OUTPUT_DIR = "models/tflite"
+
+IMG_SIZE = (224, 224)
+REPRESENTATIVE_SAMPLES = 200
+BENCHMARK_SAMPLES = 200
+IMAGE_EXTS = (".jpg", ".jpeg", ".png")
+
+
+def list_face_images(faces_dir, limit=None, seed=42):
+    paths = [p for p in glob.glob(os.path.join(faces_dir, "**", "*"), recursive=True)
+             if p.lower().endswith(IMAGE_EXTS)]
+    paths.sort()
+    random.Random(seed).shuffle(paths)
+    return paths[:limit] if limit else paths
+
+
+def load_face(path):
+    # Same preprocessing as training: RGB, 224x224, rescale 1/255
+    img = cv2.imread(path)
+    if img is None:
+        return None
+    img = cv2.cvtColor(cv2.resize(img, IMG_SIZE), cv2.COLOR_BGR2RGB)
+    return img.astype(np.float32) / 255.0
+
+
+def label_from_path(path):
+    # flow_from_directory sorts classes alphabetically: fake=0, real=1
+    parts = os.path.normpath(path).split(os.sep)
+    if "real" in parts:
+        return 1
+    if "fake" in parts:
+        return 0
+    return None
+
+
+def representative_dataset(faces_dir, samples=REPRESENTATIVE_SAMPLES):
+    paths = list_face_images(faces_dir, limit=samples)
+    if not paths:
+        raise FileNotFoundError(f"No face images found in {faces_dir} for int8 calibration")
+
+    def gen():
+        for path in paths:
+            img = load_face(path)
+            if img is not None:
+                yield [img[np.newaxis]]
+    return gen
+
+
+def export(model_path, faces_dir, output_dir, samples=REPRESENTATIVE_SAMPLES):
+    """Write <name>_dynamic.tflite and <name>_int8.tflite next to each other in output_dir."""
+    os.makedirs(output_dir, exist_ok=True)
+    name = os.path.splitext(os.path.basename(model_path))[0]
+    model = tf.keras.models.load_model(model_path)
+
+    # Dynamic-range: int8 weights, float activations, no calibration data needed
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    dynamic_path = os.path.join(output_dir, f"{name}_dynamic.tflite")
+    with open(dynamic_path, "wb") as f:
+        f.write(converter.convert())
+    print(f"✅ Dynamic-range model: {dynamic_path} ({os.path.getsize(dynamic_path) / 1e6:.1f} MB)")
+
+    # Full int8: weights and activations, calibrated on cropped faces
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset(faces_dir, samples)
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    converter.inference_input_type = tf.int8
+    converter.inference_output_type = tf.int8
+    int8_path = os.path.join(output_dir, f"{name}_int8.tflite")
+    with open(int8_path, "wb") as f:
+        f.write(converter.convert())
+    print(f"✅ Full-int8 model: {int8_path} ({os.path.getsize(int8_path) / 1e6:.1f} MB)")
+
+    return dynamic_path, int8_path
+
+
+def _time_backend(predict, images, batch_size):
+    # Warm-up (first invoke allocates / builds kernels)
+    predict(images[:1])
+    predict(images[:batch_size])
+
+    latencies = []
+    for img in images:
+        t0 = time.perf_counter()
+        predict(img[np.newaxis])
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+    probs = []
+    t0 = time.perf_counter()
+    for i in range(0, len(images), batch_size):
+        probs.append(np.asarray(predict(images[i:i + batch_size])).reshape(-1))
+    batch_secs = time.perf_counter() - t0
+
+    return {
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "throughput": len(images) / batch_secs if batch_secs > 0 else 0.0,
+        "probs": np.concatenate(probs),
+    }
+
+
+def benchmark(model_path, tflite_paths, faces_dir, samples=BENCHMARK_SAMPLES,
+              batch_size=32, num_threads=DEFAULT_THREADS):
+    paths = list_face_images(faces_dir, limit=samples, seed=7)
+    images, labels = [], []
+    for p in paths:
+        img = load_face(p)
+        if img is not None:
+            images.append(img)
+            labels.append(label_from_path(p))
+    if not images:
+        raise FileNotFoundError(f"No face images found in {faces_dir}")
+    images = np.stack(images)
+    has_labels = all(l is not None for l in labels)
+    labels = np.array(labels if has_labels else [], dtype=np.int32)
+
+    rows = []
+
+    t0 = time.perf_counter()
+    keras_model = tf.keras.models.load_model(model_path)
+    load_s = time.perf_counter() - t0
+    ref = _time_backend(lambda x: keras_model.predict(x, verbose=0), images, batch_size)
+    rows.append(("keras", load_s, ref))
+
+    for path in tflite_paths:
+        t0 = time.perf_counter()
+        lite = TFLiteModel(path, num_threads=num_threads)
+        load_s = time.perf_counter() - t0
+        rows.append((os.path.basename(path), load_s, _time_backend(lite.predict, images, batch_size)))
+
+    print(f"\n=== Benchmark on {len(images)} faces (batch {batch_size}, {num_threads} threads) ===")
+    print(f"{'backend':<40} {'load s':>7} {'p50 ms':>8} {'p95 ms':>8} {'img/s':>8} {'|Δp|':>7} {'agree':>7} {'acc':>7}")
+    ref_pred = ref["probs"] > 0.5
+    for name, load_s, r in rows:
+        delta = float(np.mean(np.abs(r["probs"] - ref["probs"])))
+        agree = float(np.mean((r["probs"] > 0.5) == ref_pred))
+        acc = f"{np.mean((r['probs'] > 0.5) == labels):.4f}" if has_labels else "n/a"
+        print(f"{name:<40} {load_s:7.2f} {r['p50_ms']:8.2f} {r['p95_ms']:8.2f} {r['throughput']:8.1f} "
+              f"{delta:7.4f} {agree:7.4f} {acc:>7}")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the MobileNetV2 detector to TFLite and benchmark it on CPU")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_export = sub.add_parser("export", help="write dynamic-range and full-int8 .tflite models")
+    p_export.add_argument("--model", default=MODEL_PATH)
+    p_export.add_argument("--faces", default=FACES_DIR, help="cropped faces used for int8 calibration")
+    p_export.add_argument("--out", default=OUTPUT_DIR)
+    p_export.add_argument("--samples", type=int, default=REPRESENTATIVE_SAMPLES)
+
+    p_bench = sub.add_parser("benchmark", help="latency / throughput / accuracy delta vs the Keras model")
+    p_bench.add_argument("--model", default=MODEL_PATH)
+    p_bench.add_argument("--tflite", nargs="*", help="defaults to the exported models in --out")
+    p_bench.add_argument("--out", default=OUTPUT_DIR)
+    p_bench.add_argument("--faces", default=FACES_DIR)
+    p_bench.add_argument("--samples", type=int, default=BENCHMARK_SAMPLES)
+    p_bench.add_argument("--batch-size", type=int, default=32)
+    p_bench.add_argument("--threads", type=int, default=DEFAULT_THREADS)
+
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export(args.model, args.faces, args.out, args.samples)
+    else:
+        tflite_paths = args.tflite
+        if not tflite_paths:
+            tflite_paths = sorted(glob.glob(os.path.join(args.out, "*.tflite")))
+        if not tflite_paths:
+            print(f"No .tflite models found in {args.out}; run the export command first.")
+            sys.exit(1)
+        benchmark(args.model, tflite_paths, args.faces, args.samples, args.batch_size, args.threads)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+import os
+import sys
+import time
+import argparse
+import multiprocessing as mp_proc
+from collections import deque
+
+import cv2
+import numpy as np
+
+# ==== Configurable paths ====
+DATA_DIR = r"D:\Deep_fake_morphing\data"
+VIDEO_DIRS = {
+    "real": os.path.join(DATA_DIR, "videos", "DFD_original sequences"),
+    "fake": os.path.join(DATA_DIR, "videos", "DFD_manipulated_sequences"),
+}
+SEQUENCE_DIR = "sequences"
+
+VIDEO_EXTS = (".mp4", ".avi", ".mov", ".mkv")
+
+# ==== Sequence / backbone settings ====
+SEQ_LEN = 10          # frames per window (matches sequences/<label>/<video>/seq_NNN.npy)
+STRIDE = 5            # frames between window starts
+FRAME_SKIP = 1        # decode every frame, embed every Nth
+BATCH_SIZE = 32       # faces per backbone forward pass
+IMG_SIZE = (224, 224)
+FACE_MARGIN = 0.2     # extra context around the detected box
+FEATURE_DIM = 2048
+BACKBONE_WEIGHTS = "imagenet"  # or a local .h5 path on machines without internet access
+
+DONE_MARKER = "_done"
+
+# Per-process state, created once by _init_worker
+_backbone = None
+_preprocess = None
+_detector = None
+
+
+def _init_worker(weights=BACKBONE_WEIGHTS):
+    global _backbone, _preprocess, _detector
+    import mediapipe as mp
+    from tensorflow.keras.applications import ResNet50
+    from tensorflow.keras.applications.resnet50 import preprocess_input
+
+    # ResNet50 with global average pooling -> 2048-d embedding per face
+    _backbone = ResNet50(weights=weights, include_top=False, pooling="avg",
+                         input_shape=(IMG_SIZE[0], IMG_SIZE[1], 3))
+    _preprocess = preprocess_input
+    _detector = mp.solutions.face_detection.FaceDetection(model_selection=1, min_detection_confidence=0.5)
+
+
+def crop_face(frame, detector, prev_box=None):
+    """Crop the largest face in a BGR frame. Falls back to the previous box when detection misses."""
+    h, w, _ = frame.shape
+    results = detector.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
+    box = prev_box
+    if results.detections:
+        best = max(results.detections,
+                   key=lambda d: d.location_data.relative_bounding_box.width * d.location_data.relative_bounding_box.height)
+        bb = best.location_data.relative_bounding_box
+        mx, my = bb.width * FACE_MARGIN, bb.height * FACE_MARGIN
+        x1 = max(int((bb.xmin - mx) * w), 0)
+        y1 = max(int((bb.ymin - my) * h), 0)
+        x2 = min(int((bb.xmin + bb.width + mx) * w), w)
+        y2 = min(int((bb.ymin + bb.height + my) * h), h)
+        if x2 > x1 and y2 > y1:
+            box = (x1, y1, x2, y2)
+
+    if box is None:
+        return None, None
+
+    x1, y1, x2, y2 = box
+    face = cv2.resize(frame[y1:y2, x1:x2], IMG_SIZE)
+    return cv2.cvtColor(face, cv2.COLOR_BGR2RGB), box
+
+
+def _save_window(out_dir, seq_idx, window):
+    path = os.path.join(out_dir, f"seq_{seq_idx:03d}.npy")
+    tmp_path = path + ".tmp.npy"
+    np.save(tmp_path, window)
+    os.replace(tmp_path, path)  # atomic: a crash never leaves a half-written window
+
+
+def _existing_windows(out_dir):
+    count = 0
+    while os.path.exists(os.path.join(out_dir, f"seq_{count:03d}.npy")):
+        count += 1
+    return count
+
+
+def extract_video_sequences(video_path, out_dir, seq_len=SEQ_LEN, stride=STRIDE,
+                            frame_skip=FRAME_SKIP, batch_size=BATCH_SIZE):
+    """
+    Stream one video through decode -> face crop -> backbone and write sliding windows.
+
+    Windows already on disk are kept: their faces are still detected (cheap) so the
+    frame order is reproduced, but they are not embedded again.
+
+    Returns:
+        dict: per-stage timings and counts
+    """
+    stats = {"video": os.path.basename(video_path), "frames": 0, "faces": 0, "embedded": 0,
+             "windows": 0, "decode_s": 0.0, "crop_s": 0.0, "embed_s": 0.0, "skipped": False}
+
+    if os.path.exists(os.path.join(out_dir, DONE_MARKER)):
+        stats["skipped"] = True
+        return stats
+
+    os.makedirs(out_dir, exist_ok=True)
+    done_windows = _existing_windows(out_dir)
+    first_needed = done_windows * stride  # index of first face that a missing window needs
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise FileNotFoundError(f"Cannot open video: {video_path}")
+
+    window = deque(maxlen=seq_len)
+    pending = []
+    face_idx = 0
+    seq_idx = done_windows
+    prev_box = None
+    frame_idx = 0
+
+    def flush():
+        nonlocal seq_idx
+        if not pending:
+            return
+        t0 = time.perf_counter()
+        idxs = [i for i, _ in pending]
+        batch = _preprocess(np.stack([f for _, f in pending]).astype(np.float32))
+        feats = _backbone(batch, training=False).numpy().astype(np.float32)
+        stats["embed_s"] += time.perf_counter() - t0
+        stats["embedded"] += len(pending)
+        pending.clear()
+
+        for i, feat in zip(idxs, feats):
+            window.append(feat)
+            start = i - seq_len + 1
+            if len(window) == seq_len and start >= 0 and start % stride == 0:
+                _save_window(out_dir, seq_idx, np.stack(window))
+                seq_idx += 1
+                stats["windows"] += 1
+
+    while True:
+        t0 = time.perf_counter()
+        ret, frame = cap.read()
+        stats["decode_s"] += time.perf_counter() - t0
+        if not ret:
+            break
+        frame_idx += 1
+        stats["frames"] += 1
+        if (frame_idx - 1) % frame_skip != 0:
+            continue
+
+        t0 = time.perf_counter()
+        face, prev_box = crop_face(frame, _detector, prev_box)
+        stats["crop_s"] += time.perf_counter() - t0
+        if face is None:
+            continue
+
+        # Only faces that feed a window not yet on disk need an embedding
+        if face_idx >= first_needed:
+            pending.append((face_idx, face))
+            if len(pending) >= batch_size:
+                flush()
+        face_idx += 1
+        stats["faces"] += 1
+
+    flush()
+    cap.release()
+
+    with open(os.path.join(out_dir, DONE_MARKER), "w") as f:
+        f.write(f"{seq_idx}\n")
+    return stats
+
+
+def _run_job(job):
+    video_path, out_dir, opts = job
+    try:
+        return extract_video_sequences(video_path, out_dir, **opts)
+    except Exception as e:
+        return {"video": os.path.basename(video_path), "error": str(e)}
+
+
+def collect_jobs(video_dirs, out_root, opts):
+    jobs = []
+    for label, folder in video_dirs.items():
+        if not os.path.exists(folder):
+            print(f"[WARNING] Skipping folder – not found: {folder}")
+            continue
+        for video_file in sorted(os.listdir(folder)):
+            if video_file.lower().endswith(VIDEO_EXTS):
+                video_name = os.path.splitext(video_file)[0]
+                jobs.append((os.path.join(folder, video_file),
+                             os.path.join(out_root, label, video_name), opts))
+    return jobs
+
+
+def print_throughput_report(all_stats, wall_s):
+    done = [s for s in all_stats if "error" not in s and not s["skipped"]]
+    frames = sum(s["frames"] for s in done)
+    faces = sum(s["faces"] for s in done)
+    embedded = sum(s["embedded"] for s in done)
+    windows = sum(s["windows"] for s in done)
+
+    def rate(n, secs):
+        return n / secs if secs > 0 else 0.0
+
+    print("\n=== Throughput report ===")
+    print(f"Videos: {len(done)} processed, {sum(1 for s in all_stats if s.get('skipped'))} already done, "
+          f"{sum(1 for s in all_stats if 'error' in s)} failed")
+    for stage, count, key in [("decode", frames, "decode_s"), ("crop", faces, "crop_s"), ("embed", embedded, "embed_s")]:
+        secs = sum(s[key] for s in done)
+        print(f"  {stage:<7} {count:>8} items  {secs:8.2f} s (summed over workers)  {rate(count, secs):8.1f} items/s")
+    print(f"Windows written: {windows}")
+    print(f"Wall time: {wall_s:.2f} s  ({rate(frames, wall_s):.1f} frames/s end-to-end)")
+
+    for s in all_stats:
+        if "error" in s:
+            print(f"[ERROR] {s['video']}: {s['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract CNN feature windows into sequences/<label>/<video>/seq_NNN.npy")
+    parser.add_argument("--real", default=VIDEO_DIRS["real"], help="folder of real videos")
+    parser.add_argument("--fake", default=VIDEO_DIRS["fake"], help="folder of fake videos")
+    parser.add_argument("--out", default=SEQUENCE_DIR, help="sequence store root")
+    parser.add_argument("--seq-len", type=int, default=SEQ_LEN)
+    parser.add_argument("--stride", type=int, default=STRIDE)
+    parser.add_argument("--frame-skip", type=int, default=FRAME_SKIP)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--weights", default=BACKBONE_WEIGHTS, help="'imagenet' or path to ResNet50 notop weights")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    args = parser.parse_args()
+
+    opts = {"seq_len": args.seq_len, "stride": args.stride,
+            "frame_skip": args.frame_skip, "batch_size": args.batch_size}
+    jobs = collect_jobs({"real": args.real, "fake": args.fake}, args.out, opts)
+    if not jobs:
+        print("No videos found.")
+        sys.exit(1)
+
+    print(f"[INFO] {len(jobs)} videos, {args.workers} workers")
+    start = time.perf_counter()
+    all_stats = []
+    # spawn, not fork: see explainability/segments.run_segmented
+    ctx = mp_proc.get_context("spawn")
+    with ctx.Pool(args.workers, initializer=_init_worker, initargs=(args.weights,)) as pool:
+        for stats in pool.imap_unordered(_run_job, jobs):
+            all_stats.append(stats)
+            if "error" in stats:
+                print(f"[ERROR] {stats['video']}: {stats['error']}")
+            elif stats["skipped"]:
+                print(f"[SKIP] {stats['video']} already extracted")
+            else:
+                print(f"[DONE] {stats['video']}: {stats['windows']} windows from {stats['frames']} frames")
+
+    print_throughput_report(all_stats, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import os
+import csv
+import sys
+import json
+import time
+import shutil
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from scripts.extract_sequences import VIDEO_DIRS, VIDEO_EXTS
+from serving.result_cache import sha256_file
+
+# Run from the repository root; only new or changed files are probed again:
+#   python -m scripts.index_videos --real "D:\...\DFD_original sequences" --fake "D:\...\DFD_manipulated_sequences"
+
+INDEX_CSV = "video_stats.csv"
+# The original video_stats.csv columns first, so existing readers keep working
+FIELDS = ["Filename", "Class", "Duration (s)", "FPS", "Frame Count",
+          "Width", "Height", "Codec", "Bitrate (kbps)", "Size (bytes)", "SHA256", "Modified", "Path"]
+FFPROBE = shutil.which("ffprobe")
+
+
+def _rate(value):
+    """ffprobe rational ("24000/1001") -> float"""
+    num, _, den = str(value or "0").partition("/")
+    try:
+        return float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+
+def probe_ffprobe(path):
+    """Container / stream headers via ffprobe; no frame is decoded."""
+    out = subprocess.run(
+        [FFPROBE, "-v", "error", "-select_streams", "v:0", "-show_entries",
+         "stream=codec_name,width,height,avg_frame_rate,r_frame_rate,nb_frames,bit_rate:format=duration,bit_rate",
+         "-of", "json", path],
+        capture_output=True, text=True, check=True, timeout=60,
+    ).stdout
+    info = json.loads(out)
+    stream = (info.get("streams") or [{}])[0]
+    fmt = info.get("format", {})
+    fps = _rate(stream.get("avg_frame_rate")) or _rate(stream.get("r_frame_rate"))
+    frames = int(stream.get("nb_frames") or 0)
+    if not frames and fps:
+        frames = int(round(float(fmt.get("duration") or 0) * fps))
+    bitrate = float(fmt.get("bit_rate") or stream.get("bit_rate") or 0) / 1000
+    return {"FPS": fps, "Frame Count": frames, "Width": int(stream.get("width") or 0),
+            "Height": int(stream.get("height") or 0), "Codec": stream.get("codec_name", ""), "Bitrate (kbps)": bitrate}
+
+
+def probe_opencv(path):
+    """The same headers through OpenCV's FFmpeg backend: the capture is opened, no frame is read."""
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            raise ValueError("cannot open")
+        fourcc = int(cap.get(cv2.CAP_PROP_FOURCC))
+        return {"FPS": cap.get(cv2.CAP_PROP_FPS), "Frame Count": int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+                "Width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), "Height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                "Codec": fourcc.to_bytes(4, "little").decode("ascii", "replace").strip("\x00 "),
+                "Bitrate (kbps)": cap.get(cv2.CAP_PROP_BITRATE)}
+    finally:
+        cap.release()
+
+
+def probe(path, label):
+    """One index row for a video file."""
+    stat = os.stat(path)
+    meta = probe_ffprobe(path) if FFPROBE else probe_opencv(path)
+    fps = meta["FPS"]
+    row = {"Filename": os.path.basename(path), "Class": label,
+           "Duration (s)": meta["Frame Count"] / fps if fps else 0.0,
+           "Size (bytes)": stat.st_size, "Modified": int(stat.st_mtime), "Path": path,
+           "SHA256": sha256_file(path)}
+    row.update(meta)
+    return row
+
+
+def scan(video_dirs):
+    """(path, class, size, mtime) for every video under the labelled folders."""
+    files = []
+    for label, folder in video_dirs.items():
+        if not os.path.exists(folder):
+            print(f"[WARNING] Skipping folder – not found: {folder}")
+            continue
+        for root, _, names in os.walk(folder):
+            for name in sorted(names):
+                if name.lower().endswith(VIDEO_EXTS):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    files.append((path, label, stat.st_size, int(stat.st_mtime)))
+    return files
+
+
+def load_index(path):
+    """{file name: row} of an existing index (or the hand-made video_stats.csv)."""
+    rows = {}
+    if os.path.exists(path):
+        with open(path, newline="") as f:
+            for row in csv.DictReader(f):
+                rows.setdefault(row["Filename"], row)
+    return rows
+
+
+def unchanged(row, path, size, mtime):
+    return (row is not None and row.get("Path") == path and row.get("SHA256")
+            and row.get("Size (bytes)") == str(size) and row.get("Modified") == str(mtime))
+
+
+def write_index(rows, path):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        for row in sorted(rows, key=lambda r: (r["Class"], r["Filename"])):
+            writer.writerow(row)
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index video metadata (incremental, no frame decoding)")
+    parser.add_argument("--real", default=VIDEO_DIRS["real"], help="folder of real videos")
+    parser.add_argument("--fake", default=VIDEO_DIRS["fake"], help="folder of fake videos")
+    parser.add_argument("--out", default=INDEX_CSV, help="index CSV to create or update")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--keep-missing", action="store_true", help="keep rows of files that are no longer found")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    existing = load_index(args.out)
+    files = scan({"real": args.real, "fake": args.fake})
+    if not files:
+        # Never rewrite the index from an empty scan (e.g. a drive that is not mounted)
+        print("No videos found.")
+        sys.exit(1)
+
+    rows, todo, seen = {}, [], set()
+    for path, label, size, mtime in files:
+        name = os.path.basename(path)
+        if name in seen:
+            print(f"[WARNING] Duplicate file name, keeping the first: {path}")
+            continue
+        seen.add(name)
+        if unchanged(existing.get(name), path, size, mtime):
+            rows[name] = existing[name]
+        else:
+            todo.append((path, label))
+    reused = len(rows)
+
+    # Header probes are subprocess / I/O bound and hashing releases the GIL: threads are enough
+    failed = 0
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = [(path, pool.submit(probe, path, label)) for path, label in todo]
+        for path, future in futures:
+            try:
+                row = future.result()
+                rows[row["Filename"]] = row
+            except Exception as e:
+                failed += 1
+                print(f"[ERROR] {path}: {e}")
+
+    removed = [name for name in existing if name not in rows]
+    if args.keep_missing:
+        for name in removed:
+            rows[name] = existing[name]
+
+    write_index(list(rows.values()), args.out)
+    print(f"[INFO] {len(rows)} videos indexed: {len(todo) - failed} probed ({'ffprobe' if FFPROBE else 'OpenCV'}), "
+          f"{reused} unchanged, {failed} failed, "
+          f"{len(removed)} {'kept' if args.keep_missing else 'dropped'} as missing "
+          f"in {time.perf_counter() - start:.2f}s -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import os
+import sys
+import json
+import argparse
+
+from explainability import thresholds
+from serving.series_store import SeriesStore, SERIES_DIR
+from serving.rescore import rescore_corpus
+
+# Run from the repository root: python -m scripts.rescore --thresholds new_thresholds.json
+
+
+def print_report(report):
+    print(f"{'video':<48} {'before':<12} {'after':<12} {'score':>6}  changed modules")
+    for video in report["videos"]:
+        flips = [f"{m} {e['previous']}->{e['verdict']}" for m, e in video["modules"].items()
+                 if e["status"] == "ok" and e["previous"] != e["verdict"]]
+        name = video["filename"] or video["sha256"][:16]
+        print(f"{name:<48} {video['previous_verdict']:<12} {video['verdict']:<12} {video['score']:+6.2f}  "
+              f"{', '.join(flips)}")
+        for module, entry in video["modules"].items():
+            if entry["status"] == "stale":
+                print(f"    {module}: not re-scored ({entry['reason']})")
+    print(f"\n{len(report['videos'])} videos, {report['modules_rescored']} module results re-scored, "
+          f"{report['stale']} stale, {report['changed']} fused verdicts changed in {report['seconds']:.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score stored analyses under a new threshold config")
+    parser.add_argument("--thresholds", help="JSON threshold overrides, applied on top of the active config "
+                                             "(as /api/v1/rescore does)")
+    parser.add_argument("--series", default=SERIES_DIR, help="series store root")
+    parser.add_argument("--modules", nargs="*", help="only these modules")
+    parser.add_argument("--json", dest="json_out", help="also write the full report here")
+    args = parser.parse_args()
+
+    if args.thresholds:
+        with open(args.thresholds) as f:
+            config = thresholds.merge(json.load(f), thresholds.THRESHOLDS)
+    else:
+        config = thresholds.THRESHOLDS
+    if not os.path.isdir(args.series):
+        print(f"No series store at {args.series}; analyze some videos first.")
+        sys.exit(1)
+
+    report = rescore_corpus(SeriesStore(args.series), config, args.modules)
+    print_report(report)
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
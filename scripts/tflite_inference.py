@@ -0,0 +1,73 @@
+import os
+import numpy as np
+
+# Prefer the standalone runtime on CPU-only deployments; fall back to full TensorFlow
+try:
+    from tflite_runtime.interpreter import Interpreter
+except ImportError:
+    import tensorflow as tf
+    Interpreter = tf.lite.Interpreter
+
+DEFAULT_THREADS = os.cpu_count() or 1
+
+
+class TFLiteModel:
+    """
+    Minimal Keras-like wrapper around a TFLite interpreter.
+
+    Handles both float/dynamic-range models and full-int8 models: inputs are
+    quantized and outputs de-quantized with the tensor's scale/zero point, so
+    callers always pass float32 images in [0, 1] and get float32 probabilities.
+    """
+
+    def __init__(self, model_path, num_threads=DEFAULT_THREADS):
+        self.model_path = model_path
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch = int(self._input["shape"][0])
+
+    @property
+    def input_shape(self):
+        return tuple(int(d) for d in self._input["shape"][1:])
+
+    def _resize(self, batch_size):
+        if batch_size == self._batch:
+            return
+        shape = [batch_size] + list(self.input_shape)
+        self.interpreter.resize_tensor_input(self._input["index"], shape)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch = batch_size
+
+    def predict(self, images, verbose=0):
+        images = np.asarray(images, dtype=np.float32)
+        if images.ndim == 3:
+            images = images[np.newaxis]
+        self._resize(len(images))
+
+        dtype = self._input["dtype"]
+        if dtype != np.float32:
+            scale, zero_point = self._input["quantization"]
+            info = np.iinfo(dtype)
+            images = np.clip(np.round(images / scale + zero_point), info.min, info.max).astype(dtype)
+
+        self.interpreter.set_tensor(self._input["index"], images)
+        self.interpreter.invoke()
+        out = self.interpreter.get_tensor(self._output["index"])
+
+        if self._output["dtype"] != np.float32:
+            scale, zero_point = self._output["quantization"]
+            out = (out.astype(np.float32) - zero_point) * scale
+        return out
+
+    __call__ = predict
+
+
+def load_tflite_model(path, num_threads=DEFAULT_THREADS):
+    print(f"Loading TFLite model ({num_threads} threads)...")
+    model = TFLiteModel(path, num_threads=num_threads)
+    print("Model loaded.")
+    return model
@@ -1,18 +1,31 @@
 import os
+import sys
+import json
+import hashlib
 import numpy as np
 import matplotlib.pyplot as plt
 from tensorflow.keras.preprocessing.image import ImageDataGenerator
 from tensorflow.keras.applications import MobileNetV2
 from tensorflow.keras.models import Model
-from tensorflow.keras.layers import Dense, GlobalAveragePooling2D, Dropout
+from tensorflow.keras.layers import Dense, GlobalAveragePooling2D, Dropout, Input
 from tensorflow.keras.optimizers import Adam
-from tensorflow.keras.callbacks import EarlyStopping, ModelCheckpoint
+from tensorflow.keras.callbacks import Callback, EarlyStopping, ModelCheckpoint
 
 # Paths
 data_dir = 'data/cropped_faces'
 train_dir = os.path.join(data_dir)
+model_path = 'models/trained_models/mobilenetv2_deepfake.h5'
+feature_cache_dir = 'models/feature_cache'
 img_height, img_width = 224, 224
 batch_size = 32
+epochs = 10
+
+# Usage: python train_deepfake_cnn.py [--cache-features]
+# With --cache-features the frozen backbone runs once over the dataset and the head
+# trains on the stored 1280-d pooled embeddings. Augmentation is disabled in this mode,
+# since augmented images change every epoch and cannot be cached.
+cache_features = "--cache-features" in sys.argv[1:]
+os.makedirs(os.path.dirname(model_path), exist_ok=True)
 
 # Data Augmentation
 datagen = ImageDataGenerator(
@@ -26,13 +39,16 @@ datagen = ImageDataGenerator(
     shear_range=0.1
 )
 
+if cache_features:
+    datagen = ImageDataGenerator(rescale=1./255, validation_split=0.2)
+
 train_generator = datagen.flow_from_directory(
     train_dir,
     target_size=(img_height, img_width),
     batch_size=batch_size,
     class_mode='binary',
     subset='training',
-    shuffle=True
+    shuffle=not cache_features
 )
 
 val_generator = datagen.flow_from_directory(
@@ -50,35 +66,148 @@ base_model = MobileNetV2(weights='imagenet', include_top=False, input_shape=(img
 # Freeze base layers
 base_model.trainable = False
 
+# Custom head layers (shared by the full model and the cached-feature head model)
+pooling = GlobalAveragePooling2D()
+head_layers = [
+    Dropout(0.3),
+    Dense(128, activation='relu'),
+    Dropout(0.5),
+    Dense(1, activation='sigmoid'),
+]
+
+def apply_head(x):
+    for layer in head_layers:
+        x = layer(x)
+    return x
+
 # Add custom head
-x = base_model.output
-x = GlobalAveragePooling2D()(x)
-x = Dropout(0.3)(x)
-x = Dense(128, activation='relu')(x)
-x = Dropout(0.5)(x)
-predictions = Dense(1, activation='sigmoid')(x)
+features = pooling(base_model.output)
+predictions = apply_head(features)
 
 model = Model(inputs=base_model.input, outputs=predictions)
 
 # Compile
 model.compile(optimizer=Adam(learning_rate=1e-4), loss='binary_crossentropy', metrics=['accuracy'])
 
-# Callbacks
-callbacks = [
-    EarlyStopping(monitor='val_loss', patience=3, restore_best_weights=True),
-    ModelCheckpoint('models/trained_models/mobilenetv2_deepfake.h5', save_best_only=True)
-]
 
-# Train
-history = model.fit(
-    train_generator,
-    validation_data=val_generator,
-    epochs=10,
-    callbacks=callbacks
-)
+def embedding_cache_key(generator):
+    """
+    Hash of everything the stored embeddings depend on: each image's path, size
+    and modification time, and the extractor (backbone, weights, input size,
+    preprocessing, pooling). Replacing an image in place or changing the
+    backbone invalidates the cache, not only adding or removing files.
+    """
+    h = hashlib.sha256()
+    config = {
+        "backbone": base_model.name,
+        "weights": "imagenet",
+        "input_shape": [img_height, img_width, 3],
+        "rescale": generator.image_data_generator.rescale,
+        "pooling": type(pooling).__name__,
+        "features": int(features.shape[-1]),
+    }
+    h.update(json.dumps(config, sort_keys=True).encode("utf-8"))
+    for filename in generator.filenames:
+        st = os.stat(os.path.join(generator.directory, filename))
+        h.update(f"\n{filename}\t{st.st_size}\t{st.st_mtime_ns}".encode("utf-8"))
+    return h.hexdigest()
+
+
+def cache_embeddings(generator, name):
+    """
+    Run the frozen backbone once over a generator and store pooled embeddings
+    in a memory-mapped .npy file. Reused while embedding_cache_key() is unchanged.
+    """
+    os.makedirs(feature_cache_dir, exist_ok=True)
+    feats_path = os.path.join(feature_cache_dir, f"{name}_features.npy")
+    labels_path = os.path.join(feature_cache_dir, f"{name}_labels.npy")
+    meta_path = os.path.join(feature_cache_dir, f"{name}_meta.json")
+
+    key = embedding_cache_key(generator)
+    if os.path.exists(meta_path) and os.path.exists(feats_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get("key") == key and meta.get("complete"):
+            print(f"Using cached {name} embeddings: {feats_path}")
+            return np.load(feats_path, mmap_mode='r'), np.load(labels_path)
+
+    extractor = Model(inputs=base_model.input, outputs=features)
+    n = generator.samples
+    feats = np.lib.format.open_memmap(feats_path, mode='w+', dtype=np.float32,
+                                      shape=(n, int(features.shape[-1])))
+    labels = np.asarray(generator.classes, dtype=np.float32)
+
+    print(f"Extracting {name} embeddings for {n} images...")
+    generator.reset()
+    offset = 0
+    for _ in range(len(generator)):
+        images, _ = next(generator)
+        batch_feats = extractor.predict_on_batch(images)
+        feats[offset:offset + len(batch_feats)] = batch_feats
+        offset += len(batch_feats)
+    feats.flush()
+
+    np.save(labels_path, labels)
+    with open(meta_path, "w") as f:
+        json.dump({"key": key, "samples": n, "complete": True}, f)
+    return np.load(feats_path, mmap_mode='r'), labels
+
+
+class FullModelCheckpoint(Callback):
+    """Save the full image model whenever the head model improves on val_loss."""
+
+    def __init__(self, full_model, filepath):
+        super().__init__()
+        self.full_model = full_model
+        self.filepath = filepath
+        self.best = np.inf
+
+    def on_epoch_end(self, epoch, logs=None):
+        val_loss = (logs or {}).get('val_loss')
+        if val_loss is not None and val_loss < self.best:
+            self.best = val_loss
+            self.full_model.save(self.filepath)
+
+
+if cache_features:
+    train_feats, train_labels = cache_embeddings(train_generator, 'train')
+    val_feats, val_labels = cache_embeddings(val_generator, 'val')
+
+    # Head-only model over cached embeddings; its layers are the full model's layers
+    feature_input = Input(shape=(int(features.shape[-1]),))
+    head_model = Model(inputs=feature_input, outputs=apply_head(feature_input))
+    head_model.compile(optimizer=Adam(learning_rate=1e-4), loss='binary_crossentropy', metrics=['accuracy'])
+
+    callbacks = [
+        EarlyStopping(monitor='val_loss', patience=3, restore_best_weights=True),
+        FullModelCheckpoint(model, model_path)
+    ]
+
+    history = head_model.fit(
+        train_feats, train_labels,
+        validation_data=(val_feats, val_labels),
+        batch_size=batch_size,
+        shuffle=True,
+        epochs=epochs,
+        callbacks=callbacks
+    )
+else:
+    # Callbacks
+    callbacks = [
+        EarlyStopping(monitor='val_loss', patience=3, restore_best_weights=True),
+        ModelCheckpoint(model_path, save_best_only=True)
+    ]
+
+    # Train
+    history = model.fit(
+        train_generator,
+        validation_data=val_generator,
+        epochs=epochs,
+        callbacks=callbacks
+    )
 
 # Save model
-model.save('models/trained_models/mobilenetv2_deepfake.h5')
+model.save(model_path)
 
 # Plot
 plt.figure(figsize=(12, 5))
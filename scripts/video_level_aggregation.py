@@ -9,6 +9,14 @@ IMG_SIZE = (224, 224)
 FRAME_SKIP = 5  # Use every 5th frame to speed up
 
 def load_model(path):
+    # Quantized .tflite exports run on the multi-threaded TFLite interpreter
+    if path.endswith(".tflite"):
+        try:
+            from scripts.tflite_inference import load_tflite_model
+        except ImportError:
+            from tflite_inference import load_tflite_model
+        return load_tflite_model(path)
+
     print("Loading model...")
     model = tf.keras.models.load_model(path)
     print("Model loaded.")
@@ -0,0 +1,188 @@
+import os
+import math
+import time
+import heapq
+import itertools
+import threading
+from concurrent.futures import Future
+
+# Frames assumed when the container does not report a frame count (one minute at 30 fps)
+UNKNOWN_FRAMES = 1800
+# Smoothing of the measured wall seconds per second of estimated cost
+EWMA_ALPHA = 0.2
+
+
+def estimate_cost(frames, module_costs_ms):
+    """
+    Estimated CPU seconds of one analysis: frames (duration x fps, from the
+    container metadata) times the summed per-frame cost of the modules to run.
+
+    Parameters:
+        frames (int): frame count, or None when unknown (UNKNOWN_FRAMES)
+        module_costs_ms (iterable): ms per frame of each module (see serving/cascade.py)
+
+    Returns:
+        float: estimated seconds on one core
+    """
+    return (frames or UNKNOWN_FRAMES) * sum(module_costs_ms) / 1000
+
+
+class Overloaded(Exception):
+    """Work refused at admission; `retry_after` is the suggested wait in seconds (HTTP 429)."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class FairScheduler:
+    """
+    Runs analyses on a fixed set of worker threads, fairly across users.
+
+    Admission: a job's estimated cost (CPU seconds, see estimate_cost) counts
+    against `budget` from submit() until it finishes. Work that would take the
+    outstanding cost (running plus queued) past the budget is refused with
+    Overloaded, whose retry_after is the time the excess should take to drain
+    at the measured rate. When nothing is outstanding a job is admitted
+    whatever its size, so one long video is never refused for good.
+
+    Dispatch: weighted-fair queuing across users, shortest job first within a
+    user. The next job of each waiting user is tagged start + cost / weight,
+    where start is the later of the scheduler's virtual time and the tag of
+    that user's previous job, and the smallest tag runs. A user with a long
+    backlog takes turns with the others instead of holding every worker,
+    short jobs overtake long ones, and a user returning after a quiet spell
+    starts at the current virtual time rather than with saved-up credit.
+
+    Worker threads start with the first job, so a server's master process can
+    create the scheduler before it forks; a forked child starts its own.
+    """
+
+    def __init__(self, workers, budget, weights=None):
+        self.workers = workers
+        self.budget = budget
+        self.weights = weights or {}    # user -> share (default 1)
+        self.seconds_per_cost = 1.0     # measured wall seconds per second of estimated cost
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._queues = {}       # user -> heap of (cost, seq, future, func, args)
+        self._tags = {}         # user -> finish tag of the user's last dispatched job
+        self._virtual = 0.0
+        self._queued_cost = 0.0
+        self._running_cost = 0.0
+        self._running = 0
+        self._threads = []
+
+    def _check_pid(self):
+        # Called with the lock held
+        if self._pid != os.getpid():
+            self._reset()
+        if not self._threads:
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"analysis-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _retry_after(self, cost):
+        # Called with the lock held
+        outstanding = self._queued_cost + self._running_cost
+        if outstanding == 0 or outstanding + cost <= self.budget:
+            return 0
+        excess = outstanding + cost - self.budget
+        return max(1, math.ceil(excess * self.seconds_per_cost / self.workers))
+
+    def retry_after(self, cost=0.0):
+        """Seconds to wait before work of this cost would be admitted (0: now)."""
+        with self._cond:
+            return self._retry_after(cost)
+
+    def submit_all(self, user, calls):
+        """
+        Queue several jobs for one user, all or none.
+
+        Parameters:
+            user (str): whose share of the workers the jobs use
+            calls (list): (estimated cost, func, args) per job
+
+        Returns:
+            list: a Future per job, resolved with func(*args)
+
+        Raises:
+            Overloaded: the jobs would exceed the budget
+        """
+        total = sum(cost for cost, _, _ in calls)
+        futures = []
+        with self._cond:
+            wait = self._retry_after(total)
+            if wait:
+                raise Overloaded(f"Server is busy: {self._queued_cost + self._running_cost:.0f} s of analysis "
+                                 f"outstanding (budget {self.budget:.0f} s)", wait)
+            self._check_pid()
+            queue = self._queues.setdefault(user, [])
+            for cost, func, args in calls:
+                future = Future()
+                heapq.heappush(queue, (cost, next(self._seq), future, func, args))
+                self._queued_cost += cost
+                futures.append(future)
+            self._cond.notify(len(calls))
+        return futures
+
+    def submit(self, user, cost, func, *args):
+        """Queue func(*args) for `user`; returns a Future (see submit_all)."""
+        return self.submit_all(user, [(cost, func, args)])[0]
+
+    def _next(self):
+        # Called with the lock held and at least one job queued
+        best = None
+        for user, queue in self._queues.items():
+            cost = queue[0][0]
+            start = max(self._virtual, self._tags.get(user, 0.0))
+            tag = start + cost / self.weights.get(user, 1.0)
+            if best is None or tag < best[0]:
+                best = (tag, start, user)
+        tag, start, user = best
+        self._virtual, self._tags[user] = start, tag
+        queue = self._queues[user]
+        job = heapq.heappop(queue)
+        if not queue:
+            del self._queues[user]
+        return job
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._queues:
+                    self._cond.wait()
+                cost, _, future, func, args = self._next()
+                self._queued_cost -= cost
+                self._running_cost += cost
+                self._running += 1
+            if future.set_running_or_notify_cancel():
+                t0 = time.perf_counter()
+                try:
+                    future.set_result(func(*args))
+                except BaseException as e:
+                    future.set_exception(e)
+                seconds = time.perf_counter() - t0
+            else:
+                seconds = None
+            with self._cond:
+                self._running_cost -= cost
+                self._running -= 1
+                if seconds is not None and cost > 0:
+                    self.seconds_per_cost += EWMA_ALPHA * (seconds / cost - self.seconds_per_cost)
+
+    def stats(self):
+        """{(("state", "queued" | "running"),): estimated cost seconds} for the metrics registry."""
+        with self._cond:
+            return {(("state", "queued"),): self._queued_cost, (("state", "running"),): self._running_cost}
+
+    def sizes(self):
+        """{(("state", "queued" | "running"),): jobs} for the metrics registry."""
+        with self._cond:
+            queued = sum(len(queue) for queue in self._queues.values())
+            return {(("state", "queued"),): queued, (("state", "running"),): self._running}
@@ -0,0 +1,103 @@
+import sys
+import time
+import threading
+
+
+class LazyAnalyzer:
+    """
+    An explainability module's analyzer, imported the first time it is needed.
+
+    `loader()` imports the module and returns the analyzer callable. If it
+    raises, `fallback()` supplies a placeholder instead, so a missing dependency
+    shows up in the results rather than at start-up. The first thread to need
+    the analyzer loads it; others wait for that load instead of repeating it.
+    """
+
+    def __init__(self, name, module_key, loader, fallback=None):
+        self.name = name
+        self.module_key = module_key
+        self.error = None
+        self.load_seconds = None
+        self._loader = loader
+        self._fallback = fallback
+        self._func = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._func is not None
+
+    def load(self):
+        if self._func is None:
+            with self._lock:
+                if self._func is None:
+                    t0 = time.perf_counter()
+                    try:
+                        func = self._loader()
+                    except Exception as e:
+                        if self._fallback is None:
+                            raise
+                        self.error = e
+                        func = self._fallback()
+                    self.load_seconds = time.perf_counter() - t0
+                    self._func = func
+        return self._func
+
+    @property
+    def is_placeholder(self):
+        return getattr(self.load(), "is_placeholder", False)
+
+    @property
+    def module(self):
+        """The loaded explainability module (None for a placeholder)."""
+        self.load()
+        return sys.modules.get(f"explainability.{self.module_key}")
+
+    def __call__(self, path, **kwargs):
+        return self.load()(path, **kwargs)
+
+
+class AnalyzerRegistry:
+    """
+    The analyzers in run order, keyed by explainability module.
+
+    Registering an analyzer imports nothing; see LazyAnalyzer. warm_up() loads
+    them ahead of the first request, start_warm_up() does so in the background.
+    """
+
+    def __init__(self):
+        self._analyzers = {}
+        self.warm_up_thread = None
+
+    def register(self, name, module_key, loader, fallback=None):
+        analyzer = self._analyzers[module_key] = LazyAnalyzer(name, module_key, loader, fallback)
+        return analyzer
+
+    def __iter__(self):
+        return iter(self._analyzers.values())
+
+    def __getitem__(self, module_key):
+        return self._analyzers[module_key]
+
+    def warm_up(self, module_keys=None):
+        """Load the analyzers (all by default) in run order; returns {module: load seconds}."""
+        for analyzer in self:
+            if module_keys is None or analyzer.module_key in module_keys:
+                analyzer.load()
+        return self.load_seconds()
+
+    def start_warm_up(self, delay=0.0, module_keys=None, then=None):
+        """warm_up() in a daemon thread, `delay` seconds from now, followed by then() if given."""
+        def run():
+            time.sleep(delay)
+            self.warm_up(module_keys)
+            if then is not None:
+                then()
+
+        self.warm_up_thread = threading.Thread(target=run, name="analyzer-warm-up", daemon=True)
+        self.warm_up_thread.start()
+        return self.warm_up_thread
+
+    def load_seconds(self):
+        """{module: seconds its import (and set-up) took} for the analyzers loaded so far."""
+        return {a.module_key: a.load_seconds for a in self if a.loaded}
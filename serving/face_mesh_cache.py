@@ -0,0 +1,149 @@
+import os
+import atexit
+import threading
+import contextlib
+
+# Idle graphs kept per configuration; any more handed back are closed
+MAX_IDLE = int(os.environ.get("DEEPFAKE_FACE_MESH_POOL", "4"))
+
+
+def config_label(key):
+    """A pool key (sorted option items) as "max_num_faces=2,refine_landmarks=True"."""
+    return ",".join(f"{name}={value}" for name, value in key)
+
+
+class FaceMeshCache:
+    """
+    Per-process pool of FaceMesh graphs keyed by their options.
+
+    lease(**options) hands out an idle graph of that configuration, or builds
+    one, for the caller's exclusive use. A reused graph is reset first
+    (tracking state cleared), so no landmarks carry over from the previous
+    video. When the lease ends the graph goes back to the pool; it is closed
+    instead if max_idle graphs of its configuration are already idle, or if
+    the caller raised (its state is then unknown). prewarm() builds graphs
+    ahead of the first request. close(), also run at exit, closes every idle
+    graph. mediapipe is imported with the first graph.
+
+    Graphs run their own threads, which do not survive fork(): a pool
+    inherited by a child process starts empty there.
+    """
+
+    def __init__(self, max_idle=MAX_IDLE):
+        self.max_idle = max_idle
+        self._lock = threading.Lock()
+        self._idle = {}      # key -> [FaceMesh]
+        self._in_use = {}    # key -> graphs leased out
+        self._events = {}    # (key, event) -> count
+        self._pid = os.getpid()
+        atexit.register(self.close)
+
+    def _count(self, key, event):
+        self._events[key, event] = self._events.get((key, event), 0) + 1
+
+    def _check_pid(self):
+        # Called with the lock held
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._idle, self._in_use, self._events = {}, {}, {}
+
+    def _build(self, key):
+        import mediapipe as mp
+        face_mesh = mp.solutions.face_mesh.FaceMesh(static_image_mode=False, **dict(key))
+        with self._lock:
+            self._count(key, "created")
+        return face_mesh
+
+    def _checkout(self, key):
+        with self._lock:
+            self._check_pid()
+            idle = self._idle.get(key)
+            face_mesh = idle.pop() if idle else None
+            self._in_use[key] = self._in_use.get(key, 0) + 1
+            if face_mesh is not None:
+                self._count(key, "reused")
+        try:
+            if face_mesh is None:
+                return self._build(key)
+            face_mesh.reset()
+            return face_mesh
+        except BaseException:
+            with self._lock:
+                self._in_use[key] -= 1
+            raise
+
+    def _checkin(self, key, face_mesh, ok):
+        with self._lock:
+            inherited = self._pid != os.getpid()
+            if not inherited:
+                self._in_use[key] -= 1
+                idle = self._idle.setdefault(key, [])
+                keep = ok and len(idle) < self.max_idle
+                if keep:
+                    idle.append(face_mesh)
+                else:
+                    self._count(key, "closed" if ok else "discarded")
+        if inherited or not keep:
+            face_mesh.close()
+
+    @contextlib.contextmanager
+    def lease(self, **options):
+        """with pool.lease(max_num_faces=1) as face_mesh: ... (the graph is exclusive to the block)"""
+        key = tuple(sorted(options.items()))
+        face_mesh = self._checkout(key)
+        ok = False
+        try:
+            yield face_mesh
+            ok = True
+        finally:
+            self._checkin(key, face_mesh, ok)
+
+    def prewarm(self, configs, count=1):
+        """Build graphs until `count` (at most max_idle) of each configuration in `configs` are idle."""
+        for options in configs:
+            key = tuple(sorted(options.items()))
+            while True:
+                with self._lock:
+                    self._check_pid()
+                    if len(self._idle.get(key, [])) >= min(count, self.max_idle):
+                        break
+                face_mesh = self._build(key)
+                with self._lock:
+                    self._idle.setdefault(key, []).append(face_mesh)
+
+    def close(self):
+        """Close every idle graph (leased ones are closed when handed back)."""
+        with self._lock:
+            self._check_pid()
+            idle = [(key, face_mesh) for key, graphs in self._idle.items() for face_mesh in graphs]
+            self._idle = {}
+            for key, _ in idle:
+                self._count(key, "closed")
+        for _, face_mesh in idle:
+            face_mesh.close()
+
+    def total(self, event):
+        with self._lock:
+            return sum(n for (_, e), n in self._events.items() if e == event)
+
+    @property
+    def created(self):
+        return self.total("created")
+
+    @property
+    def reused(self):
+        return self.total("reused")
+
+    def stats(self):
+        """{(("config", ...), ("event", ...)): count} for the metrics registry."""
+        with self._lock:
+            return {(("config", config_label(key)), ("event", event)): n for (key, event), n in self._events.items()}
+
+    def sizes(self):
+        """{(("config", ...), ("state", "idle" | "in_use")): graphs} for the metrics registry."""
+        with self._lock:
+            sizes = {}
+            for key in set(self._idle) | set(self._in_use):
+                sizes[("config", config_label(key)), ("state", "idle")] = len(self._idle.get(key, []))
+                sizes[("config", config_label(key)), ("state", "in_use")] = self._in_use.get(key, 0)
+            return sizes
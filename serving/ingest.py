@@ -0,0 +1,318 @@
+import os
+import time
+import uuid
+import hashlib
+
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import MultipartDecoder, Data, Epilogue, Field, File, NeedData
+
+CHUNK_SIZE = 64 * 1024
+MAX_UPLOAD_BYTES = 500 * 1024 * 1024
+MAX_FIELD_BYTES = 64 * 1024
+MAX_FIELDS = 32
+
+VIDEO_EXTS = {".mp4", ".avi", ".mov", ".mkv"}
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp"}
+
+
+class UploadRejected(Exception):
+    """Upload refused before analysis; `status` is the HTTP status to return."""
+
+    def __init__(self, message, status=400, filename=None):
+        super().__init__(message)
+        self.status = status
+        self.filename = filename
+
+
+class IngestedFile:
+    def __init__(self, path, filename, sha256, size, kind, probe_ms, fields=None, frames=None, fps=None):
+        self.path = path
+        self.filename = filename  # the client's name, for display; `path` is named by content
+        self.sha256 = sha256
+        self.size = size
+        self.kind = kind          # "video" or "image"
+        self.probe_ms = probe_ms
+        self.fields = fields or {}  # form fields sent before the file part
+        self.frames = frames      # from the container metadata; None if it does not say
+        self.fps = fps
+
+    @property
+    def duration(self):
+        """Seconds of video (None if unknown; 0 for an image)."""
+        if self.kind == "image":
+            return 0.0
+        return self.frames / self.fps if self.frames and self.fps else None
+
+
+def sniff_container(head):
+    """Identify the container from its first bytes; returns (kind, format) or (None, None)."""
+    if len(head) >= 12 and head[4:8] in (b"ftyp", b"moov", b"mdat", b"wide", b"free"):
+        return "video", "mp4/mov"
+    if head[:4] == b"RIFF" and head[8:12] == b"AVI ":
+        return "video", "avi"
+    if head[:4] == b"\x1a\x45\xdf\xa3":
+        return "video", "mkv/webm"
+    if head[:3] == b"\xff\xd8\xff":
+        return "image", "jpeg"
+    if head[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image", "png"
+    if head[:2] == b"BM":
+        return "image", "bmp"
+    return None, None
+
+
+def probe_media(path, kind):
+    """
+    Decode a single frame (video) or the image itself, and read the frame
+    count and frame rate from the container metadata (nothing else is decoded).
+
+    Returns:
+        (int, float): frames and fps (None for either the container does not
+                      report; an image is one frame), or None when unreadable
+    """
+    import cv2
+    if kind == "image":
+        return (1, None) if cv2.imread(path) is not None else None
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            return None
+        ret, frame = cap.read()
+        if not ret or frame is None:
+            return None
+        frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        return (frames if frames > 0 else None), (fps if fps > 0 else None)
+    finally:
+        cap.release()
+
+
+def safe_filename(filename):
+    return os.path.basename(filename.replace("\\", "/")).strip() or "upload"
+
+
+class _Part:
+    """A file part being written to disk."""
+
+    def __init__(self, filename, tmp_path):
+        self.filename = filename
+        self.tmp_path = tmp_path
+        self.out = open(tmp_path, "wb")
+        self.sha = hashlib.sha256()
+        self.size = 0
+        self.head = b""
+        self.kind = None
+
+    def discard(self):
+        if not self.out.closed:
+            self.out.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def _finish_part(part, dest_dir, created):
+    """
+    Validate a fully written part and move it into place; returns IngestedFile.
+
+    The stored file is named by content (sha256 + extension), so uploads of the
+    same name never replace each other and a queued job always finds its own
+    bytes. Paths this call creates are added to `created`.
+    """
+    part.out.close()
+    if part.size == 0:
+        raise UploadRejected("No file selected", filename=part.filename)
+    if part.kind is None:
+        part.kind, _ = sniff_container(part.head)
+        if part.kind is None:
+            raise UploadRejected("Unrecognized or corrupt media container", status=415, filename=part.filename)
+
+    t0 = time.perf_counter()
+    media = probe_media(part.tmp_path, part.kind)
+    if media is None:
+        raise UploadRejected("File could not be decoded (corrupt or unsupported codec)", status=422,
+                             filename=part.filename)
+    probe_ms = (time.perf_counter() - t0) * 1000
+
+    sha256 = part.sha.hexdigest()
+    final_path = os.path.join(dest_dir, sha256 + os.path.splitext(part.filename)[1].lower())
+    if os.path.exists(final_path):
+        # Same bytes already stored (possibly in use by a running job): leave that file alone
+        part.discard()
+    else:
+        os.replace(part.tmp_path, final_path)
+        created.add(final_path)
+    return IngestedFile(final_path, part.filename, sha256, part.size, part.kind, probe_ms,
+                        frames=media[0], fps=media[1])
+
+
+def ingest_multipart_files(stream, content_type, content_length, dest_dir, field_names=("file",), max_files=1,
+                           max_bytes=MAX_UPLOAD_BYTES, chunk_size=CHUNK_SIZE):
+    """
+    Stream the file parts of a multipart/form-data body straight to disk.
+
+    Each file part is written in `chunk_size` pieces while its SHA-256 is computed,
+    so memory stays flat regardless of upload size. The size limit (whole body)
+    is enforced as bytes arrive, each container is sniffed from its first chunk,
+    and one frame is decoded before a file is accepted. Breaking the size or
+    file-count limit rejects the whole request; a file that fails validation is
+    deleted and reported in its slot as an UploadRejected instance.
+
+    With max_files=1 anything after the first file part is ignored.
+
+    Returns:
+        (list, dict): IngestedFile or UploadRejected per file part, in order, and
+                      the small form fields sent with it
+    """
+    mimetype, options = parse_options_header(content_type or "")
+    boundary = options.get("boundary")
+    if mimetype != "multipart/form-data" or not boundary:
+        raise UploadRejected("Expected multipart/form-data upload")
+    if content_length is not None and content_length > max_bytes + MAX_FIELD_BYTES:
+        raise UploadRejected(f"Upload exceeds {max_bytes // (1024 * 1024)} MB limit", status=413)
+
+    os.makedirs(dest_dir, exist_ok=True)
+    # Bounds the decoder's internal buffer: one read chunk plus a small form field
+    decoder = MultipartDecoder(boundary.encode("ascii"), max_form_memory_size=chunk_size + MAX_FIELD_BYTES)
+
+    results = []
+    fields = {}
+    created = set()  # stored files this request added (removed again if it fails)
+    part = None      # file part being written
+    field = None     # form field being read
+    total = 0
+    done = False
+
+    def settle(item):
+        nonlocal part, done
+        if part is not None and isinstance(item, UploadRejected):
+            part.discard()
+        part = None
+        results.append(item)
+        done = max_files == 1
+
+    try:
+        while not done:
+            chunk = stream.read(chunk_size)
+            decoder.receive_data(chunk or None)
+            event = decoder.next_event()
+            while not done and not isinstance(event, (Epilogue, NeedData)):
+                if isinstance(event, File) and event.name in field_names:
+                    field = None
+                    if len(results) >= max_files:
+                        raise UploadRejected(f"At most {max_files} files per request", status=413)
+                    filename = safe_filename(event.filename) if event.filename else None
+                    ext = os.path.splitext(filename or "")[1].lower()
+                    if filename is None:
+                        settle(UploadRejected("No file selected"))
+                    elif ext not in VIDEO_EXTS | IMAGE_EXTS:
+                        settle(UploadRejected(f"Unsupported file type: {ext or 'none'}", status=415, filename=filename))
+                    else:
+                        tmp_path = os.path.join(dest_dir, f".{uuid.uuid4().hex}.partial")
+                        part = _Part(filename, tmp_path)
+                elif isinstance(event, Field) and len(fields) < MAX_FIELDS:
+                    field = event.name
+                    fields[field] = b""
+                elif isinstance(event, (File, Field)):
+                    field = None
+                elif isinstance(event, Data) and field is not None:
+                    fields[field] += event.data
+                    if len(fields[field]) > MAX_FIELD_BYTES:
+                        raise UploadRejected(f"Form field `{field}` is too large", status=413)
+                elif isinstance(event, Data) and part is not None:
+                    total += len(event.data)
+                    if total > max_bytes:
+                        raise UploadRejected(f"Upload exceeds {max_bytes // (1024 * 1024)} MB limit", status=413)
+                    if part.kind is None and event.data:
+                        part.head += event.data[:16 - len(part.head)]
+                        if len(part.head) >= 16 or not event.more_data:
+                            part.kind, _ = sniff_container(part.head)
+                            if part.kind is None:
+                                settle(UploadRejected("Unrecognized or corrupt media container", status=415,
+                                                      filename=part.filename))
+                                event = decoder.next_event()
+                                continue
+                    part.size += len(event.data)
+                    part.sha.update(event.data)
+                    part.out.write(event.data)
+                    if not event.more_data:
+                        try:
+                            settle(_finish_part(part, dest_dir, created))
+                        except UploadRejected as e:
+                            settle(e)
+                event = decoder.next_event()
+            if isinstance(event, Epilogue) or not chunk:
+                break
+
+        if part is not None:
+            raise UploadRejected(f"Upload of {part.filename} ended before the file was complete")
+        fields = {k: v.decode("utf-8", "replace") for k, v in fields.items()}
+        return results, fields
+    except BaseException:
+        if part is not None:
+            part.discard()
+        for path in created:
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+
+
+def ingest_multipart(stream, content_type, content_length, dest_dir,
+                     field_name="file", max_bytes=MAX_UPLOAD_BYTES, chunk_size=CHUNK_SIZE):
+    """
+    Stream a single-file multipart/form-data upload straight to disk (see
+    ingest_multipart_files). Small form fields placed before the file part are
+    kept in `IngestedFile.fields`; a rejected file raises UploadRejected.
+
+    Returns:
+        IngestedFile
+    """
+    results, fields = ingest_multipart_files(stream, content_type, content_length, dest_dir,
+                                             field_names=(field_name,), max_files=1,
+                                             max_bytes=max_bytes, chunk_size=chunk_size)
+    if not results:
+        raise UploadRejected("No file selected")
+    if isinstance(results[0], UploadRejected):
+        raise results[0]
+    results[0].fields = fields
+    return results[0]
+
+
+def ingest_local_path(path, roots):
+    """
+    Validate a file already on the server (batch API) the same way as an upload.
+
+    The resolved path must lie under one of `roots`; the container is sniffed,
+    one frame decoded and the content hashed without copying the file.
+
+    Returns:
+        IngestedFile
+    """
+    real = os.path.realpath(path)
+    if not any(os.path.commonpath([real, root]) == root for root in roots):
+        raise UploadRejected("Path is outside the allowed directories", status=403, filename=path)
+    if not os.path.isfile(real):
+        raise UploadRejected("File not found", status=404, filename=path)
+    ext = os.path.splitext(real)[1].lower()
+    if ext not in VIDEO_EXTS | IMAGE_EXTS:
+        raise UploadRejected(f"Unsupported file type: {ext or 'none'}", status=415, filename=path)
+
+    sha = hashlib.sha256()
+    head = b""
+    size = 0
+    with open(real, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            if not head:
+                head = chunk[:16]
+            sha.update(chunk)
+            size += len(chunk)
+    kind, _ = sniff_container(head)
+    if kind is None:
+        raise UploadRejected("Unrecognized or corrupt media container", status=415, filename=path)
+
+    t0 = time.perf_counter()
+    media = probe_media(real, kind)
+    if media is None:
+        raise UploadRejected("File could not be decoded (corrupt or unsupported codec)", status=422, filename=path)
+    probe_ms = (time.perf_counter() - t0) * 1000
+    return IngestedFile(real, os.path.basename(real), sha.hexdigest(), size, kind, probe_ms,
+                        frames=media[0], fps=media[1])
@@ -0,0 +1,134 @@
+import json
+import time
+import uuid
+import threading
+
+# Finished jobs are kept this long so the result page can be reloaded
+JOB_TTL_SECONDS = 3600
+# How often a worker polls the state store for a job another worker runs
+POLL_SECONDS = 0.5
+
+
+def format_sse(event, data, event_id=None):
+    """One Server-Sent Events message with a JSON payload."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+class AnalysisJob:
+    """
+    Event log of one background analysis.
+
+    The worker publishes (event, data) pairs; any number of SSE readers replay
+    the log from their own position and block until something new arrives.
+    With a state store every event is also written there, for the other
+    worker processes (see StoredJob).
+    """
+
+    def __init__(self, job_id, user, store=None):
+        self.id = job_id
+        self.user = user
+        self.events = []
+        self.done = False
+        self.outputs = None   # [(module name, text)] once finished
+        self.created = time.time()
+        self.finished = None
+        self._store = store
+        self._cond = threading.Condition()
+
+    def publish(self, event, data):
+        with self._cond:
+            self.events.append((event, data))
+            if self._store is not None:
+                self._store.add_job_event(self.id, len(self.events), event, data)
+            self._cond.notify_all()
+
+    def finish(self, outputs, data=None):
+        with self._cond:
+            self.outputs = outputs
+            self.events.append(("done", data or {}))
+            self.done = True
+            self.finished = time.time()
+            if self._store is not None:
+                self._store.finish_job(self.id, len(self.events), outputs, data or {}, self.finished)
+            self._cond.notify_all()
+
+    def wait(self, since, timeout):
+        """Events after index `since` (waits up to `timeout` s for one); returns (events, done)."""
+        with self._cond:
+            if len(self.events) <= since and not self.done:
+                self._cond.wait(timeout)
+            return self.events[since:], self.done
+
+
+class StoredJob:
+    """
+    A job that another worker process runs, read back from the state store.
+
+    It has the same attributes and wait() as AnalysisJob, but wait() polls
+    the store, so events arrive up to POLL_SECONDS late.
+    """
+
+    def __init__(self, store, row):
+        self._store = store
+        self.id = row["id"]
+        self.user = row["user"]
+        self.created = row["created"]
+        self._update(row)
+
+    def _update(self, row):
+        self.finished = row["finished"]
+        self.outputs = row["outputs"]
+        self.done = self.finished is not None
+
+    def wait(self, since, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            events = self._store.job_events(self.id, since)
+            if not self.done and any(event == "done" for event, _ in events):
+                self._update(self._store.get_job(self.id))
+            if events or self.done or time.monotonic() >= deadline:
+                return events, self.done
+            time.sleep(POLL_SECONDS)
+
+
+class JobRegistry:
+    """
+    Jobs started in this process. With a state store (serving/state_store.py),
+    jobs started by other worker processes are found there.
+    """
+
+    def __init__(self, ttl=JOB_TTL_SECONDS, store=None):
+        self.ttl = ttl
+        self.store = store
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, user):
+        job = AnalysisJob(uuid.uuid4().hex, user, self.store)
+        if self.store is not None:
+            self.store.create_job(job.id, user, job.created)
+        with self._lock:
+            self._expire()
+            self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None or self.store is None:
+            return job
+        row = self.store.get_job(job_id)
+        return StoredJob(self.store, row) if row is not None else None
+
+    def _expire(self):
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job.done and now - job.finished > self.ttl:
+                del self._jobs[job_id]
+        if self.store is not None:
+            self.store.expire_jobs(now - self.ttl)
@@ -0,0 +1,167 @@
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+
+# Batching policy defaults
+MAX_BATCH_SIZE = 32
+MAX_WAIT_MS = 10
+
+_STOP = object()
+
+
+class ModelServerStopped(RuntimeError):
+    """Set on requests the server will not run because it has stopped."""
+
+
+class _Request:
+    __slots__ = ("x", "future")
+
+    def __init__(self, x):
+        self.x = x
+        self.future = Future()
+
+
+class BatchingModelServer:
+    """
+    In-process micro-batching inference service.
+
+    Callers submit single inputs (e.g. 224x224x3 face crops) from any thread and get
+    a Future back. One worker thread owns the model: it takes the first queued
+    request, keeps collecting until `max_batch_size` requests are gathered or
+    `max_wait_ms` has passed, runs one batched forward pass and resolves the futures.
+    Concurrent uploads therefore share forward passes instead of each paying for
+    batch-size-1 calls.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS, name="model-server"):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, name=name, daemon=True)
+        self._lock = threading.Lock()
+        self._stopped = False
+        self.stats = {"requests": 0, "batches": 0, "max_batch": 0, "busy_s": 0.0}
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def submit(self, x):
+        """Queue one input; returns a Future resolving to its model output row."""
+        req = _Request(np.asarray(x, dtype=np.float32))
+        with self._lock:
+            if self._stopped:
+                req.future.set_exception(ModelServerStopped("Model server has stopped"))
+            else:
+                self._queue.put(req)
+        return req.future
+
+    def submit_many(self, xs):
+        return [self.submit(x) for x in xs]
+
+    def predict(self, xs, timeout=None):
+        """Blocking convenience wrapper: submit a list/array of inputs and gather the outputs."""
+        futures = self.submit_many(xs)
+        return np.stack([f.result(timeout) for f in futures]) if futures else np.zeros((0,), np.float32)
+
+    def _collect(self, first):
+        batch = [first]
+        stopping = False
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                # Drain whatever is already queued, then wait out the latency budget
+                item = self._queue.get_nowait() if remaining <= 0 else self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                stopping = True
+                break
+            batch.append(item)
+        return batch, stopping
+
+    def _loop(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            batch, stopping = self._collect(first)
+            batch = [r for r in batch if r.future.set_running_or_notify_cancel()]
+
+            if batch:
+                t0 = time.perf_counter()
+                try:
+                    outputs = self.predict_fn(np.stack([r.x for r in batch]))
+                    if len(outputs) != len(batch):
+                        raise RuntimeError(f"Model returned {len(outputs)} outputs for a batch of {len(batch)}")
+                    for req, out in zip(batch, outputs):
+                        req.future.set_result(out)
+                except Exception as e:
+                    for req in batch:
+                        if not req.future.done():
+                            req.future.set_exception(e)
+                with self._lock:
+                    self.stats["requests"] += len(batch)
+                    self.stats["batches"] += 1
+                    self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+                    self.stats["busy_s"] += time.perf_counter() - t0
+
+            if stopping:
+                break
+        self._fail_pending()
+
+    def _fail_pending(self):
+        # Requests still queued at shutdown would otherwise block their callers forever
+        with self._lock:
+            self._stopped = True
+        while True:
+            try:
+                req = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if req is not _STOP and req.future.set_running_or_notify_cancel():
+                req.future.set_exception(ModelServerStopped("Model server stopped before running this request"))
+
+
+def load_predict_fn(model_path):
+    """Load a Keras (.h5/.keras) or TFLite model once and return a batched predict callable."""
+    if model_path.endswith(".tflite"):
+        from scripts.tflite_inference import TFLiteModel
+        model = TFLiteModel(model_path)
+        return model.predict
+
+    import tensorflow as tf
+    model = tf.keras.models.load_model(model_path)
+    return lambda batch: model(batch, training=False).numpy()
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_model_server(model_path, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+    """Load the model once per process and start the shared batching server."""
+    global _server
+    with _server_lock:
+        if _server is None:
+            if not os.path.exists(model_path):
+                raise FileNotFoundError(f"Model not found: {model_path}")
+            _server = BatchingModelServer(load_predict_fn(model_path), max_batch_size, max_wait_ms).start()
+        return _server
+
+
+def get_model_server():
+    return _server
@@ -0,0 +1,244 @@
+import json
+import time
+import importlib
+
+import numpy as np
+
+from explainability.results import FAKE, REAL, UNKNOWN, VOTES
+from serving.cascade import WEIGHTS, verdict_label
+
+
+def _analyzer(module):
+    return importlib.import_module(f"explainability.{module}")
+
+
+def stack(sequences, fill=np.nan):
+    """Ragged 1-D sequences -> (len x max length) float64 matrix padded with `fill`, and the lengths."""
+    lengths = np.array([len(s) for s in sequences], dtype=np.int64)
+    matrix = np.full((len(sequences), int(lengths.max(initial=0))), fill, dtype=np.float64)
+    mask = np.arange(matrix.shape[1]) < lengths[:, None]
+    if sequences:
+        matrix[mask] = np.concatenate([np.asarray(s, dtype=np.float64) for s in sequences])
+    return matrix, lengths
+
+
+def rescore_params(result, config):
+    """
+    Parameters to re-score one stored result with under a threshold config.
+
+    Only parameters the result was scored with are taken from `config`.
+    Returns (params, None), or (None, reason) when the stored series cannot
+    be re-scored.
+    """
+    analyzer = _analyzer(result.module)
+    if result.version != getattr(analyzer, "MODULE_VERSION", None):
+        return None, f"stored with module version {result.version}, current is {analyzer.MODULE_VERSION}"
+    section = config.get(result.module, {})
+    changed = [k for k in getattr(analyzer, "SERIES_PARAMS", ())
+               if k in section and section[k] != result.params.get(k)]
+    if changed:
+        return None, f"{', '.join(changed)} changed; the series must be re-analyzed"
+
+    params = dict(result.params)
+    params.update({k: v for k, v in section.items() if k in params})
+    return params, None
+
+
+# Vectorized score() of the modules whose verdict reduces each series to a few
+# statistics: (results, params) -> [(metrics, verdict)], computed over the
+# stacked series of all the results at once. Each matches the module's score()
+# for results whose series are not empty; empty ones go through score() itself.
+
+def _frames(values, lengths):
+    return np.arange(values.shape[1]) < lengths[:, None]
+
+
+def _score_flicker(results, params):
+    diffs, lengths = stack([r.series["frame_diff"] for r in results])
+    frames = _frames(diffs, lengths)
+    average = np.where(frames, diffs, 0.0).sum(axis=1) / lengths
+    largest = np.where(frames, diffs, -np.inf).max(axis=1)
+    with np.errstate(invalid="ignore"):
+        events = np.count_nonzero(frames & (diffs > params["threshold"]), axis=1)
+    return [({"average_diff": float(a), "max_diff": float(m), "flicker_events": int(e)}, FAKE if e > 0 else REAL)
+            for a, m, e in zip(average, largest, events)]
+
+
+def _score_iris(results, params):
+    distances, lengths = stack([r.series["iris_distance"] for r in results], fill=0.0)
+    average = distances.sum(axis=1) / lengths
+    with np.errstate(invalid="ignore"):
+        flagged = average > params["distance_threshold"]
+    return [({"average_distance": float(a), "frames_with_iris": int(n)}, FAKE if f else REAL)
+            for a, n, f in zip(average, lengths, flagged)]
+
+
+def _score_cnn(results, params):
+    probs, lengths = stack([r.series["fake_probability"] for r in results], fill=0.0)
+    frames = _frames(probs, lengths)
+    average = probs.sum(axis=1) / lengths
+    with np.errstate(invalid="ignore"):
+        ratio = np.count_nonzero(frames & (probs > params["fake_threshold"]), axis=1) / lengths
+        flagged = average > params["fake_threshold"]
+    return [({"crops": int(n), "average_fake_probability": float(a), "fake_frame_ratio": float(r)}, FAKE if f else REAL)
+            for n, a, r, f in zip(lengths, average, ratio, flagged)]
+
+
+def _score_eyebrow(results, params):
+    left, lengths = stack([r.series["left_eyebrow_y"] for r in results])
+    right, _ = stack([r.series["right_eyebrow_y"] for r in results])
+    frames = _frames(left, lengths)
+    found = frames & ~np.isnan(left)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # Missing frames take the side's mean, as in eyebrow_mismatch.score
+        def fill_missing(side):
+            seen = frames & ~np.isnan(side)
+            mean = np.where(seen, side, 0.0).sum(axis=1, keepdims=True) / seen.sum(axis=1, keepdims=True)
+            return np.where(seen, side, mean)
+
+        diff = np.abs(fill_missing(left) - fill_missing(right))
+        average = np.where(frames, diff, 0.0).sum(axis=1) / lengths
+        flagged = average > params["diff_threshold"]
+    scored = []
+    for a, n, f in zip(average, found.sum(axis=1), flagged):
+        if n == 0:
+            scored.append(({"average_diff": float("nan"), "frames_with_face": 0}, UNKNOWN))
+        else:
+            scored.append(({"average_diff": float(a), "frames_with_face": int(n)}, FAKE if f else REAL))
+    return scored
+
+
+def _score_lip(results, params):
+    lips, _ = stack([r.series["lip_distance"] for r in results], fill=0.0)
+    moving = np.nan_to_num(lips) > 0
+    count = moving.sum(axis=1)
+    baseline = params["baseline"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        average = np.where(moving, lips, 0.0).sum(axis=1) / count
+        mismatch = (1 - np.minimum(average, baseline) / baseline) * 100
+    scored = []
+    for a, m, n in zip(average, mismatch, count):
+        if n == 0:
+            scored.append(({"frames_with_face": 0}, UNKNOWN))
+        else:
+            scored.append(({"average_movement": float(a), "mismatch_percent": float(m), "frames_with_face": int(n)},
+                           FAKE if m > params["mismatch_threshold"] else REAL))
+    return scored
+
+
+def _score_texture(results, params):
+    scars, lengths = stack([r.series["scar_ratio"] for r in results], fill=0.0)
+    scar = scars.sum(axis=1) / lengths
+    scored = []
+    for result, s in zip(results, scar):
+        metrics = dict(result.metrics, scar_ratio=float(s))
+        suspicious = (metrics["lbp_distance"] > params["lbp_threshold"]
+                      or metrics["hsv_distance"] > params["hsv_threshold"] or s > params["scar_threshold"])
+        scored.append((metrics, FAKE if suspicious else REAL))
+    return scored
+
+
+BATCH_SCORERS = {
+    "flicker_detection": _score_flicker,
+    "iris_alignment": _score_iris,
+    "cnn_detector": _score_cnn,
+    "eyebrow_mismatch": _score_eyebrow,
+    "lip_sync_module": _score_lip,
+    "texture_analyzer": _score_texture,
+}
+
+
+def score_batch(module, results, params):
+    """
+    Metrics and verdict of several stored results of one module under the same params.
+
+    Returns:
+        list: (metrics, verdict) per result, or the reason it could not be re-scored
+    """
+    scored = [None] * len(results)
+    batch = BATCH_SCORERS.get(module)
+    if batch is not None:
+        rows = [i for i, r in enumerate(results) if all(len(s) for s in r.series.values())]
+        for i, outcome in zip(rows, batch([results[i] for i in rows], params)):
+            scored[i] = outcome
+    analyzer = _analyzer(module)
+    for i, result in enumerate(results):
+        if scored[i] is None:
+            try:
+                scored[i] = analyzer.score(result.series, params, result.metrics)
+            except Exception as e:
+                scored[i] = f"re-scoring failed: {e}"
+    return scored
+
+
+def fused_score(verdicts, weights=WEIGHTS):
+    """Weighted vote of {module: verdict} over the weight of the modules present, in [-1, 1]."""
+    total = sum(weights.get(m, 1.0) for m in verdicts) or 1.0
+    return sum(weights.get(m, 1.0) * VOTES.get(v, 0) for m, v in verdicts.items()) / total
+
+
+def rescore_corpus(store, config, modules=None, weights=WEIGHTS):
+    """
+    Re-score every video in a SeriesStore under `config` without decoding any video.
+
+    Parameters:
+        store (SeriesStore): persisted per-frame series
+        config (dict): full threshold config (see thresholds.merge)
+        modules (iterable): restrict to these modules (default: all stored)
+        weights (dict): fusion weights of the module votes
+
+    Returns:
+        dict: {"videos": [...], "changed": videos whose fused verdict changed,
+               "modules_rescored", "stale", "seconds"}
+    """
+    t0 = time.perf_counter()
+    stored = list(store.iter_videos(modules))
+
+    # Each module's results under the same params are scored in one pass over their stacked series
+    outcomes = {}   # (video index, module) -> (metrics, verdict) or reason
+    groups = {}     # (module, params as JSON) -> (params, [(video index, result)])
+    for i, (_, _, results) in enumerate(stored):
+        for module, result in results.items():
+            try:
+                params, reason = rescore_params(result, config)
+            except Exception as e:
+                params, reason = None, f"re-scoring failed: {e}"
+            if params is None:
+                outcomes[i, module] = reason
+            else:
+                groups.setdefault((module, json.dumps(params, sort_keys=True)), (params, []))[1].append((i, result))
+    for (module, _), (params, items) in groups.items():
+        for (i, _), outcome in zip(items, score_batch(module, [result for _, result in items], params)):
+            outcomes[i, module] = outcome
+
+    videos = []
+    rescored = stale = changed = 0
+    for i, (content_hash, meta, results) in enumerate(stored):
+        before, after, entries = {}, {}, {}
+        for module, result in results.items():
+            before[module] = result.verdict
+            outcome = outcomes[i, module]
+            if isinstance(outcome, str):
+                stale += 1
+                entries[module] = {"status": "stale", "reason": outcome, "verdict": result.verdict}
+                after[module] = result.verdict
+                continue
+            metrics, verdict = outcome
+            rescored += 1
+            after[module] = verdict
+            entries[module] = {"status": "ok", "verdict": verdict, "previous": result.verdict,
+                               "metrics": metrics}
+        old_label = verdict_label(fused_score(before, weights))
+        score = fused_score(after, weights)
+        if verdict_label(score) != old_label:
+            changed += 1
+        videos.append({
+            "sha256": content_hash,
+            "filename": meta.get("filename"),
+            "verdict": verdict_label(score),
+            "previous_verdict": old_label,
+            "score": round(score, 4),
+            "modules": entries,
+        })
+    return {"videos": videos, "changed": changed, "modules_rescored": rescored, "stale": stale,
+            "seconds": round(time.perf_counter() - t0, 3)}
@@ -0,0 +1,99 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+CACHE_DIR = os.path.join("cache", "results")
+MAX_BYTES = 512 * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+# Layout of a cached output; entries of an older layout (2: AnalysisResult.to_dict(), 1: report text) miss
+SCHEMA_VERSION = 2
+
+
+def sha256_file(path, chunk_size=CHUNK_SIZE):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ResultCache:
+    """
+    On-disk cache of analysis outputs keyed by upload content hash.
+
+    One JSON file per (content hash, module) holds that module's output. An entry
+    is only returned when the cache schema, its module version and its
+    threshold-config fingerprint all still match, so bumping a module's
+    MODULE_VERSION or editing its thresholds re-runs just that module.
+    A write replaces its own file whole (write to a temp file, then rename), so
+    server processes caching different modules of the same upload never
+    overwrite each other's entries, and a reader sees the old file or the new.
+    Files are evicted least-recently-used once the directory exceeds `max_bytes`.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, content_hash, module):
+        return os.path.join(self.cache_dir, f"{content_hash}.{module}.json")
+
+    def get(self, content_hash, module, version, config_fp):
+        path = self._path(content_hash, module)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                item = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(item, dict) or item.get("schema") != SCHEMA_VERSION:
+            return None
+        if item.get("version") != version or item.get("config") != config_fp:
+            return None
+        try:
+            os.utime(path)  # LRU: a hit refreshes the entry
+        except OSError:
+            pass
+        return item["output"]
+
+    def put(self, content_hash, module, version, config_fp, output):
+        item = {
+            "schema": SCHEMA_VERSION,
+            "version": version,
+            "config": config_fp,
+            "output": output,
+            "created": time.time(),
+        }
+        path = self._path(content_hash, module)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(item, f)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self):
+        files = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+
+        if total <= self.max_bytes:
+            return
+        for _, size, path in sorted(files):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= self.max_bytes:
+                break
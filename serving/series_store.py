@@ -0,0 +1,80 @@
+import os
+import json
+import time
+import threading
+
+from explainability.results import AnalysisResult
+
+SERIES_DIR = os.path.join("cache", "series")
+RESULT_EXT = ".dfr"
+META_FILE = "meta.json"
+
+
+class SeriesStore:
+    """
+    Per-frame signal series of every analyzed video, for re-scoring and calibration.
+
+    Layout: <root>/<content hash>/<module>.dfr holds one AnalysisResult in its
+    binary form (metrics, verdict, params and float32 series) and meta.json
+    the video's file name. Unlike the result cache nothing is evicted or keyed
+    by thresholds: the series do not depend on the verdict thresholds, which
+    is what makes re-scoring possible.
+    """
+
+    def __init__(self, root=SERIES_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _dir(self, content_hash):
+        return os.path.join(self.root, content_hash)
+
+    def put(self, content_hash, result, filename=None):
+        video_dir = self._dir(content_hash)
+        os.makedirs(video_dir, exist_ok=True)
+        result.save(os.path.join(video_dir, result.module + RESULT_EXT))
+        if filename:
+            with self._lock:
+                meta_path = os.path.join(video_dir, META_FILE)
+                tmp_path = f"{meta_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump({"filename": filename, "updated": time.time()}, f)
+                os.replace(tmp_path, meta_path)
+
+    def get(self, content_hash, module):
+        try:
+            return AnalysisResult.load(os.path.join(self._dir(content_hash), module + RESULT_EXT))
+        except (OSError, ValueError):
+            return None
+
+    def meta(self, content_hash):
+        try:
+            with open(os.path.join(self._dir(content_hash), META_FILE), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def hashes(self):
+        return sorted(name for name in os.listdir(self.root) if os.path.isdir(self._dir(name)))
+
+    def load(self, content_hash, modules=None):
+        """{module: AnalysisResult} stored for one video (optionally only `modules`)."""
+        results = {}
+        video_dir = self._dir(content_hash)
+        for name in sorted(os.listdir(video_dir)):
+            module, ext = os.path.splitext(name)
+            if ext != RESULT_EXT or (modules is not None and module not in modules):
+                continue
+            result = self.get(content_hash, module)
+            if result is not None:
+                results[module] = result
+        return results
+
+    def iter_videos(self, modules=None, hashes=None):
+        """Yield (content hash, meta, {module: AnalysisResult}) for every stored video (optionally only `hashes`)."""
+        for content_hash in self.hashes():
+            if hashes is not None and content_hash not in hashes:
+                continue
+            results = self.load(content_hash, modules)
+            if results:
+                yield content_hash, self.meta(content_hash), results
@@ -0,0 +1,181 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+STATE_DB = os.path.join("cache", "state.db")
+BUSY_TIMEOUT_MS = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    password_hash TEXT NOT NULL,
+    email TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS uploads (
+    username TEXT NOT NULL,
+    day TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (username, day)
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    username TEXT NOT NULL,
+    created REAL NOT NULL,
+    finished REAL,
+    outputs TEXT
+);
+CREATE TABLE IF NOT EXISTS job_events (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    event TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq)
+);
+CREATE TABLE IF NOT EXISTS rate_buckets (
+    username TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+
+
+class StateStore:
+    """
+    Users, daily upload counts, rate limits and job progress in one SQLite database.
+
+    Every worker process of a multi-process server opens the same file, so a
+    user who signs up in one worker can log in through another, the upload
+    counts agree, and any worker can stream a job that another one runs. WAL
+    mode lets readers carry on while one writer commits. Connections are per
+    thread and are reopened after fork().
+    """
+
+    def __init__(self, path=STATE_DB):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+
+    def _connect(self):
+        db = getattr(self._local, "db", None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+            db.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+            # WAL is durable up to the last checkpoint with NORMAL; losing a
+            # progress event on power loss is acceptable
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db, self._local.pid = db, os.getpid()
+        return db
+
+    def close(self):
+        """Close this thread's connection (e.g. in a server's master process before it forks)."""
+        db = getattr(self._local, "db", None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+    # Users
+
+    def create_user(self, username, password, email):
+        """False if the username is taken (checked atomically across processes)."""
+        cursor = self._connect().execute(
+            "INSERT OR IGNORE INTO users (username, password_hash, email, created) VALUES (?, ?, ?, ?)",
+            (username, generate_password_hash(password), email, time.time()))
+        return cursor.rowcount == 1
+
+    def user_exists(self, username):
+        return self._connect().execute("SELECT 1 FROM users WHERE username = ?", (username,)).fetchone() is not None
+
+    def check_password(self, username, password):
+        row = self._connect().execute("SELECT password_hash FROM users WHERE username = ?", (username,)).fetchone()
+        return row is not None and check_password_hash(row[0], password)
+
+    # Upload counts
+
+    def uploads_on(self, username, day):
+        row = self._connect().execute("SELECT count FROM uploads WHERE username = ? AND day = ?",
+                                      (username, day)).fetchone()
+        return row[0] if row else 0
+
+    def count_upload(self, username, day):
+        """Add one upload for the day; returns the new count."""
+        return self._connect().execute(
+            "INSERT INTO uploads (username, day, count) VALUES (?, ?, 1) "
+            "ON CONFLICT (username, day) DO UPDATE SET count = count + 1 RETURNING count",
+            (username, day)).fetchone()[0]
+
+    # Rate limits
+
+    def take_token(self, username, rate, burst, now=None):
+        """
+        Take one token from the user's bucket, which holds up to `burst` tokens
+        and refills at `rate` per second (a new user starts full).
+
+        Returns:
+            float: 0 when a token was taken, else seconds until one is due
+        """
+        now = time.time() if now is None else now
+        db = self._connect()
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute("SELECT tokens, updated FROM rate_buckets WHERE username = ?", (username,)).fetchone()
+            tokens = burst if row is None else min(burst, row[0] + (now - row[1]) * rate)
+            if tokens < 1:
+                return (1 - tokens) / rate
+            db.execute("INSERT OR REPLACE INTO rate_buckets (username, tokens, updated) VALUES (?, ?, ?)",
+                       (username, tokens - 1, now))
+        return 0.0
+
+    def return_token(self, username, burst):
+        """Give back a token taken for work that was then refused (the bucket stays capped at `burst`)."""
+        self._connect().execute("UPDATE rate_buckets SET tokens = MIN(tokens + 1, ?) WHERE username = ?",
+                                (burst, username))
+
+    # Jobs
+
+    def create_job(self, job_id, username, created):
+        self._connect().execute("INSERT INTO jobs (id, username, created) VALUES (?, ?, ?)",
+                                (job_id, username, created))
+
+    def add_job_event(self, job_id, seq, event, data):
+        self._connect().execute("INSERT INTO job_events (job_id, seq, event, data) VALUES (?, ?, ?, ?)",
+                                (job_id, seq, event, json.dumps(data)))
+
+    def finish_job(self, job_id, seq, outputs, data, finished):
+        db = self._connect()
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            db.execute("INSERT INTO job_events (job_id, seq, event, data) VALUES (?, ?, 'done', ?)",
+                       (job_id, seq, json.dumps(data)))
+            db.execute("UPDATE jobs SET finished = ?, outputs = ? WHERE id = ?",
+                       (finished, json.dumps(outputs), job_id))
+
+    def get_job(self, job_id):
+        """{"id", "user", "created", "finished", "outputs"} or None; outputs is None until finished."""
+        row = self._connect().execute("SELECT id, username, created, finished, outputs FROM jobs WHERE id = ?",
+                                      (job_id,)).fetchone()
+        if row is None:
+            return None
+        outputs = [tuple(o) for o in json.loads(row[4])] if row[4] is not None else None
+        return {"id": row[0], "user": row[1], "created": row[2], "finished": row[3], "outputs": outputs}
+
+    def job_events(self, job_id, since):
+        """[(event, data)] after the first `since` events of a job."""
+        rows = self._connect().execute("SELECT event, data FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq",
+                                       (job_id, since)).fetchall()
+        return [(event, json.loads(data)) for event, data in rows]
+
+    def expire_jobs(self, finished_before):
+        db = self._connect()
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            db.execute("DELETE FROM job_events WHERE job_id IN (SELECT id FROM jobs WHERE finished < ?)",
+                       (finished_before,))
+            db.execute("DELETE FROM jobs WHERE finished < ?", (finished_before,))